@@ -1,6 +1,7 @@
 import threading
 
 from common import fm_logger
+from common import storage_manager
 
 fmlogging = fm_logger.Logging()
 
@@ -69,6 +70,13 @@ class AppHandler(threading.Thread):
             fmlogging.error("Unknown deployment target %s" % cloud)
             return
 
+    def _scale_app(self):
+        cloud = self.app_info['target']
+        if cloud == 'aws':
+            AppHandler.registered_cloud_handlers['aws'].scale_application(self.app_id, self.app_info)
+        else:
+            fmlogging.error("Scaling is not supported for deployment target %s" % cloud)
+
     def _delete_app(self):
         cloud = self.app_info['target']
         if cloud == 'aws':
@@ -80,7 +88,7 @@ class AppHandler(threading.Thread):
         else:
             fmlogging.error("Unknown deployment target %s" % cloud)
             app_db.App().delete(self.app_id)
-            return
+        storage_manager.remove_app(self.app_info['app_name'])
 
     def run(self):
         fmlogging.debug("Handling request for application id %s " % self.app_id)
@@ -88,9 +96,17 @@ class AppHandler(threading.Thread):
             self._deploy_app()
         if self.action == 'redeploy':
             self._redeploy_app()
+        if self.action == 'scale':
+            self._scale_app()
         if self.action == 'delete':
             self._delete_app()
 
+    def get_task_counts(self):
+        cloud = self.app_info['target']
+        if cloud != 'aws':
+            return {}
+        return AppHandler.registered_cloud_handlers[cloud].get_task_counts(self.app_id, self.app_info)
+
     def get_logs(self):
         cloud = self.app_info['target']
         log_lines = AppHandler.registered_cloud_handlers[cloud].get_logs(self.app_id, self.app_info)
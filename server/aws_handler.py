@@ -1,9 +1,9 @@
-import ast
 from os.path import expanduser
 
 from stevedore import extension
 
 from common import common_functions
+from common import env_definition
 from common import fm_logger
 from dbmodule.objects import app as app_db
 from dbmodule.objects import environment as env_db
@@ -38,9 +38,7 @@ class AWSHandler(object):
     def _get_coe_type(self, env_id):
         coe_type = ''
         env_obj = env_db.Environment().get(env_id)
-        env_definition = ast.literal_eval(env_obj.env_definition)
-        env_details = env_definition['environment']
-        coe_type = env_details['app_deployment']['type']
+        coe_type = env_definition.get(env_obj).coe_type
         return coe_type
 
     def create_resources(self, env_id, resource_list):
@@ -112,6 +110,20 @@ class AWSHandler(object):
             if name == coe_type:
                 ext.obj.redeploy_application(app_id, app_info)
 
+    def scale_application(self, app_id, app_info):
+        coe_type = self._get_coe_type_for_app(app_id)
+        for name, ext in AWSHandler.coe_mgr.items():
+            if name == coe_type:
+                ext.obj.scale_application(app_id, app_info)
+
+    def get_task_counts(self, app_id, app_info):
+        counts = {}
+        coe_type = self._get_coe_type_for_app(app_id)
+        for name, ext in AWSHandler.coe_mgr.items():
+            if name == coe_type:
+                counts = ext.obj.get_task_counts(app_id, app_info)
+        return counts
+
     def delete_application(self, app_id, app_info):
         coe_type = self._get_coe_type_for_app(app_id)
         for name, ext in AWSHandler.coe_mgr.items():
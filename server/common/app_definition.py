@@ -0,0 +1,130 @@
+import collections
+import copy
+import os
+import threading
+import yaml
+
+import constants
+import fm_logger
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+fmlogging = fm_logger.Logging()
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class AppDefinition(object):
+    """Parsed app yaml.
+
+    Gives typed access to the fields of CloudARK's single container format.
+    definition holds the parsed document for other formats, such as
+    Kubernetes pod definitions.
+    """
+
+    def __init__(self, definition):
+        self.definition = definition
+        self.app = {}
+        if isinstance(definition, dict) and isinstance(definition.get('app'), dict):
+            self.app = definition['app']
+
+    @property
+    def image(self):
+        return self.app.get('image', '')
+
+    @property
+    def container_port(self):
+        return self.app.get('container_port')
+
+    @property
+    def host_port(self):
+        return self.app.get('host_port')
+
+    @property
+    def memory(self):
+        return self.app.get('memory', '')
+
+    @property
+    def memory_reservation(self):
+        return self.app.get('memory_reservation', '')
+
+    @property
+    def cpu(self):
+        return self.app.get('cpu', '')
+
+    @property
+    def log_driver(self):
+        return self.app.get('log_driver', '')
+
+    @property
+    def placement_strategy(self):
+        return list(self.app.get('placement_strategy') or [])
+
+    @property
+    def placement_constraints(self):
+        return list(self.app.get('placement_constraints') or [])
+
+    @property
+    def replicas(self):
+        return self.app.get('replicas', 1)
+
+    @property
+    def deployment(self):
+        return dict(self.app.get('deployment') or {})
+
+    @property
+    def autoscaling(self):
+        return dict(self.app.get('autoscaling') or {})
+
+    @property
+    def routing(self):
+        return dict(self.app.get('routing') or {})
+
+    @property
+    def env(self):
+        return dict(self.app.get('env') or {})
+
+
+def get_app_yaml_path(app_info):
+    return (app_info['app_location'] + "/" + app_info['app_folder_name'] +
+            "/" + app_info['app_yaml'])
+
+
+def load(path):
+    """Return the AppDefinition for the app yaml at path.
+
+    Parsed definitions are cached by (path, mtime, size) so a file is only
+    parsed again after it changes.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime, stat.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+    fp = open(path, "r")
+    try:
+        app_def = AppDefinition(yaml.load(fp.read(), Loader=SafeLoader))
+    finally:
+        fp.close()
+
+    with _cache_lock:
+        _cache.pop(path, None)
+        _cache[path] = (key, app_def)
+        while len(_cache) > constants.APP_YAML_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return app_def
+
+
+def get(app_info):
+    return load(get_app_yaml_path(app_info))
+
+
+def get_contents(app_info):
+    """Return a copy of the parsed app yaml that callers are free to modify."""
+    return copy.deepcopy(get(app_info).definition)
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import shutil
+import tarfile
+import tempfile
+
+import constants
+import fm_logger
+
+fmlogging = fm_logger.Logging()
+
+BLOCK_SIZE = 64 * 1024
+
+
+def _blob_path(digest, mode):
+    # Files with the same content but different permissions need their own
+    # blob since hard links share the mode.
+    return ("{store}/{prefix}/{digest}-{mode:o}").format(store=constants.OBJECT_STORE_PATH,
+                                                         prefix=digest[:2],
+                                                         digest=digest,
+                                                         mode=mode)
+
+
+def put_blob(fileobj, mode=0o644):
+    """Store the contents of fileobj in the object store and return the blob path.
+
+    Contents that are already stored are not written again.
+    """
+    if not os.path.exists(constants.OBJECT_STORE_PATH):
+        os.makedirs(constants.OBJECT_STORE_PATH)
+    fd, tmp_path = tempfile.mkstemp(dir=constants.OBJECT_STORE_PATH)
+    sha = hashlib.sha1()
+    out = os.fdopen(fd, "wb")
+    try:
+        for chunk in iter(lambda: fileobj.read(BLOCK_SIZE), b''):
+            sha.update(chunk)
+            out.write(chunk)
+    finally:
+        out.close()
+
+    blob_path = _blob_path(sha.hexdigest(), mode)
+    if os.path.exists(blob_path):
+        os.remove(tmp_path)
+        # Keeps the compactor from removing the blob before it is linked.
+        os.utime(blob_path, None)
+    else:
+        if not os.path.exists(os.path.dirname(blob_path)):
+            try:
+                os.makedirs(os.path.dirname(blob_path))
+            except OSError:
+                pass
+        os.chmod(tmp_path, mode)
+        os.rename(tmp_path, blob_path)
+    return blob_path
+
+
+def link_blob(blob_path, target_path):
+    """Make target_path a hard link to blob_path, replacing any existing file.
+
+    The existing file is unlinked rather than overwritten so that other
+    versions sharing the blob are not modified.
+    """
+    if os.path.lexists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(blob_path, target_path)
+    except OSError:
+        # Different filesystem or too many links to the blob.
+        shutil.copy2(blob_path, target_path)
+
+
+def _is_within(path, root):
+    return path == root or path.startswith(root + os.sep)
+
+
+def _target_path(root, member_name):
+    """Return where member_name is extracted to, or None if that is outside of root."""
+    target = os.path.normpath(os.path.join(root, member_name))
+    if not _is_within(target, root):
+        return None
+    # A symlink extracted earlier must not redirect later members outside of root.
+    if not _is_within(os.path.realpath(os.path.dirname(target)), root):
+        return None
+    return target
+
+
+def extract_tar(tar_fileobj, dest_dir):
+    """Extract a tar stream into dest_dir with file contents taken from the object store.
+
+    Regular files are hard links to content addressed blobs, so extracting a
+    tarball that shares files with an earlier version takes no extra space.
+    The tar is read sequentially from tar_fileobj, which can be any stream.
+    Members with absolute paths, '..' components, links pointing outside of
+    dest_dir, and device files are skipped. The process working directory is
+    never changed, so extractions can run in parallel.
+    """
+    root = os.path.realpath(dest_dir)
+    if not os.path.isdir(root):
+        os.makedirs(root)
+    tar = tarfile.open(fileobj=tar_fileobj, mode="r|*")
+    try:
+        for member in tar:
+            target = _target_path(root, member.name)
+            if not target:
+                fmlogging.error("Skipping tar member %s outside of %s" % (member.name, dest_dir))
+                continue
+            if member.isdir():
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                continue
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+            if member.isreg():
+                blob_path = put_blob(tar.extractfile(member), member.mode & 0o777)
+                link_blob(blob_path, target)
+            elif member.islnk():
+                link_target = _target_path(root, member.linkname)
+                if link_target and os.path.isfile(link_target):
+                    link_blob(link_target, target)
+            elif member.issym():
+                link_target = os.path.normpath(os.path.join(os.path.dirname(target), member.linkname))
+                if os.path.isabs(member.linkname) or not _is_within(link_target, root):
+                    fmlogging.error("Skipping symlink %s pointing outside of %s" % (member.name, dest_dir))
+                    continue
+                if os.path.lexists(target):
+                    os.remove(target)
+                os.symlink(member.linkname, target)
+            else:
+                fmlogging.debug("Skipping tar member %s of unsupported type" % member.name)
+    finally:
+        tar.close()
@@ -1,15 +1,24 @@
 import ast
+import copy
 import datetime
+import hashlib
+import io
 import os
-import requests
-import tarfile
 import time
 import subprocess
+import threading
 import yaml
 
 from os.path import expanduser
 
+import app_definition
+import app_store
+import constants
+import env_definition
 import fm_logger
+import log_classifier
+import manifest_template
+import readiness
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
 from server.dbmodule.objects import resource as res_db
@@ -23,13 +32,19 @@ CONT_STORE_PATH = ("{home_dir}/.cld/data/deployments/containers").format(home_di
 
 fmlogging = fm_logger.Logging()
 
+TAR_HASH_FILE = ".tar-sha1"
+
+_resource_index = {}
+_resource_index_lock = threading.Lock()
+
 
 def untar_the_app(app_tar_file, versioned_app_path):
     fmlogging.debug("Untarring received app tar file %s" % app_tar_file)
-    os.chdir(versioned_app_path)
-    tar = tarfile.open(app_tar_file)
-    tar.extractall(path=versioned_app_path)
-    tar.close()
+    fp = open(app_tar_file, "rb")
+    try:
+        app_store.extract_tar(fp, versioned_app_path)
+    finally:
+        fp.close()
 
 
 def get_version_stamp():
@@ -72,133 +87,126 @@ def store_app_contents(app_name, app_tar_name, content, app_version=''):
         os.makedirs(versioned_app_path)
 
     # store file content
+    tar_content = content.encode("ISO-8859-1")
+    tar_hash = hashlib.sha1(tar_content).hexdigest()
     app_tar_file = ("{versioned_app_path}/{app_tar_name}").format(versioned_app_path=versioned_app_path,
                                                                   app_tar_name=app_tar_name)
-    app_file = open(app_tar_file, "w")
-    app_file.write(content.encode("ISO-8859-1"))
-    app_file.flush()
-    app_file.close()
+    app_store.link_blob(app_store.put_blob(io.BytesIO(tar_content)), app_tar_file)
 
-    # expand the directory
-    untar_the_app(app_tar_file, versioned_app_path)
+    # expand the directory, unless this version already holds the same tarball
+    tar_hash_file = versioned_app_path + "/" + TAR_HASH_FILE
+    if os.path.exists(tar_hash_file) and open(tar_hash_file).read().strip() == tar_hash:
+        fmlogging.debug("App tar file %s is unchanged. Not extracting it again." % app_tar_name)
+        return versioned_app_path, app_version
+
+    app_store.extract_tar(io.BytesIO(tar_content), versioned_app_path)
+    fp = open(tar_hash_file, "w")
+    fp.write(tar_hash)
+    fp.close()
     return versioned_app_path, app_version
 
 
-def _get_env_value(resource_list, placeholder_env_value):
-    env_value = ''
-    parts = placeholder_env_value.split("_")
-    resource_type = parts[1]
-    resource_property = parts[2]
+def get_resource_index(env_id):
+    """Return {resource type: {property: value}} for the resources of an environment.
+
+    The index is cached per environment and rebuilt only when a resource of
+    the environment is added, removed or its description changes.
+    """
+    index_version, index = get_resource_index_with_version(env_id)
+    return index
 
-    for resource in resource_list:
-        if resource.type == resource_type.lower():
-            resource_desc = resource.filtered_description
-            res_desc_dict = ast.literal_eval(resource_desc)
-            env_value = res_desc_dict[resource_property.rstrip()]
 
+def get_resource_index_with_version(env_id):
+    """Return (version, index). The version changes whenever the index does."""
+    resource_list = res_db.Resource().get_resources_for_env(env_id) or []
+    fingerprint = [(res.id, res.type, res.filtered_description) for res in resource_list]
+
+    with _resource_index_lock:
+        cached = _resource_index.get(env_id)
+        if cached and cached[0] == fingerprint:
+            return cached[1], cached[2]
+
+    index_version = hashlib.sha1(repr(fingerprint)).hexdigest()[:12]
+
+    index = {}
+    for resource in resource_list:
+        if not resource.filtered_description:
+            continue
+        try:
+            res_desc_dict = ast.literal_eval(resource.filtered_description)
+        except (ValueError, SyntaxError) as e:
+            fmlogging.error("Could not parse description of resource %s: %s" % (resource.cloud_resource_id, e))
+            continue
+        if isinstance(res_desc_dict, dict):
+            index.setdefault(resource.type, {}).update(res_desc_dict)
+
+    with _resource_index_lock:
+        _resource_index[env_id] = (fingerprint, index_version, index)
+    return index_version, index
+
+
+def _get_env_value(resource_index, placeholder_env_value):
+    # $CLOUDARK_<TYPE>_<PROPERTY>, where PROPERTY may itself contain '_'
+    parts = placeholder_env_value.strip().split("_", 2)
+    if len(parts) < 3:
+        fmlogging.error("Malformed placeholder %s" % placeholder_env_value)
+        return ''
+    resource_type = parts[1].lower()
+    resource_property = parts[2].rstrip()
+
+    env_value = resource_index.get(resource_type, {}).get(resource_property, '')
+    if not env_value:
+        fmlogging.error("No value found for %s" % placeholder_env_value.strip())
     return env_value
 
 
-def read_app_yaml(app_info):
-    app_dir = app_info['app_location']
-    app_folder_name = app_info['app_folder_name']
-    df_dir = app_dir + "/" + app_folder_name
-    app_yaml = app_info['app_yaml']
+def get_app_definition(app_info):
     try:
-        fp = open(df_dir + "/" + app_yaml, "r")
-    except Exception as e:
+        app_def = app_definition.get(app_info)
+    except (IOError, OSError) as e:
         print(e)
         exit()
-
-    try:
-        app_yaml_def = yaml.load(fp.read())
     except Exception as exp:
-        print("Error parsing %s" % app_yaml)
+        print("Error parsing %s" % app_info['app_yaml'])
         print(exp)
         exit()
-    return app_yaml_def
+    return app_def
 
 
-def resolve_environment(app_id, app_info):
-    resource_list = res_db.Resource().get_resources_for_env(app_info['env_id'])
+def read_app_yaml(app_info):
+    app_def = get_app_definition(app_info)
+    return copy.deepcopy(app_def.definition)
+
 
-    app_yaml_def = read_app_yaml(app_info)
-    env_vars = ''
+def resolve_environment(app_id, app_info):
+    env_vars = get_app_definition(app_info).env
     new_env_var = dict()
-    if 'env' in app_yaml_def['app']:
-        env_vars = app_yaml_def['app']['env']
+    if env_vars:
+        resource_index = get_resource_index(app_info['env_id'])
         for key, value in env_vars.iteritems():
             if value.find("$CLOUDARK_") >= 0:
-                value = _get_env_value(resource_list, value)
+                value = _get_env_value(resource_index, value)
             new_env_var[key] = value
 
     return new_env_var
 
 
 def resolve_environment_multicont(app_id, app_info):
+    """Render $CLOUDARK_ placeholders of a multi container app yaml.
 
-    resource_list = res_db.Resource().get_resources_for_env(app_info['env_id'])
+    Returns the path of the rendered manifest. The app yaml is left as is.
+    """
+    index_version, resource_index = get_resource_index_with_version(app_info['env_id'])
 
-    app_dir = app_info['app_location']
-    app_folder_name = app_info['app_folder_name']
-    app_yaml_dir = app_dir + "/" + app_folder_name
-    app_yaml = app_info['app_yaml']
-
-    orig_file = app_yaml_dir + "/" + app_yaml
-    bak_file = orig_file + ".bak"
-    mv_cmd = ("mv {orig_file} {bak_file}").format(orig_file=orig_file, bak_file=bak_file)
-    os.system(mv_cmd)
-
-    fp_bak = open(bak_file, "r")
-    fp_new = open(orig_file, "w")
-
-    lines = fp_bak.readlines()
-
-    for line in lines:
-        if line.find("$CLOUDARK_") >= 0:
-            parts = line.split(":")
-            newline = []
-            value = ''
-            for part in parts:
-                if part.find("$CLOUDARK_") >= 0:
-                    value = _get_env_value(resource_list, part)
-                    newline.append(": ")
-                    newline.append(value)
-                    newline.append("\n")
-                else:
-                    newline.append(part)
-            fp_new.write(''.join(newline))
-        else:
-            fp_new.write(line)
-
-    fp_new.close()
-
-def is_app_ready(app_url, app_id='', timeout=300):
-    ready = False
-    count = 0
-    num_of_oks = 10
-    oks = 0
-    while count < timeout and not ready:
-        try:
-            response = requests.get(app_url)
-            if response.status_code == 200 or response.status_code == 404:
-                oks = oks + 1
-                if oks == num_of_oks:
-                    ready = True
-                    break
-        except Exception as e:
-            fmlogging.error(e)
-        count = count + 1
-        time.sleep(3)
-
-    # After every 10 counts check if app still exists
-    if app_id:
-        if count % 10 == 0:
-            app_obj = app_db.App().get(app_id)
-            if not app_obj:
-                count = timeout
-
-    return ready
+    app_yaml_file = app_definition.get_app_yaml_path(app_info)
+    return manifest_template.render_cached(app_yaml_file,
+                                           lambda placeholder: _get_env_value(resource_index, placeholder),
+                                           index_version)
+
+
+def is_app_ready(app_url, app_id='', timeout=constants.READINESS_TIMEOUT):
+    """Wait up to timeout seconds for app_url to respond. See readiness.ReadinessProber."""
+    return readiness.prober.wait_until_ready(app_url, app_id=app_id, timeout=timeout)
 
 
 def save_image_tag(tag, app_info, file_name='container_id.txt'):
@@ -246,47 +254,37 @@ def get_df_dir(cont_info):
 
 
 def get_image_uri(app_info):
-    image_uri = ''
-    app_yaml_def = read_app_yaml(app_info)
-    image_uri = app_yaml_def['app']['image']
-    return image_uri
+    return get_app_definition(app_info).image
 
 
 def get_app_port(app_info):
     app_port = []
-    app_yaml_def = read_app_yaml(app_info)
-    if 'container_port' in app_yaml_def['app']:
-        app_port.append(app_yaml_def['app']['container_port'])
-    if 'host_port' in app_yaml_def['app']:
-        app_port.append(app_yaml_def['app']['host_port'])
+    app_def = get_app_definition(app_info)
+    if app_def.container_port is not None:
+        app_port.append(app_def.container_port)
+    if app_def.host_port is not None:
+        app_port.append(app_def.host_port)
     else:
         app_port.append(80)
     return app_port
 
 
 def get_app_memory(app_info):
-    app_memory = ''
-    app_yaml_def = read_app_yaml(app_info)
-    if 'memory' in app_yaml_def['app']:
-        app_memory = app_yaml_def['app']['memory']
-    return app_memory
+    return get_app_definition(app_info).memory
 
 
 def get_app_cpu(app_info):
-    app_cpu = ''
-    app_yaml_def = read_app_yaml(app_info)
-    if 'cpu' in app_yaml_def['app']:
-        app_cpu = app_yaml_def['app']['cpu']
-    return app_cpu
+    return get_app_definition(app_info).cpu
+
+
+def get_app_replicas(app_info):
+    return get_app_definition(app_info).replicas
 
 
 def get_coe_type(env_id):
     coe_type = ''
     env_obj = env_db.Environment().get(env_id)
-    env_definition = ast.literal_eval(env_obj.env_definition)
-    env_details = env_definition['environment']
-    if 'app_deployment' in env_details:
-        coe_type = env_details['app_deployment']['type']
+    coe_type = env_definition.get(env_obj).coe_type
     return coe_type
 
 
@@ -319,15 +317,13 @@ def execute_cmd(cmd):
     return err, output
 
 
-def filter_error_output(output):
-    error_lines = []
-    output_lines = output.split("\n")
-    for line in output_lines:
-        if line.lower().find("error") >= 0:
-            error_lines.append(line)
-
-    error_output = ' '.join(error_lines)
-    return error_output
+def filter_error_output(output, tools=None):
+    """Return the error lines of output, or its last lines if none is recognized."""
+    events = log_classifier.find_errors(output, tools)
+    if events:
+        return ' '.join([event.line for event in events])
+    lines = [line.strip() for line in output.split("\n") if line.strip()]
+    return ' '.join(lines[-constants.ERROR_OUTPUT_FALLBACK_LINES:])
 
 def get_cont_names(doc, cont_name_set):
     try:
@@ -344,30 +340,8 @@ def get_cont_names(doc, cont_name_set):
         fmlogging.error(str(e))
     return cont_name_set
 
-def are_new_log_lines(logs, log_lines_list):
-    new_lines_found = False
-
-    new_lines = []
-    lines = logs[0].split("\n")
-    for line in lines:
-        if line not in log_lines_list:
-            new_lines.append(line)
-
-    if new_lines:
-        new_lines_found = True
-    return new_lines_found, new_lines
-
-def is_error_in_log_lines(logs):
-    error_found = False
-    error_line = ''
-    lines = logs[0].split('\n')
-    for line in lines:
-        if ( line.lower().find("error") >= 0 or
-             line.lower().find("failure") >= 0 or
-             line.lower().find("failed") >= 0 or
-             line.lower().find("rollback") >= 0):
-            error_found = True
-            error_line = line
-            break
-
-    return error_found, error_line
+def is_error_in_log_lines(logs, tools=None):
+    events = log_classifier.find_errors(logs[0], tools)
+    if events:
+        return True, events[0].line
+    return False, ''
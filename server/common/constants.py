@@ -20,6 +20,9 @@ GOOGLE_CREDS_PATH = APP_STORE_PATH + "/google-creds"
 
 LOG_FILE_NAME = "cld.log"
 
+# Lines of a failed command's output reported when no error line is recognized.
+ERROR_OUTPUT_FALLBACK_LINES = 3
+
 SETTING_UP_APP = "SETTING_UP_APP"
 BUILDING_APP = "BUILDING_APP"
 
@@ -70,3 +73,97 @@ AWS_SETUP_INCORRECT = AWS_SETUP_INCORRECT + "AWS setup includes following files:
 AWS_SETUP_INCORRECT = AWS_SETUP_INCORRECT + "Please do AWS setup (http://docs.aws.amazon.com/cli/latest/userguide/installing.html) and then continue."
 
 CONTAINER_READY = "container-ready"
+
+# Built image garbage collection
+IMAGE_GC_INTERVAL = 3600
+IMAGE_GC_DISK_BUDGET = 10 * 1024 * 1024 * 1024
+IMAGE_GC_KEEP_VERSIONS = 3
+TRANSIENT_IMAGE_TTL = 3600
+
+# Minimal build contexts for generated Dockerfiles
+BUILD_CONTEXT_PATH = APP_STORE_PATH + "/build-contexts"
+AWS_CREDS_PATH = home_dir + "/.aws"
+GCLOUD_CREDS_PATH = home_dir + "/.config/gcloud"
+
+# Image pushes to remote registries
+IMAGE_PUSH_CONCURRENCY = 2
+IMAGE_PUSH_RETRIES = 3
+IMAGE_PUSH_BACKOFF = 2
+REGISTRY_LOGIN_TTL = 1800
+
+# Number of parsed app yaml definitions kept in memory
+APP_YAML_CACHE_SIZE = 128
+
+# Upper limit on the replicas of an app, in the app yaml or through a scale request.
+APP_MAX_REPLICAS = 100
+
+# Multi container app manifests with resolved $CLOUDARK_ placeholders
+RENDERED_MANIFEST_PATH = APP_STORE_PATH + "/rendered-manifests"
+
+# App readiness probing
+READINESS_WORKERS = 4
+READINESS_TIMEOUT = 600
+READINESS_SUCCESS_THRESHOLD = 3
+READINESS_INTERVAL = 1
+READINESS_MAX_INTERVAL = 15
+READINESS_REQUEST_TIMEOUT = 5
+
+# Content addressed store for the files of uploaded apps
+OBJECT_STORE_PATH = APP_STORE_PATH + "/objects"
+
+# Retention and compaction of the deployment store
+ENV_STORE_PATH = APP_STORE_PATH + "/environments"
+STORE_KEEP_VERSIONS = 3
+STORE_COMPACT_INTERVAL = 3600
+STORE_ORPHAN_GRACE = 3600
+STORE_LOGS_TTL = 24 * 3600
+RENDERED_MANIFEST_TTL = 7 * 24 * 3600
+
+# ECS cluster provisioning through the AWS APIs. Set ECS_PROVISIONER, or
+# 'provisioner' in an environment's app_deployment, to 'ecs-cli' to use ecs-cli.
+ECS_PROVISIONER = 'native'
+ECS_INSTANCE_PROFILE = 'ecsInstanceRole'
+ECS_AMI_PARAMETER = '/aws/service/ecs/optimized-ami/amazon-linux/recommended/image_id'
+ECS_CLUSTER_TIMEOUT = 900
+ECS_IAM_PROPAGATION_RETRIES = 6
+
+# 'shared': an environment's apps share one load balancer, with a listener
+# rule per app. 'per-app': every app gets its own load balancer. Can be set
+# per environment with 'load_balancer' in app_deployment.
+ECS_LOAD_BALANCER = 'shared'
+ECS_RULE_PRIORITY_RETRIES = 5
+
+# Rolling redeploys of ECS services
+ECS_DEPLOYMENT_TIMEOUT = 900
+ECS_DEPLOYMENT_MAX_FAILED_TASKS = 3
+ECS_DEREGISTER_CONCURRENCY = 4
+
+# ECS task and service states are polled for all waiters of a cluster
+# together, once per ECS_STATE_POLL_INTERVAL seconds.
+ECS_STATE_POLL_INTERVAL = 2
+ECS_STATE_TIMEOUT = 600
+
+# Target tracking auto scaling of ECS services. Keys of an app yaml's
+# autoscaling section and the predefined metrics they track.
+AUTOSCALING_METRICS = {'cpu': 'ECSServiceAverageCPUUtilization',
+                       'memory': 'ECSServiceAverageMemoryUtilization',
+                       'requests_per_target': 'ALBRequestCountPerTarget'}
+AUTOSCALING_SCALE_IN_COOLDOWN = 300
+AUTOSCALING_SCALE_OUT_COOLDOWN = 60
+
+# ECS task sizing and placement. Memory is the hard limit in MB.
+ECS_DEFAULT_MEMORY = 250
+ECS_DEFAULT_PLACEMENT_STRATEGY = [{'type': 'spread', 'field': 'attribute:ecs.availability-zone'},
+                                  {'type': 'binpack', 'field': 'memory'}]
+ECS_PLACEMENT_STRATEGY_TYPES = ['random', 'spread', 'binpack']
+ECS_PLACEMENT_CONSTRAINT_TYPES = ['distinctInstance', 'memberOf']
+
+# Logs of ECS apps. Logs are collected from the container instances over ssh
+# by one runner container, from up to ECS_LOG_COLLECTION_CONCURRENCY
+# instances at a time. Apps with 'log_driver: awslogs' in their yaml send
+# their output to CloudWatch Logs instead, to a log group per cluster.
+ECS_LOG_DRIVERS = ['awslogs']
+ECS_LOG_RUNNER_IMAGE = 'cloudark-ecs-log-runner'
+ECS_LOG_COLLECTION_CONCURRENCY = 10
+ECS_LOG_GROUP_PREFIX = '/cloudark/'
+ECS_LOG_RETENTION_DAYS = 7
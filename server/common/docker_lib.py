@@ -1,10 +1,36 @@
 import common_functions
+import constants
 import fm_logger
+import os
+import pipes
+import re
+import shutil
 import subprocess
+import tempfile
 import time
 
+from server.dbmodule.objects import image as image_db
+
 fmlogging = fm_logger.Logging()
 
+TRANSIENT_IMAGE = 'transient'
+VERSIONED_IMAGE = 'versioned'
+
+# Per layer status line printed by docker push, e.g. '5f70bf18a086: Pushed'
+LAYER_STATUS = re.compile(r'^([0-9a-f]{12}): (.+)$')
+
+# Directories never copied into a build context, e.g. gcloud's own logs.
+CONTEXT_SKIP_DIRS = ['logs']
+
+
+def split_image_name(tagged_name):
+    """Split 'repo:tag' into (repo, tag). Registry ports are not mistaken for tags."""
+    tagged_name = tagged_name.strip()
+    name, sep, tag = tagged_name.rpartition(":")
+    if not sep or tag.find("/") >= 0:
+        return tagged_name, ''
+    return name, tag
+
     
 class DockerLib(object):
     """Helper class for running Docker commands."""
@@ -80,23 +106,154 @@ class DockerLib(object):
         err, output = common_functions.execute_cmd(login_cmd)
         return err, output
 
-    def build_container_image(self, cont_name, docker_file_name, df_context='', tag=''):
-        """Build container image."""
+    def build_container_image(self, cont_name, docker_file_name, df_context='', tag='', cache_from=''):
+        """Build container image.
+
+        If cache_from is given, that image is used as the layer cache source
+        so layers which did not change since the previous version are reused.
+        """
+        image_name = cont_name
         if tag:
-            build_cmd = ("docker build -t {cont_name}:{tag} -f "
-                         "{docker_file_name} "
-                         "{df_context}").format(cont_name=cont_name,
-                                                docker_file_name=docker_file_name,
-                                                df_context=df_context,
-                                                tag=tag)
-        else:
-            build_cmd = ("docker build -t {cont_name} -f {docker_file_name} {df_context}").format(cont_name=cont_name,
-                                                                                                  docker_file_name=docker_file_name,
-                                                                                                  df_context=df_context)
+            image_name = ("{cont_name}:{tag}").format(cont_name=cont_name, tag=tag)
+
+        cache_opts = ''
+        if cache_from:
+            cache_opts = ("--cache-from {cache_from} ").format(cache_from=cache_from)
+        if os.environ.get('DOCKER_BUILDKIT') == '1':
+            # Embed cache metadata so the image can be a cache source after it is pushed.
+            cache_opts = cache_opts + "--build-arg BUILDKIT_INLINE_CACHE=1 "
+
+        build_cmd = ("docker build -t {image_name} {cache_opts}-f {docker_file_name} "
+                     "{df_context}").format(image_name=image_name,
+                                            cache_opts=cache_opts,
+                                            docker_file_name=docker_file_name,
+                                            df_context=df_context)
         fmlogging.debug("Docker build cmd:%s" % build_cmd)
         err, output = common_functions.execute_cmd(build_cmd)
+        self._track_image(cont_name, tag)
         return err, output
 
+    def build_image_from_files(self, cont_name, df, context_files=None, tag=''):
+        """Build container image from Dockerfile contents using a minimal context.
+
+        context_files maps a path inside the build context to a file or
+        directory on disk. Only those entries and the Dockerfile are sent to
+        the docker daemon. The context is removed once the build is done.
+        """
+        if not os.path.exists(constants.BUILD_CONTEXT_PATH):
+            os.makedirs(constants.BUILD_CONTEXT_PATH)
+        context_dir = tempfile.mkdtemp(prefix=cont_name.replace("/", "-") + "-",
+                                       dir=constants.BUILD_CONTEXT_PATH)
+        try:
+            for context_path, source_path in (context_files or {}).iteritems():
+                self._add_to_context(source_path, os.path.join(context_dir, context_path))
+
+            df_name = context_dir + "/Dockerfile"
+            fp = open(df_name, "w")
+            fp.write(df)
+            fp.close()
+
+            err, output = self.build_container_image(cont_name, df_name,
+                                                     df_context=context_dir, tag=tag)
+        finally:
+            shutil.rmtree(context_dir, ignore_errors=True)
+        return err, output
+
+    def get_creds_context(self, cloud):
+        """Return context_files entry for the credentials of the given cloud."""
+        if cloud == constants.AWS:
+            return {'aws-creds': constants.AWS_CREDS_PATH}
+        return {'google-creds/gcloud': constants.GCLOUD_CREDS_PATH}
+
+    def _add_to_context(self, source_path, target_path):
+        if not os.path.isdir(source_path):
+            self._link_file(source_path, target_path)
+            return
+        for root, dirs, files in os.walk(source_path):
+            dirs[:] = [d for d in dirs if d not in CONTEXT_SKIP_DIRS]
+            target_dir = os.path.normpath(os.path.join(target_path,
+                                                       os.path.relpath(root, source_path)))
+            for file_name in files:
+                self._link_file(os.path.join(root, file_name),
+                                os.path.join(target_dir, file_name))
+
+    def _link_file(self, source_file, target_file):
+        # Hard links avoid copying when the context is on the same filesystem.
+        target_dir = os.path.dirname(target_file)
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        source_file = os.path.realpath(source_file)
+        try:
+            os.link(source_file, target_file)
+        except OSError:
+            shutil.copy2(source_file, target_file)
+
+    def get_latest_image(self, cont_name):
+        """Return the most recently built version of cont_name that is available locally."""
+        latest = ''
+        try:
+            image_list = image_db.Image().get_images_for_name(cont_name) or []
+            image_list = [image for image in image_list if image.kind == VERSIONED_IMAGE]
+            image_list.sort(key=lambda x: x.created_at, reverse=True)
+            for image in image_list:
+                tagged_name = image_db.Image.tagged_name(image)
+                if self.get_image_size(tagged_name) >= 0:
+                    latest = tagged_name
+                    break
+        except Exception as e:
+            fmlogging.error("Error encountered in finding latest image for %s: %s" % (cont_name, e))
+        return latest
+
+    def get_image_size(self, tagged_name):
+        """Return size of a local image in bytes, or -1 if the image does not exist."""
+        inspect_cmd = ("docker inspect --format '{{{{.Size}}}}' {tagged_name}").format(tagged_name=tagged_name)
+        err, output = common_functions.execute_cmd(inspect_cmd)
+        try:
+            return int(output.strip())
+        except ValueError:
+            return -1
+
+    def _track_image(self, cont_name, tag):
+        # Images built with a tag are app/container versions; untagged builds
+        # are one-off helper images that are expected to be removed right away.
+        tagged_name = cont_name + ":" + tag if tag else cont_name
+        size = self.get_image_size(tagged_name)
+        if size < 0:
+            return
+        now = int(time.time())
+        try:
+            image_obj = image_db.Image().get_by_name(cont_name, tag)
+            if image_obj:
+                image_db.Image().update(image_obj.id, {'size': size, 'last_used': now})
+            else:
+                image_data = {}
+                image_data['name'] = cont_name
+                image_data['tag'] = tag
+                image_data['kind'] = VERSIONED_IMAGE if tag else TRANSIENT_IMAGE
+                image_data['size'] = size
+                image_data['created_at'] = now
+                image_db.Image().insert(image_data)
+        except Exception as e:
+            fmlogging.error("Error encountered in tracking image %s: %s" % (tagged_name, e))
+
+    def _untrack_image(self, tagged_name):
+        name, tag = split_image_name(tagged_name)
+        try:
+            image_obj = image_db.Image().get_by_name(name, tag)
+            if image_obj:
+                image_db.Image().delete(image_obj.id)
+        except Exception as e:
+            fmlogging.error("Error encountered in untracking image %s: %s" % (tagged_name, e))
+
+    def _touch_image(self, tagged_name):
+        name, tag = split_image_name(tagged_name)
+        try:
+            image_obj = image_db.Image().get_by_name(name, tag)
+            if image_obj:
+                image_db.Image().update(image_obj.id, {'last_used': int(time.time())})
+        except Exception as e:
+            fmlogging.error("Error encountered in updating image %s: %s" % (tagged_name, e))
+
     def custom_docker_build(self):
         from io import BytesIO
         from docker import Client
@@ -131,13 +288,40 @@ class DockerLib(object):
         rm_cmd = ("docker rmi -f {cont_name}").format(cont_name=cont_name)
         fmlogging.debug("rm command:%s" % rm_cmd)
         err, output = common_functions.execute_cmd(rm_cmd)
+        if not err:
+            self._untrack_image(cont_name)
         return err, output
 
-    def push_container(self, cont_name):
-        """Push container to a registry."""
+    def push_container(self, cont_name, progress_callback=None):
+        """Push container to a registry.
+
+        If progress_callback is given it is called with (layer_id, status)
+        for every layer status line that docker push prints.
+        """
         push_cmd = ("docker push {cont_name}").format(cont_name=cont_name)
         fmlogging.debug("Docker push cmd:%s" % push_cmd)
-        err, output = common_functions.execute_cmd(push_cmd)
+        if not progress_callback:
+            err, output = common_functions.execute_cmd(push_cmd)
+        else:
+            # stderr goes to the same pipe, so that a chatty stderr cannot
+            # block the push while stdout is being read.
+            proc = subprocess.Popen(push_cmd, stdout=subprocess.PIPE,
+                                    stderr=subprocess.STDOUT, shell=True)
+            output_lines = []
+            other_lines = []
+            for line in iter(proc.stdout.readline, ''):
+                output_lines.append(line)
+                match = LAYER_STATUS.match(line.strip())
+                if match:
+                    progress_callback(match.group(1), match.group(2).split("[")[0].strip())
+                elif line.strip():
+                    other_lines.append(line)
+            proc.wait()
+            output = ''.join(output_lines)
+            err = ''
+            if proc.returncode != 0:
+                err = ''.join(other_lines) or ("docker push exited with {code}").format(code=proc.returncode)
+        self._touch_image(cont_name)
         return err, output
 
     def run_container(self, cont_name):
@@ -145,6 +329,7 @@ class DockerLib(object):
         run_cmd = ("docker run -i -d --publish-all=true {cont_name}").format(cont_name=cont_name)
         fmlogging.debug("Docker run cmd:%s" % run_cmd)
         err, output = common_functions.execute_cmd(run_cmd)
+        self._touch_image(cont_name)
         return err, output
 
     def run_container_with_env(self, cont_name, env_vars_dict):
@@ -159,6 +344,7 @@ class DockerLib(object):
             cont_name=cont_name)
         fmlogging.debug("Docker run cmd:%s" % run_cmd)
         err, output = common_functions.execute_cmd(run_cmd)
+        self._touch_image(cont_name)
         return err, output
 
     def run_container_sync(self, cont_name):
@@ -168,6 +354,22 @@ class DockerLib(object):
         err, output = common_functions.execute_cmd(run_cmd)
         return err, output
 
+    def run_container_with_volumes(self, cont_name, volumes, args=None):
+        """Run container in synchronous manner and remove it once it exits.
+
+        volumes maps a host path to its mount point in the container, which
+        may end with ':ro'. args are passed to the container's entrypoint.
+        """
+        volume_string = ""
+        for host_path, cont_path in sorted(volumes.iteritems()):
+            volume_string = volume_string + "-v " + pipes.quote(host_path + ":" + cont_path) + " "
+        arg_string = " ".join([pipes.quote(str(arg)) for arg in args or []])
+        run_cmd = ("docker run --rm {volume_string}{cont_name} {arg_string}").format(
+            volume_string=volume_string, cont_name=cont_name, arg_string=arg_string)
+        fmlogging.debug("Docker run cmd:%s" % run_cmd)
+        err, output = common_functions.execute_cmd(run_cmd)
+        return err, output
+
     def stop_container(self, cont_id, reason_phrase=''):
         """Stop container."""
         fmlogging.debug("Stopping container %s. Reason: %s" % (cont_id, reason_phrase))
@@ -206,6 +408,41 @@ class DockerLib(object):
 
         return err, output
 
+    def follow_logs(self, cont_id, since=''):
+        """Yield (timestamp, line) tuples for container logs as they are produced.
+
+        Runs 'docker logs --follow --timestamps' so lines are streamed as the
+        container writes them and the generator ends when the container exits.
+        The timestamp of the last line seen can be passed back as 'since' to
+        resume following without re-reading lines already consumed.
+        """
+        fmlogging.debug("Following container logs %s since %s" % (cont_id, since))
+        logs_cmd = "docker logs --follow --timestamps"
+        if since:
+            logs_cmd = ("{logs_cmd} --since {since}").format(logs_cmd=logs_cmd, since=since)
+        logs_cmd = ("{logs_cmd} {cont_id}").format(logs_cmd=logs_cmd, cont_id=cont_id)
+        fmlogging.debug("logs command:%s" % logs_cmd)
+
+        proc = subprocess.Popen(logs_cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT, shell=True)
+        try:
+            for line in iter(proc.stdout.readline, ''):
+                line = line.rstrip("\n")
+                parts = line.split(" ", 1)
+                if len(parts) == 2:
+                    timestamp, line = parts
+                else:
+                    timestamp = since
+                if timestamp == since:
+                    # --since is inclusive; skip the line the cursor points at.
+                    continue
+                since = timestamp
+                yield timestamp, line
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+
     def filter_output(self, output):
         output_lines = []
         start = False
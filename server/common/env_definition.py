@@ -0,0 +1,165 @@
+import ast
+import threading
+
+import exceptions
+import fm_logger
+
+fmlogging = fm_logger.Logging()
+
+TARGETS = ['aws', 'gcloud', 'local']
+LOAD_BALANCER_MODES = ['shared', 'per-app']
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _fail(message):
+    raise exceptions.EnvironmentDefinitionValidationFailure(message)
+
+
+class EnvironmentDefinition(object):
+    """Validated environment definition.
+
+    environment:
+       resources:
+          aws:
+            - resource:
+                type: rds
+       app_deployment:
+         target: aws
+         type: ecs
+         cluster_size: 1
+
+    The definition is checked when the object is created, so handlers can
+    read its fields without checking for missing keys.
+    EnvironmentDefinitionValidationFailure is raised for invalid definitions.
+    """
+
+    def __init__(self, definition):
+        self.definition = definition
+        self._validate()
+
+    def _validate(self):
+        if not isinstance(self.definition, dict) or not isinstance(self.definition.get('environment'), dict):
+            _fail("'environment' section is required.")
+        env = self.definition['environment']
+        if 'app_deployment' not in env and 'resources' not in env:
+            _fail("'app_deployment' or 'resources' is required.")
+
+        if 'app_deployment' in env:
+            deployment = env['app_deployment']
+            if not isinstance(deployment, dict):
+                _fail("'app_deployment' must be a mapping.")
+            if deployment.get('target') not in TARGETS:
+                _fail(("app_deployment target must be one of {targets}.").format(targets=', '.join(TARGETS)))
+            if not deployment.get('type'):
+                _fail("app_deployment type is required.")
+            cluster_size = deployment.get('cluster_size', 1)
+            if not isinstance(cluster_size, (int, long)) or isinstance(cluster_size, bool) or cluster_size < 1:
+                _fail("app_deployment cluster_size must be a positive integer.")
+            if deployment.get('load_balancer', 'shared') not in LOAD_BALANCER_MODES:
+                _fail(("app_deployment load_balancer must be one of {modes}.").format(
+                    modes=', '.join(LOAD_BALANCER_MODES)))
+
+        if 'resources' in env:
+            if not isinstance(env['resources'], dict):
+                _fail("'resources' must be a mapping of cloud to resource list.")
+            for cloud, resource_list in env['resources'].items():
+                if cloud not in TARGETS:
+                    _fail(("Unknown resource cloud {cloud}.").format(cloud=cloud))
+                if not isinstance(resource_list, list):
+                    _fail(("Resources of {cloud} must be a list.").format(cloud=cloud))
+                for resource_def in resource_list:
+                    if (not isinstance(resource_def, dict) or not isinstance(resource_def.get('resource'), dict)
+                        or not resource_def['resource'].get('type')):
+                        _fail(("Every {cloud} resource needs a 'resource' section with a type.").format(cloud=cloud))
+
+        if self.target == 'gcloud' or self.get_resources('gcloud'):
+            if not self.project:
+                _fail("Google cloud project is required.")
+            if not self.zone:
+                _fail("Google cloud zone is required.")
+
+    @property
+    def app_deployment(self):
+        return self.definition['environment'].get('app_deployment', {})
+
+    @property
+    def target(self):
+        return self.app_deployment.get('target', '')
+
+    @property
+    def coe_type(self):
+        return self.app_deployment.get('type', '')
+
+    @property
+    def cluster_size(self):
+        return self.app_deployment.get('cluster_size', 1)
+
+    @property
+    def instance_type(self):
+        return self.app_deployment.get('instance_type', '')
+
+    @property
+    def provisioner(self):
+        return self.app_deployment.get('provisioner', '')
+
+    @property
+    def load_balancer(self):
+        return self.app_deployment.get('load_balancer', '')
+
+    @property
+    def resources(self):
+        return self.definition['environment'].get('resources', {})
+
+    def get_resources(self, cloud):
+        """Return the resource sections of a cloud's resources."""
+        return [resource_def['resource'] for resource_def in self.resources.get(cloud, [])]
+
+    def _gcloud_setting(self, key):
+        if key in self.app_deployment:
+            return self.app_deployment[key]
+        for resource in self.get_resources('gcloud'):
+            if key in resource:
+                return resource[key]
+        return ''
+
+    @property
+    def project(self):
+        return self._gcloud_setting('project')
+
+    @property
+    def zone(self):
+        return self._gcloud_setting('zone')
+
+
+def parse(env_definition):
+    """Return the EnvironmentDefinition of a definition dict or its stored string form."""
+    if isinstance(env_definition, basestring):
+        try:
+            env_definition = ast.literal_eval(env_definition)
+        except (ValueError, SyntaxError):
+            _fail("Definition could not be parsed.")
+    return EnvironmentDefinition(env_definition)
+
+
+def get(env_obj):
+    """Return the EnvironmentDefinition of an environment record.
+
+    Definitions are cached by environment id and parsed again only if the
+    stored definition changes.
+    """
+    with _cache_lock:
+        cached = _cache.get(env_obj.id)
+        if cached and cached[0] == env_obj.env_definition:
+            return cached[1]
+
+    env_def = parse(env_obj.env_definition)
+    with _cache_lock:
+        _cache[env_obj.id] = (env_obj.env_definition, env_def)
+    return env_def
+
+
+def forget(env_id):
+    with _cache_lock:
+        _cache.pop(env_id, None)
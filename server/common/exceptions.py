@@ -46,3 +46,82 @@ class HostPortConflictException(AppDeploymentValidationFailure):
 
     def get_message(self):
         return self.message
+
+
+class HostPortChanged(AppDeploymentValidationFailure):
+
+    def __init__(self, host_port, new_host_port):
+        self.message = ("Host port cannot be changed on redeploy: app uses {host_port}, "
+                        "got {new_host_port}. Delete and deploy the app instead.").format(
+            host_port=host_port, new_host_port=new_host_port)
+
+    def get_message(self):
+        return self.message
+
+
+class InvalidReplicaCount(AppDeploymentValidationFailure):
+
+    def __init__(self, replicas, max_replicas):
+        self.message = ("Replicas must be an integer between 0 and {max}, got {replicas}.").format(
+            max=max_replicas, replicas=replicas)
+
+    def get_message(self):
+        return self.message
+
+
+class InvalidAutoScalingPolicy(AppDeploymentValidationFailure):
+
+    def __init__(self, message):
+        self.message = ("Invalid autoscaling section: {msg}").format(msg=message)
+
+    def get_message(self):
+        return self.message
+
+
+class InvalidTaskResources(AppDeploymentValidationFailure):
+
+    def __init__(self, message):
+        self.message = ("Invalid task resources: {msg}").format(msg=message)
+
+    def get_message(self):
+        return self.message
+
+
+class InvalidRouting(AppDeploymentValidationFailure):
+
+    def __init__(self, message):
+        self.message = ("Invalid routing: {msg}").format(msg=message)
+
+    def get_message(self):
+        return self.message
+
+
+class ScalingNotSupported(AppDeploymentValidationFailure):
+
+    def __init__(self, coe_type):
+        self.message = ("Scaling is not supported for apps deployed to {coe_type}.").format(coe_type=coe_type)
+
+    def get_message(self):
+        return self.message
+
+
+class EnvironmentDefinitionValidationFailure(Exception):
+
+    def __init__(self, message):
+        self.message = ("Invalid environment definition: {msg}").format(msg=message)
+
+    def get_message(self):
+        return self.message
+
+
+class ECSClusterProvisioningFailure(Exception):
+
+    def __init__(self, phase, error):
+        self.phase = phase
+        self.message = ("{phase}: {error}").format(phase=phase, error=error)
+
+    def get_message(self):
+        return self.message
+
+    def __str__(self):
+        return self.message
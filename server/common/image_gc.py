@@ -0,0 +1,137 @@
+import threading
+import time
+
+import common_functions
+import constants
+import docker_lib
+import fm_logger
+from server.dbmodule.objects import image as image_db
+
+fmlogging = fm_logger.Logging()
+
+
+def select_images_to_remove(images, in_use, now,
+                            disk_budget=constants.IMAGE_GC_DISK_BUDGET,
+                            keep_versions=constants.IMAGE_GC_KEEP_VERSIONS,
+                            transient_ttl=constants.TRANSIENT_IMAGE_TTL):
+    """Return the tracked images that should be removed.
+
+    - Transient (one-off helper) images that have not been used for
+      transient_ttl seconds are always removed.
+    - The keep_versions most recently built versions of every image name are
+      kept so that rollback remains possible.
+    - Images used by a running container are kept.
+    - If the remaining images exceed disk_budget bytes, the least recently
+      used of the versions that are not protected are removed until the
+      total fits in the budget.
+    """
+    to_remove = []
+    remaining = []
+    versions = {}
+    for image in images:
+        if image_db.Image.tagged_name(image) in in_use:
+            remaining.append(image)
+        elif image.kind == docker_lib.TRANSIENT_IMAGE:
+            if now - image.last_used >= transient_ttl:
+                to_remove.append(image)
+            else:
+                remaining.append(image)
+        else:
+            versions.setdefault(image.name, []).append(image)
+
+    candidates = []
+    for name, image_list in versions.items():
+        image_list.sort(key=lambda x: x.created_at, reverse=True)
+        remaining.extend(image_list)
+        candidates.extend(image_list[keep_versions:])
+
+    total_size = sum([image.size or 0 for image in remaining])
+    candidates.sort(key=lambda x: x.last_used)
+    for image in candidates:
+        if total_size <= disk_budget:
+            break
+        to_remove.append(image)
+        total_size = total_size - (image.size or 0)
+
+    return to_remove
+
+
+class ImageGarbageCollector(threading.Thread):
+    """Background collector for container images built by CloudARK.
+
+    Images are tracked in the image table by DockerLib when they are built,
+    run, pushed and removed.
+    """
+
+    def __init__(self, disk_budget=constants.IMAGE_GC_DISK_BUDGET,
+                 keep_versions=constants.IMAGE_GC_KEEP_VERSIONS,
+                 transient_ttl=constants.TRANSIENT_IMAGE_TTL,
+                 interval=constants.IMAGE_GC_INTERVAL):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.disk_budget = disk_budget
+        self.keep_versions = keep_versions
+        self.transient_ttl = transient_ttl
+        self.interval = interval
+        self.docker_handler = docker_lib.DockerLib()
+        self.lock = threading.Lock()
+        self.last_report = {}
+
+    def _local_images(self):
+        err, output = common_functions.execute_cmd("docker images --format '{{.Repository}}:{{.Tag}}'")
+        if err:
+            return None
+        return set([line.strip() for line in output.split("\n") if line.strip()])
+
+    def _images_in_use(self):
+        err, output = common_functions.execute_cmd("docker ps --format '{{.Image}}'")
+        return set([line.strip() for line in output.split("\n") if line.strip()])
+
+    def collect(self):
+        """Run one collection and return a report of what was reclaimed."""
+        with self.lock:
+            now = int(time.time())
+            images = image_db.Image().get_all() or []
+
+            # Drop inventory entries for images removed outside of CloudARK.
+            local_images = self._local_images()
+            tracked = []
+            for image in images:
+                name = image.name + ":" + (image.tag or 'latest')
+                if local_images is not None and name not in local_images:
+                    image_db.Image().delete(image.id)
+                else:
+                    tracked.append(image)
+
+            to_remove = select_images_to_remove(tracked, self._images_in_use(), now,
+                                                disk_budget=self.disk_budget,
+                                                keep_versions=self.keep_versions,
+                                                transient_ttl=self.transient_ttl)
+            removed = []
+            reclaimed = 0
+            for image in to_remove:
+                tagged_name = image_db.Image.tagged_name(image)
+                err, output = self.docker_handler.remove_container_image(tagged_name,
+                                                                         reason_phrase='image gc')
+                if err:
+                    fmlogging.error("Image gc could not remove %s: %s" % (tagged_name, err))
+                    continue
+                removed.append(tagged_name)
+                reclaimed = reclaimed + (image.size or 0)
+
+            report = {}
+            report['run_at'] = now
+            report['removed'] = removed
+            report['reclaimed_bytes'] = reclaimed
+            report['tracked_images'] = len(tracked) - len(removed)
+            self.last_report = report
+            fmlogging.debug("Image gc report: %s" % report)
+            return report
+
+    def run(self):
+        while True:
+            try:
+                self.collect()
+            except Exception as e:
+                fmlogging.error("Error encountered in image gc: %s" % e)
+            time.sleep(self.interval)
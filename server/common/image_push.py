@@ -0,0 +1,156 @@
+import threading
+import time
+
+import constants
+import docker_lib
+import fm_logger
+
+fmlogging = fm_logger.Logging()
+
+# Push errors that retrying will not fix.
+AUTH_ERRORS = ['denied', 'unauthorized', 'no basic auth credentials']
+PERMANENT_PUSH_ERRORS = AUTH_ERRORS + ['does not exist', 'not found', 'invalid reference format']
+
+
+def _find_any(err, patterns):
+    err = err.lower()
+    for pattern in patterns:
+        if err.find(pattern) >= 0:
+            return True
+    return False
+
+
+def is_login_error(err):
+    """docker login prints warnings on stderr even when the login succeeds."""
+    for line in err.split("\n"):
+        if line.strip() and not line.strip().startswith("WARNING!"):
+            return True
+    return False
+
+
+def get_registry(name):
+    """Return the registry host of an image name or a registry endpoint."""
+    if name.find("://") >= 0:
+        name = name.split("://", 1)[1]
+    return name.split("/")[0]
+
+
+def is_layer_done(status):
+    return (status == 'Pushed' or status == 'Layer already exists'
+            or status.startswith('Mounted from'))
+
+
+class ImagePushService(object):
+    """Pushes container images to remote registries.
+
+    At most max_concurrent pushes run at the same time across all handlers.
+    Failed pushes are retried with exponential backoff. A push of a tag that
+    is already being pushed waits for that push instead of starting another
+    one, and logins are shared between pushes to the same registry.
+    """
+
+    def __init__(self, max_concurrent=constants.IMAGE_PUSH_CONCURRENCY,
+                 retries=constants.IMAGE_PUSH_RETRIES,
+                 backoff=constants.IMAGE_PUSH_BACKOFF):
+        self.docker_handler = docker_lib.DockerLib()
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.retries = retries
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.login_lock = threading.Lock()
+        self.in_flight = {}
+        self.logins = {}
+
+    def login(self, registry, get_credentials):
+        """Log docker client into registry unless an earlier login can be reused.
+
+        get_credentials is only called when a new login is needed. It returns
+        a (username, password) tuple.
+        """
+        registry_host = get_registry(registry)
+        with self.login_lock:
+            logged_in_at = self.logins.get(registry_host)
+            if logged_in_at and time.time() - logged_in_at < constants.REGISTRY_LOGIN_TTL:
+                return '', ''
+            username, password = get_credentials()
+            err, output = self.docker_handler.docker_login(username, password, registry)
+            if err and is_login_error(err):
+                return err, output
+            self.logins[registry_host] = time.time()
+            return '', output
+
+    def forget_login(self, registry):
+        with self.login_lock:
+            self.logins.pop(get_registry(registry), None)
+
+    def push(self, tagged_image, exists_in_registry=None, progress_callback=None):
+        """Push tagged_image and return (err, output).
+
+        exists_in_registry is an optional callable that returns True if the tag
+        is already present in the registry, in which case nothing is pushed.
+        progress_callback is called with (layers_done, layers_total) whenever
+        another layer finishes.
+        """
+        with self.lock:
+            pending = self.in_flight.get(tagged_image)
+            owner = pending is None
+            if owner:
+                pending = {'done': threading.Event(), 'result': ('', '')}
+                self.in_flight[tagged_image] = pending
+
+        if not owner:
+            fmlogging.debug("Push of %s already in progress. Waiting for it." % tagged_image)
+            pending['done'].wait()
+            return pending['result']
+
+        try:
+            pending['result'] = self._push(tagged_image, exists_in_registry, progress_callback)
+        except Exception as e:
+            fmlogging.error("Exception encountered in pushing %s: %s" % (tagged_image, e))
+            pending['result'] = (str(e), '')
+        finally:
+            with self.lock:
+                del self.in_flight[tagged_image]
+            pending['done'].set()
+        return pending['result']
+
+    def _push(self, tagged_image, exists_in_registry, progress_callback):
+        if exists_in_registry and exists_in_registry():
+            fmlogging.debug("%s is already in the registry. Not pushing it again." % tagged_image)
+            return '', ''
+
+        layers = {}
+        progress = [0]
+
+        def _on_layer(layer_id, status):
+            # Layers pushed by an earlier attempt stay done when a retry starts over.
+            if is_layer_done(layers.get(layer_id, '')):
+                return
+            layers[layer_id] = status
+            done = len([s for s in layers.values() if is_layer_done(s)])
+            if progress_callback and done != progress[0]:
+                progress[0] = done
+                progress_callback(done, len(layers))
+
+        err, output = '', ''
+        for attempt in range(self.retries + 1):
+            if attempt > 0:
+                delay = self.backoff * (2 ** (attempt - 1))
+                fmlogging.debug("Retrying push of %s in %s seconds. Error: %s" % (tagged_image, delay, err))
+                time.sleep(delay)
+            with self.slots:
+                err, output = self.docker_handler.push_container(tagged_image,
+                                                                 progress_callback=_on_layer)
+            if not err:
+                fmlogging.debug("Pushed %s. %s layers." % (tagged_image, len(layers)))
+                return err, output
+            if _find_any(err, PERMANENT_PUSH_ERRORS):
+                if _find_any(err, AUTH_ERRORS):
+                    self.forget_login(tagged_image)
+                break
+
+        fmlogging.error("Could not push %s: %s" % (tagged_image, err))
+        return err, output
+
+
+push_service = ImagePushService()
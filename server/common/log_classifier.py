@@ -0,0 +1,136 @@
+import collections
+import re
+
+import fm_logger
+
+fmlogging = fm_logger.Logging()
+
+ECS_CLI = 'ecs-cli'
+CLOUDFORMATION = 'cloudformation'
+AWS_CLI = 'aws-cli'
+DOCKER = 'docker'
+GCLOUD = 'gcloud'
+KUBECTL = 'kubectl'
+
+# (rule name, pattern) pairs of lines that report an error, per tool.
+ERROR_RULES = {
+    ECS_CLI: [
+        ('ecs-cli-error', r'^(ERRO|FATA)\[\d+\]'),
+        ('ecs-cli-error', r'\blevel=(error|fatal)\b'),
+    ],
+    CLOUDFORMATION: [
+        ('stack-failed', r'\b(CREATE|UPDATE|DELETE)_FAILED\b'),
+        ('stack-rollback', r'\b(UPDATE_)?ROLLBACK_(IN_PROGRESS|COMPLETE|FAILED)\b'),
+    ],
+    AWS_CLI: [
+        ('aws-api-error', r'An error occurred \([A-Za-z0-9.]+\) when calling'),
+        ('aws-credentials', r'Unable to locate credentials|You must specify a region'),
+    ],
+    DOCKER: [
+        ('build-step-failed', r"The command .* returned a non-zero code"),
+        ('build-step-failed', r'\b(COPY|ADD) failed: '),
+        ('build-step-failed', r'\bERROR: failed to (solve|build)\b'),
+        ('docker-error', r'\b(docker: )?Error response from daemon:'),
+        ('docker-error', r'\berror (building|pulling|during connect)'),
+    ],
+    GCLOUD: [
+        ('gcloud-error', r'^ERROR: \(gcloud[.a-z-]*\)'),
+        ('gcloud-error', r'^ERROR:'),
+    ],
+    KUBECTL: [
+        ('kubectl-error', r'^error:'),
+        ('kubectl-error', r'^Error from server'),
+        ('pod-failed', r'\b(CrashLoopBackOff|ImagePullBackOff|ErrImagePull|CreateContainerConfigError)\b'),
+    ],
+}
+
+# Lines that mention errors without reporting one never produce an error event.
+BENIGN_RULES = [
+    r'\b0 (errors?|failures?)\b',
+    r'\bno errors?\b',
+    r'\b(error|failure)[_-](log|page|threshold|rate)\b',
+    r'--(rollback|on-failure|disable-rollback)',
+]
+
+ErrorEvent = collections.namedtuple('ErrorEvent', ['tool', 'rule', 'line_number', 'line'])
+
+
+def _compile(tools):
+    # All rules are combined into one pattern so that a line is scanned once.
+    # The rule that matched is found from the name of the group that matched.
+    alternatives = []
+    rule_names = {}
+    for tool in tools:
+        for rule, pattern in ERROR_RULES[tool]:
+            group = "r%s" % len(alternatives)
+            rule_names[group] = (tool, rule)
+            alternatives.append("(?P<{group}>{pattern})".format(group=group, pattern=pattern))
+    return re.compile("|".join(alternatives), re.IGNORECASE | re.MULTILINE), rule_names
+
+
+_benign = re.compile("|".join(BENIGN_RULES), re.IGNORECASE)
+_compiled = {}
+
+
+def _get_matcher(tools):
+    key = tuple(sorted(tools))
+    if key not in _compiled:
+        _compiled[key] = _compile(key)
+    return _compiled[key]
+
+
+class LogClassifier(object):
+    """Finds the error lines in the output of provisioning tools.
+
+    Output is passed to feed() as it arrives; only the new lines are
+    classified. A line that does not end with a newline yet is kept until
+    the rest of it is fed. Every error line found is returned as an
+    ErrorEvent and also kept in events.
+    """
+
+    def __init__(self, tools=None):
+        if not tools:
+            tools = ERROR_RULES.keys()
+        self.matcher, self.rule_names = _get_matcher(tools)
+        self.line_number = 0
+        self.partial = ''
+        self.events = []
+
+    def classify(self, line):
+        """Return the ErrorEvent for a single line, or None if it does not report an error."""
+        self.line_number = self.line_number + 1
+        match = self.matcher.search(line)
+        if not match or _benign.search(line):
+            return None
+        tool, rule = self.rule_names[match.lastgroup]
+        event = ErrorEvent(tool, rule, self.line_number, line.strip())
+        self.events.append(event)
+        fmlogging.debug("Error event %s" % str(event))
+        return event
+
+    def feed(self, output):
+        """Classify the complete lines of output and return the new ErrorEvents."""
+        lines = (self.partial + output).split("\n")
+        self.partial = lines.pop()
+        events = []
+        for line in lines:
+            event = self.classify(line)
+            if event:
+                events.append(event)
+        return events
+
+    def close(self):
+        """Classify the last line if it did not end with a newline."""
+        events = []
+        if self.partial:
+            event = self.classify(self.partial)
+            self.partial = ''
+            if event:
+                events.append(event)
+        return events
+
+
+def find_errors(output, tools=None):
+    """Return the ErrorEvents of a complete output."""
+    classifier = LogClassifier(tools)
+    return classifier.feed(output) + classifier.close()
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import re
+import yaml
+
+import constants
+import fm_logger
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader
+    from yaml import SafeDumper
+
+fmlogging = fm_logger.Logging()
+
+PLACEHOLDER = re.compile(r'\$CLOUDARK_[A-Za-z0-9]+_[A-Za-z0-9_]+')
+
+
+def _substitute(node, resolve):
+    if isinstance(node, dict):
+        return dict([(key, _substitute(value, resolve)) for key, value in node.items()])
+    if isinstance(node, list):
+        return [_substitute(value, resolve) for value in node]
+    if isinstance(node, basestring) and node.find("$CLOUDARK_") >= 0:
+        # Values stay strings, e.g. Kubernetes requires env values to be strings.
+        return PLACEHOLDER.sub(lambda match: str(resolve(match.group(0))), node)
+    return node
+
+
+def render(manifest_path, resolve, rendered_path):
+    """Render a multi document yaml manifest into rendered_path.
+
+    Every $CLOUDARK_<TYPE>_<PROPERTY> placeholder in a value is replaced with
+    resolve(placeholder); keys are not templated. Documents are read,
+    substituted and written one at a time, all into the single file
+    rendered_path. The output is re-serialized with SafeDumper, so comments
+    of the manifest are dropped and mapping keys come out sorted.
+    """
+    tmp_path = rendered_path + ".tmp"
+    src = open(manifest_path, "r")
+    dst = open(tmp_path, "w")
+    try:
+        docs = (_substitute(doc, resolve) for doc in yaml.load_all(src, Loader=SafeLoader))
+        yaml.dump_all(docs, dst, Dumper=SafeDumper, default_flow_style=False)
+    finally:
+        src.close()
+        dst.close()
+    os.rename(tmp_path, rendered_path)
+
+
+def render_cached(manifest_path, resolve, index_version):
+    """Render manifest_path unless it was already rendered for index_version.
+
+    Rendered manifests are stored under RENDERED_MANIFEST_PATH and named after
+    the hash of the manifest contents and the resource index version, so a
+    redeploy of an unchanged manifest against unchanged resources reuses the
+    earlier rendering. The source manifest is never modified.
+    """
+    fp = open(manifest_path, "rb")
+    manifest_hash = hashlib.sha1(fp.read()).hexdigest()
+    fp.close()
+
+    if not os.path.exists(constants.RENDERED_MANIFEST_PATH):
+        os.makedirs(constants.RENDERED_MANIFEST_PATH)
+    rendered_path = ("{path}/{manifest_hash}-{index_version}.yaml").format(
+        path=constants.RENDERED_MANIFEST_PATH,
+        manifest_hash=manifest_hash,
+        index_version=index_version)
+
+    if os.path.exists(rendered_path):
+        fmlogging.debug("Using rendered manifest %s" % rendered_path)
+        # The compactor expires rendered manifests by their last use.
+        os.utime(rendered_path, None)
+        return rendered_path
+
+    render(manifest_path, resolve, rendered_path)
+    fmlogging.debug("Rendered %s to %s" % (manifest_path, rendered_path))
+    return rendered_path
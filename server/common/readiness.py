@@ -0,0 +1,157 @@
+import heapq
+import itertools
+import threading
+import time
+
+import requests
+
+import constants
+import fm_logger
+from server.dbmodule.objects import app as app_db
+
+fmlogging = fm_logger.Logging()
+
+
+class Probe(object):
+    """Readiness check of one app URL."""
+
+    def __init__(self, url, app_id, timeout, success_threshold, interval, max_interval):
+        self.url = url
+        self.app_id = app_id
+        self.deadline = time.time() + timeout
+        self.success_threshold = success_threshold
+        self.interval = interval
+        self.max_interval = max_interval
+        self.delay = interval
+        self.next_at = time.time()
+        self.successes = 0
+        self.cancelled = False
+        self.ready = False
+        self.done = threading.Event()
+
+    def finish(self, ready):
+        self.ready = ready
+        self.done.set()
+
+
+class ReadinessProber(object):
+    """Probes app URLs until they respond, on a small pool of worker threads.
+
+    An app is ready after success_threshold consecutive responses with status
+    200 or 404. Probes are spaced interval seconds apart while they succeed;
+    after a failure the delay doubles up to max_interval. Each worker keeps
+    its own HTTP session so connections to an app are reused between probes.
+    A probe ends early when its app is cancelled or no longer exists.
+    """
+
+    def __init__(self, workers=constants.READINESS_WORKERS):
+        self.workers = workers
+        self.cond = threading.Condition()
+        self.queue = []
+        self.probes = set()
+        self.counter = itertools.count()
+        self.threads = []
+        self.local = threading.local()
+
+    def submit(self, url, app_id='', timeout=constants.READINESS_TIMEOUT,
+               success_threshold=constants.READINESS_SUCCESS_THRESHOLD,
+               interval=constants.READINESS_INTERVAL,
+               max_interval=constants.READINESS_MAX_INTERVAL):
+        """Start probing url and return the Probe. Probe.done is set when it ends."""
+        probe = Probe(url, app_id, timeout, success_threshold, interval, max_interval)
+        with self.cond:
+            if not self.threads:
+                for i in range(self.workers):
+                    worker = threading.Thread(target=self._run, name="readiness-%s" % i)
+                    worker.daemon = True
+                    worker.start()
+                    self.threads.append(worker)
+            self.probes.add(probe)
+            heapq.heappush(self.queue, (probe.next_at, next(self.counter), probe))
+            self.cond.notify()
+        return probe
+
+    def wait_until_ready(self, url, app_id='', **kwargs):
+        probe = self.submit(url, app_id=app_id, **kwargs)
+        probe.done.wait()
+        return probe.ready
+
+    def cancel(self, app_id):
+        """Stop all probes of an app. Waiting callers see the app as not ready."""
+        with self.cond:
+            for probe in list(self.probes):
+                if probe.app_id and probe.app_id == app_id:
+                    probe.cancelled = True
+                    probe.finish(False)
+                    self.probes.discard(probe)
+            self.cond.notify_all()
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _next_probe(self):
+        with self.cond:
+            while True:
+                if not self.queue:
+                    self.cond.wait()
+                    continue
+                next_at, count, probe = self.queue[0]
+                if probe.done.is_set():
+                    heapq.heappop(self.queue)
+                    continue
+                now = time.time()
+                if next_at <= now:
+                    heapq.heappop(self.queue)
+                    return probe
+                self.cond.wait(next_at - now)
+
+    def _check(self, probe):
+        if probe.cancelled:
+            return
+        if probe.app_id and not app_db.App().get(probe.app_id):
+            fmlogging.debug("App %s no longer exists. Stopping readiness probe." % probe.app_id)
+            probe.finish(False)
+            return
+        if time.time() > probe.deadline:
+            fmlogging.debug("Readiness probe of %s timed out." % probe.url)
+            probe.finish(False)
+            return
+
+        ok = False
+        try:
+            response = self._session().get(probe.url, timeout=constants.READINESS_REQUEST_TIMEOUT)
+            ok = response.status_code == 200 or response.status_code == 404
+        except Exception as e:
+            fmlogging.debug("Readiness probe of %s failed: %s" % (probe.url, e))
+
+        if ok:
+            probe.successes = probe.successes + 1
+            if probe.successes >= probe.success_threshold:
+                probe.finish(True)
+                return
+            probe.delay = probe.interval
+            probe.next_at = time.time() + probe.delay
+        else:
+            probe.successes = 0
+            probe.next_at = time.time() + probe.delay
+            probe.delay = min(probe.delay * 2, probe.max_interval)
+
+    def _run(self):
+        while True:
+            probe = self._next_probe()
+            try:
+                self._check(probe)
+            except Exception as e:
+                fmlogging.error("Error encountered in readiness probe of %s: %s" % (probe.url, e))
+                probe.finish(False)
+            with self.cond:
+                if probe.done.is_set():
+                    self.probes.discard(probe)
+                else:
+                    heapq.heappush(self.queue, (probe.next_at, next(self.counter), probe))
+                    self.cond.notify()
+
+
+prober = ReadinessProber()
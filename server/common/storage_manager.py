@@ -0,0 +1,294 @@
+import os
+import shutil
+import threading
+import time
+
+import constants
+import fm_logger
+from server.dbmodule.objects import app as app_db
+from server.dbmodule.objects import container as cont_db
+from server.dbmodule.objects import environment as env_db
+
+fmlogging = fm_logger.Logging()
+
+# Directories of APP_STORE_PATH that do not belong to an app or a container.
+RESERVED_DIRS = ['environments', 'containers', 'services', 'objects',
+                 'rendered-manifests', 'build-contexts']
+
+
+def dir_usage(path, seen=None):
+    """Return the bytes used by the files under path.
+
+    Hard linked files are counted once. Pass the same seen set to count files
+    shared between several directories only once.
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            key = (stat.st_dev, stat.st_ino)
+            if key not in seen:
+                seen.add(key)
+                total = total + stat.st_size
+    return total
+
+
+def _freed_bytes(path):
+    """Return the bytes that removing path gives back, i.e. files with no other links."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            if stat.st_nlink == 1:
+                total = total + stat.st_size
+    return total
+
+
+def _remove_tree(path):
+    freed = _freed_bytes(path)
+    shutil.rmtree(path, ignore_errors=True)
+    fmlogging.debug("Removed %s from the deployment store" % path)
+    return freed
+
+
+def _is_older(path, now, age):
+    try:
+        return os.lstat(path).st_mtime <= now - age
+    except OSError:
+        return False
+
+
+def select_versions_to_remove(versions, in_use, keep_versions=constants.STORE_KEEP_VERSIONS):
+    """Return the versions that are not among the keep_versions newest ones.
+
+    Version stamps sort in the order they were created. Versions in in_use
+    are never returned.
+    """
+    older = sorted(versions, reverse=True)[keep_versions:]
+    return [version for version in older if version not in in_use]
+
+
+def _store_path(name):
+    if not name or name in RESERVED_DIRS or name.find("/") >= 0 or name.startswith("."):
+        return None
+    return constants.APP_STORE_PATH + "/" + name
+
+
+def remove_app(name):
+    """Remove the stored versions of a deleted app or container.
+
+    Nothing is removed while an app or container of that name is still
+    recorded, e.g. because its delete failed.
+    """
+    path = _store_path(name)
+    if not path or not os.path.isdir(path):
+        return 0
+    if app_db.App().get_by_name(name) or cont_db.Container().get(name):
+        fmlogging.debug("%s is still in use. Not removing %s" % (name, path))
+        return 0
+    return _remove_tree(path)
+
+
+def remove_environment(location):
+    """Remove the directory of a deleted environment."""
+    if not location:
+        return 0
+    location = os.path.normpath(location)
+    if os.path.dirname(location) != os.path.normpath(constants.ENV_STORE_PATH):
+        fmlogging.error("Not removing %s. It is not an environment directory." % location)
+        return 0
+    if not os.path.isdir(location):
+        return 0
+    return _remove_tree(location)
+
+
+class StorageManager(threading.Thread):
+    """Background compactor of the deployment store (APP_STORE_PATH).
+
+    A compaction
+    - keeps the keep_versions newest versions of every app and container,
+      and the version that is deployed,
+    - removes directories of apps, containers and environments that are no
+      longer recorded,
+    - removes retrieved logs older than logs_ttl,
+    - removes blobs of the object store that no version links to anymore,
+    - expires rendered manifests and leftover build contexts.
+
+    Directories younger than orphan_grace are left alone since uploads are
+    stored before their app is recorded.
+    """
+
+    def __init__(self, keep_versions=constants.STORE_KEEP_VERSIONS,
+                 orphan_grace=constants.STORE_ORPHAN_GRACE,
+                 logs_ttl=constants.STORE_LOGS_TTL,
+                 rendered_ttl=constants.RENDERED_MANIFEST_TTL,
+                 interval=constants.STORE_COMPACT_INTERVAL):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.keep_versions = keep_versions
+        self.orphan_grace = orphan_grace
+        self.logs_ttl = logs_ttl
+        self.rendered_ttl = rendered_ttl
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.last_report = {}
+
+    def _compact_apps(self, now, removed):
+        names = set()
+        in_use = set()
+        for app in app_db.App().get_all() or []:
+            names.add(app.name)
+            if app.location:
+                in_use.add(os.path.normpath(app.location))
+        for cont in cont_db.Container().get_all() or []:
+            names.add(cont.name)
+            if cont.cont_store_path:
+                in_use.add(os.path.normpath(cont.cont_store_path))
+
+        freed = 0
+        for name in os.listdir(constants.APP_STORE_PATH):
+            path = _store_path(name)
+            if not path or not os.path.isdir(path):
+                continue
+            if name not in names:
+                if _is_older(path, now, self.orphan_grace):
+                    freed = freed + _remove_tree(path)
+                    removed.append(path)
+                continue
+
+            versions = [v for v in os.listdir(path) if os.path.isdir(path + "/" + v)]
+            in_use_versions = set([v for v in versions if path + "/" + v in in_use])
+            to_remove = select_versions_to_remove(versions, in_use_versions, self.keep_versions)
+            for version in versions:
+                version_path = path + "/" + version
+                if version in to_remove:
+                    freed = freed + _remove_tree(version_path)
+                    removed.append(version_path)
+                    continue
+                logs_path = version_path + "/logs"
+                if os.path.isdir(logs_path) and _is_older(logs_path, now, self.logs_ttl):
+                    freed = freed + _remove_tree(logs_path)
+                    removed.append(logs_path)
+        return freed
+
+    def _compact_environments(self, now, removed):
+        if not os.path.isdir(constants.ENV_STORE_PATH):
+            return 0
+        locations = set([os.path.normpath(env.location)
+                         for env in env_db.Environment().get_all() or [] if env.location])
+        freed = 0
+        for name in os.listdir(constants.ENV_STORE_PATH):
+            path = constants.ENV_STORE_PATH + "/" + name
+            if path not in locations and _is_older(path, now, self.orphan_grace):
+                freed = freed + _remove_tree(path)
+                removed.append(path)
+        return freed
+
+    def _expire(self, store_path, now, age, removed):
+        if not os.path.isdir(store_path):
+            return 0
+        freed = 0
+        for name in os.listdir(store_path):
+            path = store_path + "/" + name
+            if not _is_older(path, now, age):
+                continue
+            if os.path.isdir(path):
+                freed = freed + _remove_tree(path)
+            else:
+                freed = freed + os.lstat(path).st_size
+                os.remove(path)
+            removed.append(path)
+        return freed
+
+    def _compact_objects(self, now):
+        # A blob with a single link is not part of any stored version.
+        # put_blob refreshes the mtime of blobs it reuses, so the grace period
+        # also protects blobs that are about to be linked.
+        freed = 0
+        removed = 0
+        for root, dirs, files in os.walk(constants.OBJECT_STORE_PATH):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.lstat(path)
+                except OSError:
+                    continue
+                if stat.st_nlink == 1 and stat.st_mtime <= now - self.orphan_grace:
+                    os.remove(path)
+                    freed = freed + stat.st_size
+                    removed = removed + 1
+        return freed, removed
+
+    def compact(self):
+        """Run one compaction and return a report of what was reclaimed."""
+        with self.lock:
+            now = time.time()
+            removed = []
+            freed = 0
+            if os.path.isdir(constants.APP_STORE_PATH):
+                freed = freed + self._compact_apps(now, removed)
+            freed = freed + self._compact_environments(now, removed)
+            freed = freed + self._expire(constants.RENDERED_MANIFEST_PATH, now,
+                                         self.rendered_ttl, removed)
+            freed = freed + self._expire(constants.BUILD_CONTEXT_PATH, now,
+                                         self.orphan_grace, removed)
+            blob_bytes, blobs_removed = self._compact_objects(now)
+
+            report = {}
+            report['run_at'] = int(now)
+            report['removed'] = removed
+            report['removed_blobs'] = blobs_removed
+            report['reclaimed_bytes'] = freed + blob_bytes
+            self.last_report = report
+            fmlogging.debug("Storage compaction report: %s" % report)
+            return report
+
+    def usage(self):
+        """Return the disk usage of the deployment store per environment and app.
+
+        Every file is counted once, with the first directory it is found in.
+        """
+        seen = set()
+        report = {'environments': {}, 'containers': {}}
+        for env in env_db.Environment().get_all() or []:
+            env_bytes = 0
+            if env.location and os.path.isdir(env.location):
+                env_bytes = dir_usage(env.location, seen)
+            report['environments'][env.name] = {'bytes': env_bytes, 'apps': {}}
+
+        for app in app_db.App().get_all() or []:
+            path = _store_path(app.name)
+            app_bytes = 0
+            if path and os.path.isdir(path):
+                app_bytes = dir_usage(path, seen)
+            env_report = report['environments'].setdefault(app.env_name, {'bytes': 0, 'apps': {}})
+            env_report['apps'][app.name] = app_bytes
+            env_report['bytes'] = env_report['bytes'] + app_bytes
+
+        for cont in cont_db.Container().get_all() or []:
+            path = _store_path(cont.name)
+            if path and os.path.isdir(path):
+                report['containers'][cont.name] = dir_usage(path, seen)
+
+        # Blobs already counted through an app are not counted again.
+        if os.path.isdir(constants.OBJECT_STORE_PATH):
+            report['objects_bytes'] = dir_usage(constants.OBJECT_STORE_PATH, seen)
+        if os.path.isdir(constants.APP_STORE_PATH):
+            report['total_bytes'] = dir_usage(constants.APP_STORE_PATH)
+        return report
+
+    def run(self):
+        while True:
+            try:
+                self.compact()
+            except Exception as e:
+                fmlogging.error("Error encountered in storage compaction: %s" % e)
+            time.sleep(self.interval)
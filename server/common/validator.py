@@ -9,11 +9,15 @@ import yaml
 
 from os.path import expanduser
 
+import app_definition
 import common_functions
+import constants
+import env_definition
 import exceptions
 import fm_logger
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
+from server.dbmodule.objects import port as port_db
 from server.dbmodule.objects import resource as res_db
 
 home_dir = expanduser("~")
@@ -25,19 +29,137 @@ CONT_STORE_PATH = ("{home_dir}/.cld/data/deployments/containers").format(home_di
 fmlogging = fm_logger.Logging()
 
 
-def _validate_host_port(app_info, app_data, env_obj):
-    app_yaml = common_functions.read_app_yaml(app_info)
+def _validate_host_port(app_id, app_info, env_obj):
+    app_def = common_functions.get_app_definition(app_info)
 
     # Currently only validating for CloudARK's yaml format
-    if 'app' not in app_yaml:
+    if not app_def.app or app_def.host_port is None:
         return
-    apps = app_db.App().get_apps_for_env(env_obj.id)
-    for app in apps:
-        if app.output_config:
-            app_config = ast.literal_eval(app.output_config)
-            if 'host_port' in app_config and 'host_port' in app_yaml['app']:
-                if app_config['host_port'] == app_yaml['app']['host_port']:
-                    raise exceptions.HostPortConflictException(app_config['host_port'])
-
-def validate_app_deployment(app_info, app_data, env_obj):
-    _validate_host_port(app_info, app_data, env_obj)
+    # The port stays reserved until the app or the environment is deleted.
+    if not port_db.PortAllocation().reserve(env_obj.id, app_def.host_port, app_id):
+        raise exceptions.HostPortConflictException(app_def.host_port)
+
+def validate_app_redeployment(app_info, app_obj):
+    # Redeploys keep the host port that was reserved and recorded by the deploy.
+    output_config = ast.literal_eval(app_obj.output_config or '{}')
+    if 'host_port' not in output_config:
+        return
+    app_def = common_functions.get_app_definition(app_info)
+    host_port = int(app_def.host_port) if app_def.host_port is not None else 80
+    if host_port != output_config['host_port']:
+        raise exceptions.HostPortChanged(output_config['host_port'], host_port)
+
+def _get_max_replicas(env_obj):
+    max_replicas = constants.APP_MAX_REPLICAS
+    env_def = env_definition.get(env_obj)
+    if env_def.coe_type == 'ecs':
+        # ECS tasks bind a fixed host port, so an instance runs at most one task of an app.
+        max_replicas = min(max_replicas, env_def.cluster_size)
+    return max_replicas
+
+def _is_count(value):
+    return isinstance(value, (int, long)) and not isinstance(value, bool) and value >= 0
+
+def validate_replicas(replicas, env_obj):
+    max_replicas = _get_max_replicas(env_obj)
+    if not _is_count(replicas) or replicas > max_replicas:
+        raise exceptions.InvalidReplicaCount(replicas, max_replicas)
+
+def validate_scaling(replicas, env_obj):
+    coe_type = env_definition.get(env_obj).coe_type
+    if coe_type != 'ecs':
+        raise exceptions.ScalingNotSupported(coe_type)
+    validate_replicas(replicas, env_obj)
+
+def _validate_autoscaling(app_info, env_obj):
+    autoscaling = common_functions.get_app_definition(app_info).autoscaling
+    if not autoscaling:
+        return
+    if env_definition.get(env_obj).coe_type != 'ecs':
+        raise exceptions.InvalidAutoScalingPolicy("autoscaling is supported only on ECS.")
+    min_replicas = autoscaling.get('min_replicas', 1)
+    max_replicas = autoscaling.get('max_replicas')
+    if not _is_count(min_replicas) or not _is_count(max_replicas) or min_replicas > max_replicas:
+        raise exceptions.InvalidAutoScalingPolicy("min_replicas and max_replicas must be counts "
+                                                  "with min_replicas <= max_replicas.")
+    validate_replicas(max_replicas, env_obj)
+    metrics = [key for key in autoscaling if key in constants.AUTOSCALING_METRICS]
+    if not metrics:
+        raise exceptions.InvalidAutoScalingPolicy("a target for one of {metrics} is required.".format(
+            metrics=', '.join(sorted(constants.AUTOSCALING_METRICS))))
+    for metric in metrics:
+        target = autoscaling[metric]
+        if not isinstance(target, (int, long, float)) or isinstance(target, bool) or target <= 0:
+            raise exceptions.InvalidAutoScalingPolicy(metric + " target must be a positive number.")
+
+def _validate_task_resources(app_info, env_obj):
+    if env_definition.get(env_obj).coe_type != 'ecs':
+        return
+    app_def = common_functions.get_app_definition(app_info)
+    sizes = {}
+    for key, value in [('memory', app_def.memory), ('memory_reservation', app_def.memory_reservation),
+                       ('cpu', app_def.cpu)]:
+        if value == '':
+            continue
+        try:
+            sizes[key] = int(value)
+        except (TypeError, ValueError):
+            sizes[key] = 0
+        if sizes[key] <= 0:
+            raise exceptions.InvalidTaskResources(key + " must be a positive integer.")
+    if 'memory' in sizes and sizes.get('memory_reservation', 0) > sizes['memory']:
+        raise exceptions.InvalidTaskResources("memory_reservation can not exceed memory.")
+    for strategy in app_def.placement_strategy:
+        if not isinstance(strategy, dict) or strategy.get('type') not in constants.ECS_PLACEMENT_STRATEGY_TYPES:
+            raise exceptions.InvalidTaskResources("placement_strategy types are " +
+                                                  ', '.join(constants.ECS_PLACEMENT_STRATEGY_TYPES) + ".")
+    for constraint in app_def.placement_constraints:
+        if not isinstance(constraint, dict) or constraint.get('type') not in constants.ECS_PLACEMENT_CONSTRAINT_TYPES:
+            raise exceptions.InvalidTaskResources("placement_constraints types are " +
+                                                  ', '.join(constants.ECS_PLACEMENT_CONSTRAINT_TYPES) + ".")
+    if app_def.log_driver and app_def.log_driver not in constants.ECS_LOG_DRIVERS:
+        raise exceptions.InvalidTaskResources("log_driver must be one of " +
+                                              ', '.join(constants.ECS_LOG_DRIVERS) + ".")
+
+def _get_route(app_def):
+    # The listener port, host and path of the rule for an app on the shared load balancer.
+    routing = app_def.routing
+    port = routing.get('port', app_def.host_port if app_def.host_port is not None else 80)
+    return int(port), routing.get('host', ''), routing.get('path', '')
+
+def _validate_routing(app_id, app_info, env_obj):
+    env_def = env_definition.get(env_obj)
+    if env_def.coe_type != 'ecs' or (env_def.load_balancer or constants.ECS_LOAD_BALANCER) != 'shared':
+        return
+    try:
+        route = _get_route(common_functions.get_app_definition(app_info))
+    except (TypeError, ValueError):
+        raise exceptions.InvalidRouting("port must be an integer.")
+
+    # A rule without host and path catches all requests of its listener, so
+    # only one app per listener port can have one, and later rules with the
+    # same host and path would never receive traffic.
+    for app in app_db.App().get_apps_for_env(env_obj.id) or []:
+        if app.id == app_id or not app.app_yaml_contents:
+            continue
+        try:
+            other_route = _get_route(app_definition.AppDefinition(ast.literal_eval(app.app_yaml_contents)))
+        except (TypeError, ValueError, SyntaxError):
+            continue
+        if other_route == route:
+            port, host, path = route
+            if not host and not path:
+                raise exceptions.InvalidRouting(("app {app} already receives all requests on port {port}. "
+                                                 "Set a routing host or path.").format(app=app.name, port=port))
+            raise exceptions.InvalidRouting(("app {app} already uses host '{host}' and path '{path}' "
+                                             "on port {port}.").format(app=app.name, host=host,
+                                                                       path=path, port=port))
+
+def validate_app_deployment(app_id, app_info, app_data, env_obj):
+    validate_replicas(common_functions.get_app_replicas(app_info), env_obj)
+    _validate_autoscaling(app_info, env_obj)
+    _validate_task_resources(app_info, env_obj)
+    _validate_routing(app_id, app_info, env_obj)
+    # Reserving the host port is the last check, so that a request that
+    # fails validation does not keep the port.
+    _validate_host_port(app_id, app_info, env_obj)
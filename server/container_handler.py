@@ -1,6 +1,7 @@
 import threading
 
 from common import fm_logger
+from common import storage_manager
 
 import local_handler
 
@@ -50,6 +51,7 @@ class ContainerHandler(threading.Thread):
             return
         cloud = self.cont_info['dep_target']
         ContainerHandler.registered_cloud_handlers[cloud].delete_container(self.cont_name, self.cont_info)
+        storage_manager.remove_app(self.cont_info['cont_name'])
 
     def run(self):
         fmlogging.debug("Handling request for container name %s " % self.cont_name)
@@ -1,7 +1,11 @@
+import ast
+
 from dbmodule import db_base
 from objects import app
 from objects import container
 from objects import environment
+from objects import image
+from objects import port
 from objects import resource
 from server.common import fm_logger
 
@@ -15,3 +19,25 @@ def setup_tables():
         resource.Resource.__table__.create(bind=db_base.engine)
     except Exception as e:
         fmlogger.debug(e)
+
+    # Tables added after the initial release are created individually so that
+    # existing installations pick them up on restart.
+    for table in [image.Image.__table__, port.PortAllocation.__table__]:
+        try:
+            table.create(bind=db_base.engine, checkfirst=True)
+        except Exception as e:
+            fmlogger.debug(e)
+
+    _reserve_deployed_ports()
+
+
+def _reserve_deployed_ports():
+    # Apps deployed before host ports were reserved only record them in
+    # their output_config.
+    for app_obj in app.App().get_all() or []:
+        try:
+            output_config = ast.literal_eval(app_obj.output_config or '{}')
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(output_config, dict) and output_config.get('host_port') is not None:
+            port.PortAllocation().reserve(app_obj.env_id, output_config['host_port'], app_obj.id)
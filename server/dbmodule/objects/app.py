@@ -3,6 +3,7 @@ from sqlalchemy.exc import IntegrityError as IntegrityError
 
 from server.common import fm_logger
 from server.dbmodule import db_base
+from server.dbmodule.objects import port as port_db
 
 fmlogger = fm_logger.Logging()
 
@@ -139,6 +140,7 @@ class App(db_base.Base):
             fmlogger.debug(e)
 
     def delete(self, app_id):
+        port_db.PortAllocation().release_for_app(app_id)
         try:
             session = db_base.get_session()
             app = session.query(App).filter_by(id=app_id).first()
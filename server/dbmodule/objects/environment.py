@@ -3,6 +3,7 @@ from sqlalchemy.exc import IntegrityError as IntegrityError
 
 from server.common import fm_logger
 from server.dbmodule import db_base
+from server.dbmodule.objects import port as port_db
 
 fmlogger = fm_logger.Logging()
 
@@ -95,6 +96,7 @@ class Environment(db_base.Base):
             fmlogger.debug(e)
 
     def delete(self, env_id):
+        port_db.PortAllocation().release_for_env(env_id)
         try:
             session = db_base.get_session()
             env = session.query(Environment).filter_by(id=env_id).first()
@@ -0,0 +1,108 @@
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError as IntegrityError
+
+from server.common import fm_logger
+from server.dbmodule import db_base
+
+fmlogger = fm_logger.Logging()
+
+
+class Image(db_base.Base):
+    __tablename__ = 'image'
+    __table_args__ = {'extend_existing': True}
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.String, nullable=False)
+    tag = sa.Column(sa.String)
+    kind = sa.Column(sa.String)
+    size = sa.Column(sa.Integer)
+    created_at = sa.Column(sa.Integer)
+    last_used = sa.Column(sa.Integer)
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def to_json(self, image):
+        image_json = {}
+        image_json['name'] = image.name
+        image_json['tag'] = image.tag
+        image_json['kind'] = image.kind
+        image_json['size'] = image.size
+        image_json['created_at'] = image.created_at
+        image_json['last_used'] = image.last_used
+        return image_json
+
+    @classmethod
+    def tagged_name(self, image):
+        if image.tag:
+            return image.name + ":" + image.tag
+        return image.name
+
+    def get_by_name(self, name, tag=''):
+        image = ''
+        try:
+            session = db_base.get_session()
+            image = session.query(Image).filter_by(name=name).filter_by(tag=tag).first()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+        return image
+
+    def get_images_for_name(self, name):
+        image_list = ''
+        try:
+            session = db_base.get_session()
+            image_list = session.query(Image).filter_by(name=name).all()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+        return image_list
+
+    def get_all(self):
+        image_list = ''
+        try:
+            session = db_base.get_session()
+            image_list = session.query(Image).all()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+        return image_list
+
+    def insert(self, image_data):
+        self.name = image_data['name']
+        self.tag = image_data['tag']
+        self.kind = image_data['kind']
+        self.size = image_data['size']
+        self.created_at = image_data['created_at']
+        self.last_used = image_data['created_at']
+        try:
+            session = db_base.get_session()
+            session.add(self)
+            session.commit()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+        return self.id
+
+    def update(self, image_id, image_data):
+        try:
+            session = db_base.get_session()
+            image = session.query(Image).filter_by(id=image_id).first()
+            if 'size' in image_data: image.size = image_data['size']
+            if 'kind' in image_data: image.kind = image_data['kind']
+            if 'last_used' in image_data: image.last_used = image_data['last_used']
+            session.commit()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+
+    def delete(self, image_id):
+        try:
+            session = db_base.get_session()
+            image = session.query(Image).filter_by(id=image_id).first()
+            session.delete(image)
+            session.commit()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
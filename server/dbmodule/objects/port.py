@@ -0,0 +1,93 @@
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError as IntegrityError
+
+from server.common import fm_logger
+from server.dbmodule import db_base
+
+fmlogger = fm_logger.Logging()
+
+
+class PortAllocation(db_base.Base):
+    """Host ports reserved by the apps of an environment.
+
+    The unique constraint on (env_id, port) lets the database decide which
+    of two concurrent deployments gets a port.
+    """
+    __tablename__ = 'port_allocation'
+    __table_args__ = (sa.UniqueConstraint('env_id', 'port'), {'extend_existing': True})
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    env_id = sa.Column(sa.Integer, nullable=False)
+    port = sa.Column(sa.Integer, nullable=False)
+    app_id = sa.Column(sa.Integer, nullable=False)
+
+    def __init__(self):
+        pass
+
+    @classmethod
+    def to_json(self, allocation):
+        allocation_json = {}
+        allocation_json['env_id'] = allocation.env_id
+        allocation_json['port'] = allocation.port
+        allocation_json['app_id'] = allocation.app_id
+        return allocation_json
+
+    def get(self, env_id, port):
+        allocation = ''
+        try:
+            session = db_base.get_session()
+            allocation = session.query(PortAllocation).filter_by(env_id=env_id, port=port).first()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+        return allocation
+
+    def get_ports_for_env(self, env_id):
+        allocation_list = ''
+        try:
+            session = db_base.get_session()
+            allocation_list = session.query(PortAllocation).filter_by(env_id=env_id).all()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+        return allocation_list
+
+    def reserve(self, env_id, port, app_id):
+        """Reserve port in env_id for app_id.
+
+        Returns True if the port is now held by app_id, including when app_id
+        held it already, and False if another app holds it.
+        """
+        self.env_id = env_id
+        self.port = int(port)
+        self.app_id = app_id
+        session = db_base.get_session()
+        try:
+            session.add(self)
+            session.commit()
+            return True
+        except IntegrityError as e:
+            session.rollback()
+            fmlogger.debug(e)
+        finally:
+            session.close()
+        allocation = self.get(env_id, port)
+        return bool(allocation) and allocation.app_id == app_id
+
+    def release_for_app(self, app_id):
+        try:
+            session = db_base.get_session()
+            session.query(PortAllocation).filter_by(app_id=app_id).delete()
+            session.commit()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
+
+    def release_for_env(self, env_id):
+        try:
+            session = db_base.get_session()
+            session.query(PortAllocation).filter_by(env_id=env_id).delete()
+            session.commit()
+            session.close()
+        except IntegrityError as e:
+            fmlogger.debug(e)
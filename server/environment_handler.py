@@ -1,6 +1,8 @@
 import threading
 
+from common import env_definition
 from common import fm_logger
+from common import storage_manager
 import local_handler
 
 from dbmodule.objects import environment as env_db
@@ -65,18 +67,16 @@ class EnvironmentHandler(threading.Thread):
             fmlogging.debug("Environment definition is empty. Cannot create empty environment. Returning.")
             return
 
-        env_details = self.environment_def['environment']
-
         status_list = []
         # First create ECS resources (cluster)
-        if 'app_deployment' in env_details:
-            app_deployment = env_details['app_deployment']
-            if app_deployment['target'] == 'aws':
+        if self.environment_def.app_deployment:
+            target = self.environment_def.target
+            if target == 'aws':
                 env_db.Environment().update(self.env_id, {'status': 'creating_ecs_cluster'})
                 status = EnvironmentHandler.registered_cloud_handlers['aws'].create_cluster(self.env_id,
                                                                                             self.environment_info)
                 status_list.append(status)
-            if app_deployment['target'] == 'gcloud':
+            if target == 'gcloud':
                 env_db.Environment().update(self.env_id, {'status': 'creating_gke_cluster'})
                 status = EnvironmentHandler.registered_cloud_handlers['gcloud'].create_cluster(self.env_id,
                                                                                                self.environment_info)
@@ -84,8 +84,8 @@ class EnvironmentHandler(threading.Thread):
 
         # Then create other resources (as we want to set security-groups of other resources to
         # match does of the ECS cluster.
-        if 'resources' in env_details:
-            resources = env_details['resources']
+        resources = self.environment_def.resources
+        if resources:
             resources_list = ''
 
             if 'aws' in resources:
@@ -141,6 +141,8 @@ class EnvironmentHandler(threading.Thread):
                 EnvironmentHandler.registered_cloud_handlers['local'].delete_resource(self.env_id,
                                                                                       resource)
         env_db.Environment().delete(self.env_id)
+        env_definition.forget(self.env_id)
+        storage_manager.remove_environment(self.environment_info.get('location'))
 
     def run(self):
         if self.action == 'create':
@@ -45,10 +45,17 @@ from dbmodule import db_main
 from dbmodule.objects import app as app_db
 from dbmodule.objects import container as cont_db
 from dbmodule.objects import environment as env_db
+from dbmodule.objects import image as image_db
 from dbmodule.objects import resource as res_db
+from common import env_definition
 from common import exceptions
+from common import image_gc
+from common import storage_manager
 from common import validator
 
+image_collector = image_gc.ImageGarbageCollector()
+store_compactor = storage_manager.StorageManager()
+
 try:
     import environment_handler
 except Exception as e:
@@ -270,8 +277,7 @@ class AppsRestResource(Resource):
                 if 'target' in app_info:
                     cloud = app_info['target']
                 else:
-                    env_dict = ast.literal_eval(env_obj.env_definition)
-                    cloud = env_dict['environment']['app_deployment']['target']
+                    cloud = env_definition.get(env_obj).target
                     app_info['target'] = cloud
 
                 app_location, app_version = common_functions.store_app_contents(app_name, app_tar_name, content)
@@ -286,7 +292,7 @@ class AppsRestResource(Resource):
                 app_db.App().update(app_id, app_data)
 
                 try:
-                    validator.validate_app_deployment(app_info, app_data, env_obj)
+                    validator.validate_app_deployment(app_id, app_info, app_data, env_obj)
                 except exceptions.AppDeploymentValidationFailure as e:
                     fmlogging.error(e)
                     message = e.get_message()
@@ -323,6 +329,18 @@ class AppRestResource(Resource):
         app = app_db.App().get_by_name(app_name)
         if app:
             resp_data['data'] = app_db.App.to_json(app)
+            if app.dep_target == 'aws':
+                app_info = {'target': app.dep_target, 'app_name': app.name, 'env_id': app.env_id}
+                try:
+                    # Current task counts are shown in the response only; the
+                    # stored output config is left to the deploy threads.
+                    counts = app_handler.AppHandler(app.id, app_info).get_task_counts()
+                    if counts:
+                        output_config = ast.literal_eval(app.output_config)
+                        output_config.update(counts)
+                        resp_data['data']['output_config'] = str(output_config)
+                except Exception as e:
+                    fmlogging.debug(e)
             response = jsonify(**resp_data)
             response.status_code = 200
         else:
@@ -362,11 +380,17 @@ class AppRestResource(Resource):
                                                                           app_version=app_version)
                     app_info['app_location'] = app_location
                     app_info['app_version'] = app_version
+                    validator.validate_app_redeployment(app_info, app_obj)
                     request_handler_thread = app_handler.AppHandler(app_obj.id, app_info, action='redeploy')
                     thread.start_new_thread(start_thread, (request_handler_thread, ))
                     response.headers['location'] = ('/apps/{app_name}').format(app_name=app_name)
                 else:
                     response.status_code = 404
+        except exceptions.AppDeploymentValidationFailure as e:
+            fmlogging.error(e)
+            resp_data = {'error': e.get_message()}
+            response = jsonify(**resp_data)
+            response.status_code = 400
         except Exception as e:
             fmlogging.error(e)
             response.status_code = 500
@@ -401,6 +425,53 @@ class AppRestResource(Resource):
         return response
 
 
+class AppScaleRestResource(Resource):
+    def put(self, app_name):
+        fmlogging.debug("Received PUT request to scale app %s" % app_name)
+        args = request.get_json(force=True)
+
+        response = jsonify()
+        response.status_code = 202
+
+        args_dict = dict(args)
+        app_obj = app_db.App().get_by_name(app_name)
+        if not app_obj:
+            response.status_code = 404
+            return response
+        if 'replicas' not in args_dict:
+            response.status_code = 400
+            return response
+
+        try:
+            env_obj = env_db.Environment().get(app_obj.env_id)
+            validator.validate_scaling(args_dict['replicas'], env_obj)
+            if not ast.literal_eval(app_obj.output_config or '{}').get('task_def_arn'):
+                resp_data = {'error': 'App has no deployed task definition to scale.'}
+                response = jsonify(**resp_data)
+                response.status_code = 400
+                return response
+
+            app_info = {}
+            app_info['target'] = app_obj.dep_target
+            app_info['app_name'] = app_obj.name
+            app_info['env_id'] = app_obj.env_id
+            app_info['replicas'] = args_dict['replicas']
+            request_handler_thread = app_handler.AppHandler(app_obj.id, app_info, action='scale')
+            thread.start_new_thread(start_thread, (request_handler_thread, ))
+            response.headers['location'] = ('/apps/{app_name}').format(app_name=app_name)
+        except exceptions.AppDeploymentValidationFailure as e:
+            fmlogging.error(e)
+            resp_data = {'error': e.get_message()}
+            response = jsonify(**resp_data)
+            response.status_code = 400
+        except Exception as e:
+            fmlogging.error(e)
+            resp_data = {'error': str(e)}
+            response = jsonify(**resp_data)
+            response.status_code = 500
+        return response
+
+
 class AppLogsRestResource(Resource):
     def get(self, app_name):
         resp_data = {}
@@ -415,6 +486,15 @@ class AppLogsRestResource(Resource):
             app_output_config = ast.literal_eval(app_obj.output_config)
             app_info['app_folder_name'] = app_output_config['app_folder_name']
             app_info['env_id'] = app_obj.env_id
+            # Optional time range of the logs, in seconds since the epoch.
+            for arg in ['since', 'until']:
+                value = request.args.get(arg)
+                if value and not value.isdigit():
+                    resp_data = {'error': arg + ' must be seconds since the epoch.'}
+                    response = jsonify(**resp_data)
+                    response.status_code = 400
+                    return response
+                app_info['logs_' + arg] = value
 
             request_handler = app_handler.AppHandler(app_obj.id, app_info)
             logs_data = request_handler.get_logs()
@@ -428,6 +508,68 @@ class AppLogsRestResource(Resource):
         return response
 
 
+class ImagesRestResource(Resource):
+
+    def get(self):
+        fmlogging.debug("Received GET request for all images.")
+        resp_data = {}
+
+        all_images = image_db.Image().get_all()
+        resp_data['data'] = [image_db.Image.to_json(image) for image in all_images]
+        resp_data['last_gc'] = image_collector.last_report
+
+        response = jsonify(**resp_data)
+        response.status_code = 200
+        return response
+
+
+class ImageGCRestResource(Resource):
+
+    def post(self):
+        fmlogging.debug("Received POST request to garbage collect images.")
+        resp_data = {}
+        try:
+            resp_data['data'] = image_collector.collect()
+            response = jsonify(**resp_data)
+            response.status_code = 200
+        except Exception as e:
+            fmlogging.error(e)
+            resp_data = {'error': str(e)}
+            response = jsonify(**resp_data)
+            response.status_code = 500
+        return response
+
+
+class StorageRestResource(Resource):
+
+    def get(self):
+        fmlogging.debug("Received GET request for storage usage.")
+        resp_data = {}
+        resp_data['data'] = store_compactor.usage()
+        resp_data['last_compaction'] = store_compactor.last_report
+
+        response = jsonify(**resp_data)
+        response.status_code = 200
+        return response
+
+
+class StorageCompactRestResource(Resource):
+
+    def post(self):
+        fmlogging.debug("Received POST request to compact storage.")
+        resp_data = {}
+        try:
+            resp_data['data'] = store_compactor.compact()
+            response = jsonify(**resp_data)
+            response.status_code = 200
+        except Exception as e:
+            fmlogging.error(e)
+            resp_data = {'error': str(e)}
+            response = jsonify(**resp_data)
+            response.status_code = 500
+        return response
+
+
 class EnvironmentsRestResource(Resource):
 
     def post(self):
@@ -453,8 +595,15 @@ class EnvironmentsRestResource(Resource):
             if 'environment_def' not in args_dict:
                 response.status_code = 400
             else:
-                environment_def = args_dict['environment_def']
                 environment_name = args_dict['environment_name']
+                try:
+                    environment_def = env_definition.parse(args_dict['environment_def'])
+                except exceptions.EnvironmentDefinitionValidationFailure as e:
+                    fmlogging.error(e)
+                    resp_data = {'error': e.get_message()}
+                    response = jsonify(**resp_data)
+                    response.status_code = 400
+                    return response
                 env_version_stamp = common_functions.get_version_stamp()
                 env_location = (ENV_STORE_PATH + "/environments/{env_name}-{env_version_stamp}").format(env_name=environment_name,
                                                                                                         env_version_stamp=env_version_stamp)
@@ -466,7 +615,7 @@ class EnvironmentsRestResource(Resource):
                 env_data['name'] = environment_name
                 env_data['location'] = env_location
                 env_data['env_version_stamp'] = env_version_stamp
-                env_data['env_definition'] = environment_def
+                env_data['env_definition'] = environment_def.definition
                 env_id = ''
                 try:
                     env_id = env_db.Environment().insert(env_data)
@@ -591,7 +740,7 @@ class EnvironmentRestResource(Resource):
                     response.status_message = 'Environment cannot be deleted as there are applications still running on it.'
                     return response
             environment_name = env.name
-            environment_def = env.env_definition
+            environment_def = env_definition.get(env)
             environment_info['name'] = environment_name
             environment_info['location'] = env.location
             request_handler_thread = environment_handler.EnvironmentHandler(env.id, environment_def, environment_info, action='delete')
@@ -601,9 +750,7 @@ class EnvironmentRestResource(Resource):
             response.status_code = 202
             
             # Check if this was GKE environment. If so, notify user that the VPC network needs to be deleted manually.
-            env_dict = ast.literal_eval(environment_def)
-            cloud = env_dict['environment']['app_deployment']['target']
-            if cloud == 'gcloud':
+            if environment_def.target == 'gcloud':
                 resp_data = {}
                 response = jsonify(**resp_data)
                 response.status_code = 303
@@ -615,6 +762,7 @@ class EnvironmentRestResource(Resource):
 api.add_resource(AppsRestResource, '/apps')
 api.add_resource(AppRestResource, '/apps/<app_name>')
 api.add_resource(AppLogsRestResource, '/apps/<app_name>/logs')
+api.add_resource(AppScaleRestResource, '/apps/<app_name>/scale')
 
 api.add_resource(ContainersRestResource, '/containers')
 api.add_resource(ContainerRestResource, '/containers/<cont_name>')
@@ -623,6 +771,12 @@ api.add_resource(EnvironmentsRestResource, '/environments')
 api.add_resource(EnvironmentRestResource, '/environments/<env_name>')
 api.add_resource(EnvironmentRunCommandRestResource, '/environments/<env_name>/command')
 
+api.add_resource(ImagesRestResource, '/images')
+api.add_resource(ImageGCRestResource, '/images/gc')
+
+api.add_resource(StorageRestResource, '/storage')
+api.add_resource(StorageCompactRestResource, '/storage/compact')
+
 api.add_resource(ResourcesRestResource, '/resources')
 api.add_resource(ResourceRestResource, '/resources/<resource_id>')
 
@@ -639,6 +793,9 @@ if __name__ == '__main__':
         # Setup tables
         db_main.setup_tables()
 
+        image_collector.start()
+        store_compactor.start()
+
         fp = open(CLOUDARK_STATUS_FILE, "w")
         current_time = str(datetime.now())
         fp.write("CloudARK started %s" % current_time)
@@ -39,8 +39,10 @@ class LocalHandler(object):
 
         tag = str(int(round(time.time() * 1000)))
 
+        cache_from = self.docker_handler.get_latest_image(cont_name)
         err, output = self.docker_handler.build_container_image(cont_name, df_dir + "/Dockerfile",
-                                                                df_context=df_dir, tag=tag)
+                                                                df_context=df_dir, tag=tag,
+                                                                cache_from=cache_from)
 
         tagged_image = cont_name + ":" + tag
 
@@ -1,5 +1,7 @@
 import boto3
+from multiprocessing.pool import ThreadPool
 import os
+import threading
 import time
 
 from server.common import constants
@@ -9,9 +11,19 @@ from server.common import fm_logger
 
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
+from server.server_plugins.aws import ecs_state_tracker
 
 fmlogger = fm_logger.Logging()
 
+# Rule priorities of a listener are picked and taken under that listener's lock.
+_listener_locks = {}
+_listener_locks_lock = threading.Lock()
+
+
+def _get_listener_lock(listener_arn):
+    with _listener_locks_lock:
+        return _listener_locks.setdefault(listener_arn, threading.Lock())
+
 
 class AWSHelper(object):
 
@@ -21,6 +33,8 @@ class AWSHelper(object):
         self.ec2_client = boto3.client('ec2')
         self.alb_client = boto3.client('elbv2')
         self.iam_client = boto3.client('iam')
+        self.autoscaling_client = boto3.client('application-autoscaling')
+        self.logs_client = boto3.client('logs')
         self.docker_handler = docker_lib.DockerLib()
 
     def _create_application_lb(self, app_name, subnet_list, sec_group_list):
@@ -74,6 +88,89 @@ class AWSHelper(object):
         fmlogger.debug("Done creating lb listener.")
         return listener_arn
 
+    def create_shared_load_balancer(self, name, subnet_list, sec_group_list):
+        """Create the load balancer shared by the apps of an environment and wait until it is active."""
+        lb_arn, lb_dns = self._create_application_lb(name, subnet_list, sec_group_list)
+        waiter = self.alb_client.get_waiter('load_balancer_available')
+        waiter.wait(LoadBalancerArns=[lb_arn])
+        return lb_arn, lb_dns
+
+    def delete_shared_load_balancer(self, lb_arn):
+        self.delete_load_balancer({'lb_arn': lb_arn})
+        # The environment's security group can only be deleted once the load balancer is gone.
+        try:
+            waiter = self.alb_client.get_waiter('load_balancers_deleted')
+            waiter.wait(LoadBalancerArns=[lb_arn])
+        except Exception as e:
+            fmlogger.error("Exception encountered in waiting for load balancer deletion %s" % e)
+
+    def _get_or_create_listener(self, lb_arn, port):
+        response = self.alb_client.describe_listeners(LoadBalancerArn=lb_arn)
+        for listener in response['Listeners']:
+            if listener['Port'] == int(port):
+                return listener['ListenerArn']
+        # Requests that match no app's rule get a 404.
+        response = self.alb_client.create_listener(LoadBalancerArn=lb_arn,
+                                                   Protocol='HTTP',
+                                                   Port=int(port),
+                                                   DefaultActions=[{'Type': 'fixed-response',
+                                                                    'FixedResponseConfig': {
+                                                                        'StatusCode': '404',
+                                                                        'ContentType': 'text/plain'}}])
+        return response['Listeners'][0]['ListenerArn']
+
+    def _get_rule_priority(self, listener_arn, catch_all):
+        # Rules with a host or path condition are checked before catch-all rules.
+        used = set()
+        paginator = self.alb_client.get_paginator('describe_rules')
+        for page in paginator.paginate(ListenerArn=listener_arn):
+            used.update([int(rule['Priority']) for rule in page['Rules'] if rule['Priority'] != 'default'])
+        if catch_all:
+            priorities = range(50000, 0, -1)
+        else:
+            priorities = range(1, 50001)
+        for priority in priorities:
+            if priority not in used:
+                return priority
+        raise Exception("No free rule priority on listener " + listener_arn)
+
+    def _create_listener_rule(self, listener_arn, target_group_arn, routing):
+        conditions = []
+        if routing.get('host'):
+            conditions.append({'Field': 'host-header', 'Values': [routing['host']]})
+        if routing.get('path'):
+            conditions.append({'Field': 'path-pattern', 'Values': [routing['path']]})
+        catch_all = not conditions
+        if catch_all:
+            conditions.append({'Field': 'path-pattern', 'Values': ['/*']})
+        # The lock covers deploys of this server. PriorityInUse, from a
+        # rule created elsewhere in between, is retried with a new priority.
+        with _get_listener_lock(listener_arn):
+            for attempt in range(constants.ECS_RULE_PRIORITY_RETRIES):
+                try:
+                    response = self.alb_client.create_rule(ListenerArn=listener_arn,
+                                                           Conditions=conditions,
+                                                           Priority=self._get_rule_priority(listener_arn, catch_all),
+                                                           Actions=[{'Type': 'forward',
+                                                                     'TargetGroupArn': target_group_arn}])
+                    return response['Rules'][0]['RuleArn']
+                except self.alb_client.exceptions.PriorityInUseException:
+                    if attempt == constants.ECS_RULE_PRIORITY_RETRIES - 1:
+                        raise
+                    fmlogger.debug("Rule priority on listener %s was taken. Retrying." % listener_arn)
+
+    def delete_listener_rule(self, app_details_obj):
+        """Delete an app's rule on the shared load balancer, and its listener once no app uses it."""
+        # Under the listener's lock, so that a rule created meanwhile keeps its listener.
+        with _get_listener_lock(app_details_obj['listener_arn']):
+            try:
+                self.alb_client.delete_rule(RuleArn=app_details_obj['rule_arn'])
+                rules = self.alb_client.describe_rules(ListenerArn=app_details_obj['listener_arn'])['Rules']
+                if not [rule for rule in rules if not rule['IsDefault']]:
+                    self.delete_listener(app_details_obj)
+            except Exception as e:
+                fmlogger.error("Exception encountered in deleting listener rule %s" % e)
+
     def get_vpc_details(self, search_key='default'):
         vpc_id = ''
         vpc_details = {}
@@ -181,6 +278,9 @@ class AWSHelper(object):
                                                                              'IpRanges': [{'CidrIp': ip_range}],
                                                                              'IpProtocol': protocol}])
         except Exception as e:
+            # Redeploys register the host port of the app again.
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'InvalidPermission.Duplicate':
+                return
             fmlogger.debug("Encountered exception in adding rule to security group:%s" % e)
             raise e
         return
@@ -194,6 +294,110 @@ class AWSHelper(object):
             fmlogger.error("Encountered exception in describing task definition %s" % e)
         return int(container_port)
 
+    def _get_container_instance_ips(self, cluster_name, container_instance_arns):
+        """Return a dict of container instance ARN to the public IP of its EC2 instance."""
+        instance_ids = {}
+        container_instance_arns = list(set(container_instance_arns))
+        # describe_container_instances accepts at most 100 instances per call.
+        for i in range(0, len(container_instance_arns), 100):
+            response = self.ecs_client.describe_container_instances(
+                cluster=cluster_name, containerInstances=container_instance_arns[i:i + 100])
+            for container_instance in response['containerInstances']:
+                instance_ids[container_instance['ec2InstanceId']] = container_instance['containerInstanceArn']
+
+        ip_dict = {}
+        if not instance_ids:
+            return ip_dict
+        paginator = self.ec2_client.get_paginator('describe_instances')
+        for page in paginator.paginate(InstanceIds=list(instance_ids.keys())):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    if instance.get('PublicIpAddress'):
+                        ip_dict[instance_ids[instance['InstanceId']]] = instance['PublicIpAddress']
+        return ip_dict
+
+    def get_cluster_instance_ips(self, cluster_name):
+        """Return the public IPs of the container instances of an ECS cluster."""
+        container_instance_arns = []
+        paginator = self.ecs_client.get_paginator('list_container_instances')
+        for page in paginator.paginate(cluster=cluster_name):
+            container_instance_arns.extend(page['containerInstanceArns'])
+        return sorted(self._get_container_instance_ips(cluster_name, container_instance_arns).values())
+
+    def list_service_tasks(self, cluster_name, service_name, desired_status='RUNNING'):
+        """Return the ARNs of all tasks of an ECS service with the given desired status."""
+        task_arns = []
+        paginator = self.ecs_client.get_paginator('list_tasks')
+        for page in paginator.paginate(cluster=cluster_name, serviceName=service_name,
+                                       desiredStatus=desired_status):
+            task_arns.extend(page['taskArns'])
+        return task_arns
+
+    def describe_tasks(self, cluster_name, task_arns):
+        """Describe any number of tasks, 100 per call."""
+        tasks = []
+        for i in range(0, len(task_arns), 100):
+            response = self.ecs_client.describe_tasks(cluster=cluster_name, tasks=task_arns[i:i + 100])
+            tasks.extend(response['tasks'])
+        return tasks
+
+    def stop_service_tasks(self, cluster_name, service_name):
+        """Stop all running tasks of an ECS service and return their ARNs."""
+        task_arns = self.list_service_tasks(cluster_name, service_name)
+        for task_arn in task_arns:
+            try:
+                self.ecs_client.stop_task(cluster=cluster_name, task=task_arn)
+            except Exception as e:
+                fmlogger.debug("Exception encountered in trying to stop_task %s. %s" % (task_arn, e))
+        return task_arns
+
+    def get_task_endpoints(self, cluster_name, service_name):
+        """Return (ip, host_port) of every running task of an ECS service."""
+        task_arns = self.list_service_tasks(cluster_name, service_name)
+        tasks = [task for task in self.describe_tasks(cluster_name, task_arns)
+                 if task['lastStatus'] == 'RUNNING' and task.get('containerInstanceArn')]
+
+        ip_dict = self._get_container_instance_ips(cluster_name,
+                                                   [task['containerInstanceArn'] for task in tasks])
+        endpoints = []
+        for task in tasks:
+            ip = ip_dict.get(task['containerInstanceArn'])
+            if not ip:
+                continue
+            for container in task['containers']:
+                for binding in container.get('networkBindings', []):
+                    endpoints.append((ip, binding['hostPort']))
+        return endpoints
+
+    def deregister_task_definitions(self, task_def_arns):
+        """Deregister the given task definition revisions.
+
+        Deregistration has no batch call, so the calls run on a few threads.
+        Deregistered revisions are then deleted 10 at a time where the API
+        supports it.
+        """
+        def _deregister(task_def_arn):
+            try:
+                self.ecs_client.deregister_task_definition(taskDefinition=task_def_arn)
+                return task_def_arn
+            except Exception as e:
+                fmlogger.error("Exception encountered in deregistering task definition:%s" % e)
+
+        task_def_arns = sorted(set(task_def_arns))
+        pool = ThreadPool(constants.ECS_DEREGISTER_CONCURRENCY)
+        try:
+            deregistered = [arn for arn in pool.map(_deregister, task_def_arns) if arn]
+        finally:
+            pool.close()
+
+        if hasattr(self.ecs_client, 'delete_task_definitions'):
+            for i in range(0, len(deregistered), 10):
+                try:
+                    self.ecs_client.delete_task_definitions(taskDefinitions=deregistered[i:i + 10])
+                except Exception as e:
+                    fmlogger.debug("Exception encountered in deleting task definitions %s" % e)
+        return deregistered
+
     def update_service(self, app_name, cluster_name, task_def_arn, task_desired_count):
         try:
             self.ecs_client.update_service(cluster=cluster_name,
@@ -203,50 +407,112 @@ class AWSHelper(object):
         except Exception as e:
             fmlogger.debug("Exception encountered in updating ECS service for app %s" % e)
 
-        service_available = False
-        issue_encountered = False
-        service_desc = ''
-
-        # Need to stop the task explicitly as just updating the service does not
-        # seem to stop the running task:
+        # Need to stop the tasks explicitly as just updating the service does not
+        # seem to stop the running tasks:
         if task_desired_count == 0:
-            tasks = self.ecs_client.list_tasks(cluster=cluster_name)
-            if 'taskArns' in tasks and len(tasks['taskArns']) > 0:
-                task_arn = tasks['taskArns'][0]  # assuming one task current
+            self.stop_service_tasks(cluster_name, app_name)
+
+        return ecs_state_tracker.tracker.wait_for_service_count(cluster_name, app_name, task_desired_count)
+
+    def start_rolling_deployment(self, app_name, cluster_name, task_def_arn, desired_count,
+                                 minimum_healthy_percent, maximum_percent, force_new_deployment=False):
+        self.ecs_client.update_service(cluster=cluster_name,
+                                       service=app_name,
+                                       desiredCount=desired_count,
+                                       taskDefinition=task_def_arn,
+                                       forceNewDeployment=force_new_deployment,
+                                       deploymentConfiguration={
+                                           'minimumHealthyPercent': minimum_healthy_percent,
+                                           'maximumPercent': maximum_percent})
+
+    def _count_healthy_targets(self, target_group_arn):
+        response = self.alb_client.describe_target_health(TargetGroupArn=target_group_arn)
+        return len([target for target in response['TargetHealthDescriptions']
+                    if target['TargetHealth']['State'] == 'healthy'])
+
+    def wait_for_deployment(self, app_name, cluster_name, task_def_arn, target_group_arn='',
+                            timeout=constants.ECS_DEPLOYMENT_TIMEOUT):
+        """Wait until the service runs only task_def_arn and its tasks are healthy.
+
+        Returns (True, '') once the old deployment is drained and, if a target
+        group is given, as many targets are healthy as tasks are desired.
+        Returns (False, reason) if the deployment fails, stops too many tasks
+        or does not complete within timeout seconds.
+        """
+        result = {'reason': ("Deployment did not complete within {timeout} seconds.").format(timeout=timeout)}
+
+        def check(service):
+            deployments = service['deployments']
+            new_deployment = [d for d in deployments if d['status'] == 'PRIMARY']
+            if not new_deployment or new_deployment[0]['taskDefinition'] != task_def_arn:
+                result['reason'] = "Deployment of " + task_def_arn + " was replaced."
+                return True
+            new_deployment = new_deployment[0]
+            if new_deployment.get('rolloutState') == 'FAILED':
+                result['reason'] = new_deployment.get('rolloutStateReason', 'Deployment failed.')
+                return True
+            if new_deployment.get('failedTasks', 0) >= constants.ECS_DEPLOYMENT_MAX_FAILED_TASKS:
+                result['reason'] = ("{count} tasks of the new deployment failed to start.").format(
+                    count=new_deployment['failedTasks'])
+                return True
+            if service['events']:
+                app_db.App().update_by_name(app_name, {'status': service['events'][0]['message']})
+            if len(deployments) == 1 and new_deployment['runningCount'] == new_deployment['desiredCount']:
                 try:
-                    self.ecs_client.stop_task(cluster=cluster_name, task=task_arn)
+                    healthy = (not target_group_arn or
+                               self._count_healthy_targets(target_group_arn) >= new_deployment['desiredCount'])
                 except Exception as e:
-                    fmlogger.debug("Exception encountered in trying to stop_task")
-
-        while not service_available and not issue_encountered:
-            try:
-                service_desc = self.ecs_client.describe_services(cluster=cluster_name,
-                                                                 services=[app_name])
-                pending_count = service_desc['services'][0]['pendingCount']
-                running_count = service_desc['services'][0]['runningCount']
-                if pending_count == 0 and running_count == task_desired_count:
-                    service_available = True
-            except Exception as e:
-                fmlogger.debug("Exception encountered in trying to run describe_services. %s" % e)
-                issue_encountered = True
+                    fmlogger.debug("Exception encountered in checking targets of %s. %s" % (app_name, e))
+                    healthy = False
+                if healthy:
+                    result['reason'] = ''
+                    return True
+            return False
 
-        return service_available
+        ecs_state_tracker.tracker.wait_for_service(cluster_name, app_name, check, timeout=timeout)
+        return not result['reason'], result['reason']
 
     def create_service(self, app_name, container_port, host_port, vpc_id, subnet_list, sec_group_id,
-                       cluster_name, task_def_arn, container_name):
-
+                       cluster_name, task_def_arn, container_name, desired_count=1,
+                       placement_strategy=None, placement_constraints=None,
+                       shared_lb=None, routing=None):
+        """Create the ECS service of an app behind an application load balancer.
+
+        With shared_lb, a dict with the lb_arn and lb_dns of the environment's
+        load balancer, the app gets a target group and a listener rule on that
+        load balancer. The rule matches routing's host and path, if given, on
+        the listener for routing's port or the app's host port. Otherwise a
+        load balancer is created for the app.
+        Returns app_url, lb_arn, target_group_arn, listener_arn and rule_arn.
+        """
         app_url = ''
+        rule_arn = ''
         fmlogger.debug("Creating ECS service for app %s" % app_name)
         sec_group_list = [sec_group_id]
-        lb_arn, lb_dns = self._create_application_lb(app_name, subnet_list, sec_group_list)
         target_group_arn, target_group_name = self._create_target_group(app_name, container_port, vpc_id)
         listener_arn = ''
-        try:
-            listener_arn = self._create_lb_listener(host_port, lb_arn, target_group_arn)
-        except Exception as e:
-            fmlogging.error(str(e))
-            raise e
-        desired_count = 1  # Number of tasks default to 1
+        if shared_lb:
+            routing = routing or {}
+            lb_arn, lb_dns = shared_lb['lb_arn'], shared_lb['lb_dns']
+            lb_port = int(routing.get('port', host_port))
+            try:
+                listener_arn = self._get_or_create_listener(lb_arn, lb_port)
+                rule_arn = self._create_listener_rule(listener_arn, target_group_arn, routing)
+            except Exception as e:
+                fmlogger.error("Exception encountered in routing to app %s: %s" % (app_name, e))
+                self.delete_target_group({'target_group_arn': target_group_arn})
+                raise e
+            lb_url = lb_dns + ":" + str(lb_port)
+            if routing.get('path'):
+                lb_url = lb_url + routing['path'].rstrip('*')
+        else:
+            lb_arn, lb_dns = self._create_application_lb(app_name, subnet_list, sec_group_list)
+            try:
+                listener_arn = self._create_lb_listener(host_port, lb_arn, target_group_arn)
+            except Exception as e:
+                fmlogger.error(str(e))
+                raise e
+            lb_url = lb_dns + ":" + str(host_port)
 
         role_obj = self.iam_client.get_role(RoleName='EcsServiceRole')
         role_arn = role_obj['Role']['Arn']
@@ -260,40 +526,26 @@ class AWSHelper(object):
                                                            'containerName': container_name,
                                                            'containerPort': int(container_port)}],
                                            desiredCount=desired_count,
+                                           placementStrategy=placement_strategy or [],
+                                           placementConstraints=placement_constraints or [],
                                            role=role_arn)
         except Exception as e:
             fmlogger.debug("Exception encountered in creating ECS service for app %s" % e)
             raise e
         fmlogger.debug("ECS service creation for app %s done." % app_name)
 
-        service_available = False
-        service_desc = ''
-        service_message = ''
-        count = 1
-        while not service_available and count < constants.TIMEOUT_COUNT:
-            try:
-                service_desc = self.ecs_client.describe_services(cluster=cluster_name,
-                                                                 services=[app_name])
-                pending_count = service_desc['services'][0]['pendingCount']
-                running_count = service_desc['services'][0]['runningCount']
-                service_message = service_desc['services'][0]['events'][0]['message']
-
-                app_data = {'status': service_message}
-                app_db.App().update_by_name(app_name, app_data)
-
-                if pending_count == 0 and running_count == desired_count:
-                    service_available = True
-                    app_url = lb_dns + ":" + str(host_port)
-                    break
-            except Exception as e:
-                fmlogger.debug("Exception encountered in trying to run describe_services. %s" % e)
-            count = count + 1
-            time.sleep(2)
+        def check(service):
+            if service['events']:
+                app_db.App().update_by_name(app_name, {'status': service['events'][0]['message']})
+            return service['pendingCount'] == 0 and service['runningCount'] == desired_count
 
-        if count == constants.TIMEOUT_COUNT and not service_available:
+        service_available, service = ecs_state_tracker.tracker.wait_for_service(
+            cluster_name, app_name, check, timeout=constants.TIMEOUT_COUNT * 2)
+        if not service_available:
             raise exceptions.ECSServiceCreateTimeout(app_name)
+        app_url = lb_url
 
-        return app_url, lb_arn, target_group_arn, listener_arn
+        return app_url, lb_arn, target_group_arn, listener_arn, rule_arn
 
     def delete_listener(self, app_details_obj):
         successfully_deleted = False
@@ -343,6 +595,104 @@ class AWSHelper(object):
         if not successfully_deleted:
             fmlogger.debug("Could not delete ELB loadbalancer.")
 
+    def _get_scaling_resource_id(self, cluster_name, app_name):
+        return ("service/{cluster}/{service}").format(cluster=cluster_name, service=app_name)
+
+    def register_service_scaling(self, app_name, cluster_name, autoscaling, lb_arn='', target_group_arn=''):
+        """Register target tracking policies for the desired count of an ECS service.
+
+        autoscaling is the app yaml's autoscaling section: min_replicas,
+        max_replicas and a target for any of the AUTOSCALING_METRICS.
+        Returns the names of the policies that were created.
+        """
+        resource_id = self._get_scaling_resource_id(cluster_name, app_name)
+        self.autoscaling_client.register_scalable_target(
+            ServiceNamespace='ecs', ResourceId=resource_id,
+            ScalableDimension='ecs:service:DesiredCount',
+            MinCapacity=autoscaling.get('min_replicas', 1),
+            MaxCapacity=autoscaling['max_replicas'])
+
+        policy_names = []
+        for metric, metric_type in sorted(constants.AUTOSCALING_METRICS.items()):
+            if metric not in autoscaling:
+                continue
+            metric_spec = {'PredefinedMetricType': metric_type}
+            if metric_type == 'ALBRequestCountPerTarget':
+                # app/<lb name>/<lb id>/targetgroup/<target group name>/<target group id>
+                metric_spec['ResourceLabel'] = (lb_arn.split(':loadbalancer/')[-1] + "/" +
+                                                target_group_arn.split(':')[-1])
+            policy_name = app_name + "-" + metric
+            self.autoscaling_client.put_scaling_policy(
+                PolicyName=policy_name, ServiceNamespace='ecs', ResourceId=resource_id,
+                ScalableDimension='ecs:service:DesiredCount', PolicyType='TargetTrackingScaling',
+                TargetTrackingScalingPolicyConfiguration={
+                    'TargetValue': float(autoscaling[metric]),
+                    'PredefinedMetricSpecification': metric_spec,
+                    'ScaleInCooldown': autoscaling.get('scale_in_cooldown',
+                                                       constants.AUTOSCALING_SCALE_IN_COOLDOWN),
+                    'ScaleOutCooldown': autoscaling.get('scale_out_cooldown',
+                                                        constants.AUTOSCALING_SCALE_OUT_COOLDOWN)})
+            policy_names.append(policy_name)
+        fmlogger.debug("Registered scaling policies %s for %s" % (policy_names, resource_id))
+        return policy_names
+
+    def deregister_service_scaling(self, app_name, cluster_name):
+        """Remove the scalable target of an ECS service together with its policies."""
+        try:
+            self.autoscaling_client.deregister_scalable_target(
+                ServiceNamespace='ecs',
+                ResourceId=self._get_scaling_resource_id(cluster_name, app_name),
+                ScalableDimension='ecs:service:DesiredCount')
+        except Exception as e:
+            fmlogger.error("Exception encountered in deregistering scalable target %s" % e)
+
+    def get_service_counts(self, app_name, cluster_name):
+        """Return the desired, running and pending task counts of an ECS service."""
+        service = self.ecs_client.describe_services(cluster=cluster_name, services=[app_name])['services'][0]
+        counts = {}
+        counts['desired_count'] = service['desiredCount']
+        counts['running_count'] = service['runningCount']
+        counts['pending_count'] = service['pendingCount']
+        return counts
+
+    def create_log_group(self, log_group):
+        """Create a CloudWatch Logs group for the awslogs driver if it does not exist yet."""
+        try:
+            self.logs_client.create_log_group(logGroupName=log_group)
+            self.logs_client.put_retention_policy(logGroupName=log_group,
+                                                  retentionInDays=constants.ECS_LOG_RETENTION_DAYS)
+            fmlogger.debug("Created log group %s" % log_group)
+        except self.logs_client.exceptions.ResourceAlreadyExistsException:
+            pass
+
+    def delete_log_group(self, log_group):
+        try:
+            self.logs_client.delete_log_group(logGroupName=log_group)
+        except self.logs_client.exceptions.ResourceNotFoundException:
+            pass
+        except Exception as e:
+            fmlogger.error("Exception encountered in deleting log group %s" % e)
+
+    def get_log_events(self, log_group, stream_prefix, start_time=None, end_time=None):
+        """Return the events of the log streams that start with stream_prefix.
+
+        start_time and end_time are in seconds since the epoch. Events of all
+        streams are returned together, oldest first, as (timestamp in ms,
+        stream name, message) tuples.
+        """
+        kwargs = {'logGroupName': log_group, 'logStreamNamePrefix': stream_prefix}
+        if start_time:
+            kwargs['startTime'] = int(start_time) * 1000
+        if end_time:
+            kwargs['endTime'] = int(end_time) * 1000
+        events = []
+        paginator = self.logs_client.get_paginator('filter_log_events')
+        for page in paginator.paginate(**kwargs):
+            for event in page['events']:
+                events.append((event['timestamp'], event['logStreamName'], event['message']))
+        events.sort()
+        return events
+
     def run_command(self, env_id, env_name, resource_obj, command):
         command_output = ''
         env_obj = env_db.Environment().get(env_id)
@@ -352,9 +702,6 @@ class AWSHelper(object):
             mkdir_command = ("mkdir {df_dir}").format(df_dir=df_dir)
             os.system(mkdir_command)
 
-        dockerfile_name = "Dockerfile.run_command"
-        df_path = df_dir + "/" + dockerfile_name
-
         df = self.docker_handler.get_dockerfile_snippet("aws")
         df = df + ("COPY . /src \n"
                    "WORKDIR /src \n"
@@ -362,22 +709,20 @@ class AWSHelper(object):
                    "CMD [\"sh\", \"/src/run_command.sh\"] "
                   )
 
-        df_name = df_dir + "/Dockerfile.run_command"
-        fp = open(df_name, "w")
-        fp.write(df)
-        fp.close()
-
         fp1 = open(df_dir + "/run_command.sh", "w")
         fp1.write("#!/bin/bash \n")
         fp1.write(command)
         fp1.close()
 
+        context_files = self.docker_handler.get_creds_context(constants.AWS)
+        context_files['run_command.sh'] = df_dir + "/run_command.sh"
+
         resource_name = resource_obj.cloud_resource_id
         cont_name = resource_name + "_run_command"
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             cont_name,
-            df_name,
-            df_context=df_dir
+            df,
+            context_files
         )
 
         if err:
@@ -450,4 +795,27 @@ class AWSHelper(object):
                 for policy in attached_managed_policy_list:
                     attached_policies_list.append(policy['PolicyName'])
 
-        return attached_policies_list
\ No newline at end of file
+        return attached_policies_list
+
+
+class SharedLoadBalancerCreator(threading.Thread):
+    """Creates an environment's shared load balancer while its cluster is provisioned."""
+
+    def __init__(self, name, subnet_list, sec_group_id):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        # Load balancer names are at most 32 characters long.
+        self.name = name[:32].rstrip('-')
+        self.subnet_list = subnet_list
+        self.sec_group_id = sec_group_id
+        self.lb_arn = ''
+        self.lb_dns = ''
+        self.error = ''
+
+    def run(self):
+        try:
+            self.lb_arn, self.lb_dns = AWSHelper().create_shared_load_balancer(
+                self.name, self.subnet_list, [self.sec_group_id])
+        except Exception as e:
+            fmlogger.error("Exception encountered in creating shared load balancer %s" % e)
+            self.error = str(e)
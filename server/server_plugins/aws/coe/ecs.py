@@ -1,23 +1,31 @@
 import ast
 import base64
 import boto3
+import hashlib
 import json
 import os
 from os.path import expanduser
 import re
 import shutil
+import tempfile
+import threading
 import time
 
 import server.server_plugins.coe_base as coe_base
 from server.common import common_functions
 from server.common import constants
 from server.common import docker_lib
+from server.common import env_definition
 from server.common import exceptions
 from server.common import fm_logger
+from server.common import log_classifier
+from server.common import readiness
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
 from server.dbmodule.objects import resource as res_db
 from server.server_plugins.aws import aws_helper
+from server.server_plugins.aws import ecs_provisioner
+from server.server_plugins.aws import ecs_state_tracker
 
 home_dir = expanduser("~")
 
@@ -25,6 +33,36 @@ APP_AND_ENV_STORE_PATH = ("{home_dir}/.cld/data/deployments/").format(home_dir=h
 
 fmlogger = fm_logger.Logging()
 
+# Task definitions are tagged with the hash of their container definition.
+TASK_DEF_HASH_TAG = 'cloudark-content-hash'
+
+# Entrypoint of the log runner image. For every instance IP it copies
+# /var/log/ecs to /logs/<ip>.deploy-log and the docker logs of the app's
+# containers to /logs/<ip>.runtime-log/runtime.log, from several instances
+# at a time. Empty since and until arguments mean no time limit.
+COLLECT_LOGS_SCRIPT = r"""#!/bin/bash
+# collect-logs.sh <container name> <since> <until> <concurrency> <instance ip>...
+export CONT_NAME=$1 SINCE=$2 UNTIL=$3
+CONCURRENCY=$4
+shift 4
+cp /key/key.pem /tmp/key.pem && chmod 400 /tmp/key.pem
+
+collect() {
+    ip=$1
+    ssh_opts="-o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -o LogLevel=ERROR -o ConnectTimeout=10 -i /tmp/key.pem"
+    docker_opts="${SINCE:+--since $SINCE} ${UNTIL:+--until $UNTIL}"
+    mkdir -p /logs/$ip.deploy-log /logs/$ip.runtime-log
+    scp -rp $ssh_opts ec2-user@$ip:/var/log/ecs /logs/$ip.deploy-log/
+    ssh $ssh_opts ec2-user@$ip \
+        "for c in \$(sudo docker ps -aq --filter label=com.amazonaws.ecs.container-name=$CONT_NAME); do sudo docker logs $docker_opts \$c; done" \
+        > /logs/$ip.runtime-log/runtime.log 2>&1
+}
+export -f collect
+printf '%s\n' "$@" | xargs -P $CONCURRENCY -I {} bash -c 'collect {}'
+"""
+
+_log_runner_lock = threading.Lock()
+
 
 class ECSHandler(coe_base.COEBase):
     """ECS Handler."""
@@ -126,21 +164,69 @@ class ECSHandler(coe_base.COEBase):
         cluster_name = resource_obj.cloud_resource_id
         return cluster_name
 
+    def _get_container_resources(self, app_info):
+        """Return the cpu and memory settings of the app's container definition.
+
+        memory is the hard limit and memory_reservation the soft limit, in MB.
+        Without either, the hard limit is ECS_DEFAULT_MEMORY. cpu is in CPU
+        units, 1024 per vCPU, and is reserved for the container.
+        """
+        app_def = common_functions.get_app_definition(app_info)
+        resources = {}
+        if app_def.memory:
+            resources['memory'] = int(app_def.memory)
+        if app_def.memory_reservation:
+            resources['memoryReservation'] = int(app_def.memory_reservation)
+        if not resources:
+            resources['memory'] = constants.ECS_DEFAULT_MEMORY
+        if app_def.cpu:
+            resources['cpu'] = int(app_def.cpu)
+        return resources
+
+    def _get_placement(self, app_info):
+        """Return the ECS placement strategy and constraints of the app's service.
+
+        Without a placement_strategy in the app yaml, tasks are spread over
+        availability zones and then packed onto the instances with the least
+        free memory, which leaves whole instances free for larger tasks.
+        """
+        app_def = common_functions.get_app_definition(app_info)
+        strategy = []
+        for item in app_def.placement_strategy or constants.ECS_DEFAULT_PLACEMENT_STRATEGY:
+            placement = {'type': item['type']}
+            if item.get('field'):
+                placement['field'] = item['field']
+            strategy.append(placement)
+        constraints = []
+        for item in app_def.placement_constraints:
+            constraint = {'type': item['type']}
+            if item.get('expression'):
+                constraint['expression'] = item['expression']
+            constraints.append(constraint)
+        return strategy, constraints
+
+    def _get_log_group(self, app_info):
+        """Return the CloudWatch Logs group of an app with the awslogs driver, else ''.
+
+        Apps of a cluster share its log group. Every task writes to its own
+        stream, named <app name>/<container name>/<task id>.
+        """
+        if common_functions.get_app_definition(app_info).log_driver != 'awslogs':
+            return ''
+        return constants.ECS_LOG_GROUP_PREFIX + self._get_cluster_name(app_info['env_id'])
+
+    def _get_family_name(self, app_info):
+        # Task definition families are shared by the whole account and region.
+        return self._get_cluster_name(app_info['env_id']) + "-" + app_info['app_name']
+
     def _register_task_definition(self, app_info, image, container_port, host_port, env_vars_dict, cont_name=''):
         if not cont_name:
             cont_name = app_info['app_name'] + "-" + app_info['app_version']
-        memory = 250  # Default memory size of 250MB. This is hard limit
-        mem1 = common_functions.get_app_memory(app_info)
-        if mem1:
-            memory = int(mem1)
-
-        family_name = app_info['app_name']
+        family_name = self._get_family_name(app_info)
         task_def_arn = ''
-        revision = str(int(round(time.time() * 1000)))
-        family_name = family_name + "-" + revision
 
         env_list = []
-        for key, value in env_vars_dict.iteritems():
+        for key, value in sorted(env_vars_dict.iteritems()):
             environment_dict = {}
             environment_dict['name'] = key
             environment_dict['value'] = value
@@ -160,24 +246,57 @@ class ECSHandler(coe_base.COEBase):
             ECSHandler.awshelper.setup_security_group(vpc_id, vpc_traffic_block,
                                                       sec_group_id, sec_group_name, port_list)
 
+        container_def = {'name': cont_name,
+                         'image': image,
+                         'portMappings': [{
+                             'containerPort': container_port,
+                             'hostPort': host_port,
+                             'protocol': 'tcp'}],
+                         'environment': env_list}
+        container_def.update(self._get_container_resources(app_info))
+        log_group = self._get_log_group(app_info)
+        if log_group:
+            region, access_key, secret_key = self.get_aws_details()
+            ECSHandler.awshelper.create_log_group(log_group)
+            container_def['logConfiguration'] = {'logDriver': 'awslogs',
+                                                 'options': {'awslogs-group': log_group,
+                                                             'awslogs-region': region,
+                                                             'awslogs-stream-prefix': app_info['app_name']}}
+        content_hash = hashlib.sha256(json.dumps(container_def, sort_keys=True)).hexdigest()
+
+        task_def_arn = self._find_task_definition(family_name, content_hash)
+        if task_def_arn:
+            fmlogger.debug("Reusing task definition %s" % task_def_arn)
+            return task_def_arn, cont_name
         try:
             resp = self.ecs_client.register_task_definition(
                 family=family_name,
-                containerDefinitions=[{'name': cont_name,
-                                       'image': image,
-                                       'memory': memory,
-                                       'portMappings': [{
-                                           'containerPort': container_port,
-                                           'hostPort': host_port,
-                                           'protocol': 'tcp'}],
-                                        'environment': env_list}]
+                containerDefinitions=[container_def],
+                tags=[{'key': TASK_DEF_HASH_TAG, 'value': content_hash}]
             )
             task_def_arn = resp['taskDefinition']['taskDefinitionArn']
         except Exception as e:
             fmlogger.error("Exception encountered in trying to register task definition:%s" % e)
         fmlogger.debug("Done registering task definition.")
         return task_def_arn, cont_name
-    
+
+    def _find_task_definition(self, family_name, content_hash):
+        """Return the newest active revision of the family tagged with content_hash, or ''."""
+        try:
+            paginator = self.ecs_client.get_paginator('list_task_definitions')
+            for page in paginator.paginate(familyPrefix=family_name, status='ACTIVE', sort='DESC'):
+                for arn in page['taskDefinitionArns']:
+                    # familyPrefix also matches longer family names.
+                    if arn.split('/')[-1].rsplit(':', 1)[0] != family_name:
+                        continue
+                    tags = self.ecs_client.list_tags_for_resource(resourceArn=arn)['tags']
+                    for tag in tags:
+                        if tag['key'] == TASK_DEF_HASH_TAG and tag['value'] == content_hash:
+                            return arn
+        except Exception as e:
+            fmlogger.debug("Exception encountered in finding task definitions of %s. %s" % (family_name, e))
+        return ''
+
     def _deregister_task_definition(self, task_def_arn):
         try:
             self.ecs_client.deregister_task_definition(taskDefinition=task_def_arn)
@@ -186,69 +305,23 @@ class ECSHandler(coe_base.COEBase):
 
     def _get_app_url(self, app_info, cluster_name, host_port):
         app_url = ''
-        self._copy_creds(app_info)
-        df = self.docker_handler.get_dockerfile_snippet("aws")
-        df = df + ("COPY . /src \n"
-                   "WORKDIR /src \n"
-                   "RUN cp -r aws-creds $HOME/.aws \n"
-                   "RUN sudo apt-get update && sudo apt-get install -y curl \n"
-                   "RUN sudo curl -o /usr/local/bin/ecs-cli https://s3.amazonaws.com/amazon-ecs-cli/ecs-cli-linux-amd64-v0.6.2 \ \n"
-                   " && chmod +x /usr/local/bin/ecs-cli \n"
-                   "ENTRYPOINT [\"ecs-cli\", \"ps\", \"--cluster\", \"{cluster_name}\"]").format(cluster_name=cluster_name)
-
-        app_dir = app_info['app_location']
-        app_folder_name = app_info['app_folder_name']
-        cont_name = app_info['app_name'] + "-get-cont-ip"
-
-        df_dir = app_dir + "/" + app_folder_name
-        fp = open(df_dir + "/Dockerfile.get-cont-ip", "w")
-        fp.write(df)
-        fp.close()
-
-        err, output = self.docker_handler.build_container_image(cont_name, df_dir + "/Dockerfile.get-cont-ip",
-                                                                df_context=df_dir)
-        app_ip = ''
-        if not err:
-            run_err, run_output = self.docker_handler.run_container(cont_name)
-            if not run_err:
-                get_ip_cont_id = run_output.strip()
-                logs_err, logs_output = self.docker_handler.get_logs(get_ip_cont_id)
-                if not logs_err:
-                    task_name = app_info['app_name']
-                    lines = logs_output.split("\n")
-                    for line in lines:
-                        str1 = ' '.join(line.split())
-                        parts = str1.split(" ")
-                        if len(parts) >= 4:
-                            if parts[3].strip().find(task_name) >= 0:
-                                if parts[1].strip() == 'RUNNING':
-                                    app_url_str = parts[2].strip()
-                                    app_ip = app_url_str.split("->")[0].strip()
-                                    app_url = "http://" + app_ip
-                                    break
-                        else:
-                            app_url = "Could not get app url."
-                            break
-                self.docker_handler.remove_container(get_ip_cont_id)
-        self.docker_handler.remove_container_image(cont_name)
+        try:
+            endpoints = ECSHandler.awshelper.get_task_endpoints(cluster_name, app_info['app_name'])
+        except Exception as e:
+            fmlogger.error("Exception encountered in getting task endpoints:%s" % e)
+            endpoints = []
+        # Prefer the task bound to the app's host port, if there is one.
+        endpoints = sorted(endpoints, key=lambda endpoint: endpoint[1] != host_port)
+        if endpoints:
+            app_url = "http://" + endpoints[0][0] + ":" + str(endpoints[0][1])
         fmlogger.debug("App URL:%s" % app_url)
         return app_url
-    
-    def _check_task(self, cluster_name, task_arn, status):
-        status_reached = False
-        issue_encountered = False
-        task_desc = ''
-        while not status_reached and not issue_encountered:
-            try:
-                task_desc = self.ecs_client.describe_tasks(cluster=cluster_name,
-                                                           tasks=[task_arn])
-                cont_status = task_desc['tasks'][0]['containers'][0]['lastStatus']
-                if cont_status.lower() == status:
-                    status_reached = True
-            except Exception as e:
-                fmlogger.error("Exception encountered in trying to run describe_tasks:%s" % e)
-                issue_encountered = True
-        return task_desc
+
+    def _check_tasks(self, cluster_name, task_arns, status):
+        reached, tasks = ecs_state_tracker.tracker.wait_for_tasks(cluster_name, task_arns, status)
+        if not reached:
+            fmlogger.error("Tasks %s did not reach status %s" % (task_arns, status))
+        return tasks
 
     def _stop_task(self, app_id):
         app_obj = app_db.App().get(app_id)
@@ -256,23 +329,13 @@ class ECSHandler(coe_base.COEBase):
         app_details_obj = ast.literal_eval(app_details)
 
         cluster_name = app_details_obj['cluster_name']
-        
-        # TODO(devdatta): When we support multiple instances of a task then
-        # we should revisit following logic.
-        tasks = self.ecs_client.list_tasks(cluster=cluster_name)
-        if 'taskArns' in tasks:
-            task_arn = tasks['taskArns'][0]  # assuming one task current
-            try:
-                self.ecs_client.stop_task(cluster=cluster_name, task=task_arn)
-            except Exception as e:
-                fmlogger.error("Exception encountered in trying to stop_task:%s" % e)
 
-            self._check_task(cluster_name, task_arn, 'stopped')
+        task_arns = ECSHandler.awshelper.stop_service_tasks(cluster_name, app_obj.name)
+        self._check_tasks(cluster_name, task_arns, 'stopped')
+        fmlogger.debug("Tasks stopped:%s" % task_arns)
 
-            fmlogger.debug("Task stopped:%s" % task_arn)
-    
     def _run_task(self, app_info):
-        family_name = app_info['app_name']
+        family_name = self._get_family_name(app_info)
         env_id = app_info['env_id']
         cluster_name = self._get_cluster_name(env_id)
         task_arn = ''
@@ -282,10 +345,10 @@ class ECSHandler(coe_base.COEBase):
         except Exception as e:
             fmlogger.error("Exception encountered in trying to run_task:%s" % e)
 
-        task_desc = self._check_task(cluster_name, task_arn, 'running')
+        tasks = self._check_tasks(cluster_name, [task_arn], 'running')
 
-        container_ip = task_desc['tasks'][0]['containers'][0]['networkBindings'][0]['bindIP']
-        host_port = task_desc['tasks'][0]['containers'][0]['networkBindings'][0]['hostPort']
+        container_ip = tasks[0]['containers'][0]['networkBindings'][0]['bindIP']
+        host_port = tasks[0]['containers'][0]['networkBindings'][0]['hostPort']
 
         fmlogger.debug("Container IP:%s" % container_ip)
         fmlogger.debug("Container Port:%s" % host_port)
@@ -301,18 +364,10 @@ class ECSHandler(coe_base.COEBase):
         df_dir = app_dir + "/" + app_folder_name
         return df_dir
 
-    def _copy_creds(self, app_info, provided_df_dir=''):
-        df_dir = provided_df_dir
-        if not df_dir:
-            df_dir = self._get_path_for_dfs(app_info)
-
-        if not os.path.exists(df_dir + "/aws-creds"):
-            shutil.copytree(home_dir + "/.aws", df_dir + "/aws-creds")
-
     def _update_ecs_app_service(self, app_info, cont_name, task_def_arn, task_desired_count=1):
         cluster_name = self._get_cluster_name(app_info['env_id'])
-        ECSHandler.awshelper.update_service(app_info['app_name'], cluster_name,
-                                            task_def_arn, task_desired_count)
+        return ECSHandler.awshelper.update_service(app_info['app_name'], cluster_name,
+                                                   task_def_arn, task_desired_count)
 
     def _check_if_app_is_ready(self, app_id, app_ip_url, app_url):
         app_status = ''
@@ -324,7 +379,7 @@ class ECSHandler(coe_base.COEBase):
             app_status = constants.APP_LB_NOT_YET_READY + ":" + constants.USE_APP_IP_URL
         return app_status
 
-    def _create_ecs_app_service(self, app_info, cont_name, task_def_arn):
+    def _create_ecs_app_service(self, app_info, cont_name, task_def_arn, desired_count=1):
         env_obj = env_db.Environment().get(app_info['env_id'])
         env_output_config = ast.literal_eval(env_obj.output_config)
         subnet_string = env_output_config['subnets']
@@ -335,10 +390,25 @@ class ECSHandler(coe_base.COEBase):
         app_ports = common_functions.get_app_port(app_info)
         container_port = app_ports[0]
         host_port = app_ports[1]
-        app_url, lb_arn, target_group_arn, listener_arn = ECSHandler.awshelper.create_service(
+        placement_strategy, placement_constraints = self._get_placement(app_info)
+
+        shared_lb = None
+        routing = common_functions.get_app_definition(app_info).routing
+        if env_output_config.get('lb_arn'):
+            shared_lb = {'lb_arn': env_output_config['lb_arn'], 'lb_dns': env_output_config['lb_dns']}
+            lb_port = int(routing.get('port', host_port))
+            if lb_port != host_port and lb_port != 80:
+                ECSHandler.awshelper.setup_security_group(vpc_id, ['0.0.0.0/0'], sec_group_id,
+                                                          env_output_config['http-and-ssh-group-name'],
+                                                          [lb_port])
+
+        app_url, lb_arn, target_group_arn, listener_arn, rule_arn = ECSHandler.awshelper.create_service(
             app_info['app_name'], container_port, host_port, vpc_id,
             subnet_list, sec_group_id, cluster_name,
-            task_def_arn, cont_name
+            task_def_arn, cont_name, desired_count=desired_count,
+            placement_strategy=placement_strategy,
+            placement_constraints=placement_constraints,
+            shared_lb=shared_lb, routing=routing
         )
         app_ip_url = self._get_app_url(app_info, cluster_name, host_port)
         if not app_url:
@@ -348,7 +418,7 @@ class ECSHandler(coe_base.COEBase):
         fmlogger.debug("App URL:%s" % app_url)
         fmlogger.debug("App IP URL:%s" % app_ip_url)
 
-        return app_url, app_ip_url, lb_arn, target_group_arn, listener_arn
+        return app_url, app_ip_url, lb_arn, target_group_arn, listener_arn, rule_arn
 
     def _get_container_port(self, task_def_arn):
         container_port = ECSHandler.awshelper.get_container_port_from_taskdef(task_def_arn)
@@ -364,6 +434,39 @@ class ECSHandler(coe_base.COEBase):
             fmlogger.error("No cluster name given. Returning")
             return
 
+        env_obj = env_db.Environment().get(env_id)
+        try:
+            env_output_config = ast.literal_eval(env_obj.output_config)
+        except Exception as e:
+            fmlogger.error(e)
+            env_output_config = {}
+
+        res_id = res_db.Resource().update_res_for_env(env_id, {'status': 'deleting'})
+
+        if env_output_config.get('provisioner') == 'native':
+            try:
+                ecs_provisioner.ECSClusterProvisioner().delete(cluster_name, cluster_name)
+                fmlogger.debug("Done deleting ECS cluster %s" % cluster_name)
+            except Exception as e:
+                fmlogger.error("Error encountered in deleting cluster %s" % e)
+        else:
+            self._delete_cluster_with_ecs_cli(cluster_name)
+
+        if env_output_config.get('lb_arn'):
+            ECSHandler.awshelper.delete_shared_load_balancer(env_output_config['lb_arn'])
+        ECSHandler.awshelper.delete_log_group(constants.ECS_LOG_GROUP_PREFIX + cluster_name)
+
+        try:
+            sec_group_name = env_output_config['http-and-ssh-group-name']
+            sec_group_id = env_output_config['http-and-ssh-group-id']
+            vpc_id = env_output_config['vpc_id']
+            ECSHandler.awshelper.delete_security_group_for_vpc(vpc_id, sec_group_id, sec_group_name)
+        except Exception as e:
+            fmlogger.error(e)
+
+        res_db.Resource().delete(res_id)
+
+    def _delete_cluster_with_ecs_cli(self, cluster_name):
         df = self.docker_handler.get_dockerfile_snippet("aws")
         df = df + ("COPY . /src \n"
                    "WORKDIR /src \n"
@@ -373,18 +476,9 @@ class ECSHandler(coe_base.COEBase):
                    " && chmod +x /usr/local/bin/ecs-cli \ \n"
                    " && ecs-cli down --cluster {cluster} --force").format(cluster=cluster_name)
 
-        env_store_location = env_info['location']
-
-        fp = open(env_store_location + "/Dockerfile.delete-cluster", "w")
-        fp.write(df)
-        fp.close()
-
-        res_id = res_db.Resource().update_res_for_env(env_id, {'status': 'deleting'})
-
         cont_name = cluster_name + "-delete"
-        err, output = self.docker_handler.build_container_image(cont_name,
-                                                                env_store_location + "/Dockerfile.delete-cluster",
-                                                                df_context=env_store_location)
+        err, output = self.docker_handler.build_image_from_files(
+            cont_name, df, self.docker_handler.get_creds_context(constants.AWS))
 
         if err:
             fmlogger.debug("Error encountered in building container to delete cluster %s" % cluster_name)
@@ -406,72 +500,64 @@ class ECSHandler(coe_base.COEBase):
         except Exception as e:
             fmlogger.error("Error encountered in deleting cluster %s" % e)
 
-        env_obj = env_db.Environment().get(env_id)
-        try:
-            env_output_config = ast.literal_eval(env_obj.output_config)
-            sec_group_name = env_output_config['http-and-ssh-group-name']
-            sec_group_id = env_output_config['http-and-ssh-group-id']
-            vpc_id = env_output_config['vpc_id']
-            ECSHandler.awshelper.delete_security_group_for_vpc(vpc_id, sec_group_id, sec_group_name)
-        except Exception as e:
-            fmlogger.error(e)
-
-        res_db.Resource().delete(res_id)
-
-    def _get_cluster_ips(self, cluster_name, env_store_location):
-        cluster_instance_ip_list = []
-        df = self.docker_handler.get_dockerfile_snippet("aws")
-        df = df + ("COPY . /src \n"
-                   "WORKDIR /src \n"
-                   "RUN cp -r aws-creds $HOME/.aws \ \n"
-                        " && aws ec2 describe-instances")
-        fp = open(env_store_location + "/Dockerfile.get-instance-ip", "w")
-        fp.write(df)
-        fp.flush()
-        fp.close()
-
-        get_ip_cont_image = cluster_name+"get-ip"
-        err, output = self.docker_handler.build_container_image(get_ip_cont_image,
-                                                                env_store_location + "/Dockerfile.get-instance-ip",
-                                                                df_context=env_store_location)
-
-        if err:
-            fmlogger.error("Error encountered in building container image to get cluster IP address. %s " + str(err))
-            return
+    def _create_cluster_with_api(self, env_id, env_info, env_output_config, provisioner,
+                                 ami_id, profile_name, phases, cluster_name,
+                                 cluster_size, instance_type, subnet_ids):
+        vpc_id = env_output_config['vpc_id']
+        sec_group_id = env_output_config['http-and-ssh-group-id']
+        sec_group_name = env_output_config['http-and-ssh-group-name']
+        key_file = env_info['location'] + "/" + cluster_name + ".pem"
 
-        output_lines = output.split('\n')
-        json_lines = []
-        start = False
-        for line in output_lines:
-            if not start:
-                if len(line) == 1 and line == '{':
-                    start = True
-                    json_lines.append(line)
-            else:
-                json_lines.append(line)
-        for line in json_lines[::-1]:
-            if not line == '}':
-                del json_lines[-1]
-            else:
-                break
+        res_data = {}
+        res_data['env_id'] = env_id
+        res_data['cloud_resource_id'] = cluster_name
+        res_data['type'] = 'ecs-cluster'
+        res_data['status'] = 'provisioning'
+        res_id = res_db.Resource().insert(res_data)
+        env_db.Environment().update(env_id, {'status': 'provisioning'})
 
-        json_string = '\n'.join(json_lines)
-        json_string = re.sub('\s+', '', json_string)
-        json_output = json.loads(json_string)
+        try:
+            instance_ids = provisioner.create(cluster_name, cluster_name, key_file, ami_id, profile_name,
+                                              instance_type, cluster_size, subnet_ids, sec_group_id, phases)
+        except exceptions.ECSClusterProvisioningFailure as e:
+            error_message = 'provisioning-failed: ' + str(e)
+            fmlogger.error("Failed to provision ECS cluster %s. %s Phases: %s" % (cluster_name, e, phases))
+            res_db.Resource().update(res_id, {'status': error_message})
+            try:
+                provisioner.delete(cluster_name, cluster_name)
+                ECSHandler.awshelper.delete_security_group_for_vpc(vpc_id, sec_group_id, sec_group_name)
+            except Exception as e1:
+                fmlogger.error(e1)
+                error_message = error_message + " + " + str(e1)
+            env_db.Environment().update(env_id, {'output_config': error_message,
+                                                 'status': 'create-failed'})
+            return error_message
 
-        reservations = json_output['Reservations']
-        for res_item in reservations:
-            instances = res_item['Instances']
-            for instance in instances:
-                if 'KeyName' in instance:
-                    key_name = instance['KeyName']
-                    if key_name == cluster_name:
-                        cluster_instance_ip_list.append(instance['PublicIpAddress'])
+        env_output_config['cluster_name'] = cluster_name
+        env_output_config['provisioner'] = 'native'
+        env_output_config['instance_ids'] = instance_ids
+        env_output_config['provisioning_phases'] = phases
+        env_output_config['key_file'] = key_file
+        env_update = {}
+        env_update['output_config'] = str(env_output_config)
+        env_db.Environment().update(env_id, env_update)
+        res_db.Resource().update(res_id, {'status': 'available'})
 
-        # Delete the container created for obtaining IP address
-        self.docker_handler.remove_container_image(get_ip_cont_image)
+        instance_ip_list = provisioner.get_instance_ips(instance_ids)
+        if not instance_ip_list:
+            error_message = "Could not get Cluster instance IP. Not continuing with the request."
+            fmlogger.error(error_message)
+            env_update['status'] = error_message + " Deleting the cluster."
+            env_db.Environment().update(env_id, env_update)
+            self.delete_cluster(env_id, env_info, '', available_cluster_name=cluster_name)
+            return error_message
 
-        return cluster_instance_ip_list
+        env_output_config['cluster_ips'] = instance_ip_list
+        env_update['status'] = 'available'
+        env_update['output_config'] = str(env_output_config)
+        env_db.Environment().update(env_id, env_update)
+        fmlogger.debug("Done creating ECS cluster %s in %s" % (cluster_name, phases))
+        return 'available'
 
     def create_cluster(self, env_id, env_info):
         cluster_status = 'unavailable'
@@ -487,7 +573,6 @@ class ECSHandler(coe_base.COEBase):
 
         if not os.path.exists(env_store_location):
             os.makedirs(env_store_location)
-        shutil.copytree(home_dir + "/.aws", env_store_location + "/aws-creds")
         
         # 1) Cluster vpc details handling
         vpc_id = ''
@@ -547,20 +632,76 @@ class ECSHandler(coe_base.COEBase):
                 env_db.Environment().update(env_id, {'output_config': error_message,
                                                      'status': 'create-failed'})            
             
-        # 2) Creating the cluster
+        # 2) Creating the cluster, and the load balancer shared by the apps
+        env_def = env_definition.get(env_obj)
+        lb_creator = None
+        if (env_def.load_balancer or constants.ECS_LOAD_BALANCER) == 'shared':
+            lb_creator = aws_helper.SharedLoadBalancerCreator(cluster_name, subnet_ids, sec_group_id)
+            lb_creator.start()
+
+        cluster_status = self._create_cluster_instances(env_id, env_info, env_obj, env_output_config,
+                                                        env_update, cluster_name, keypair_name,
+                                                        env_store_location, vpc_id, subnet_ids,
+                                                        subnet_list, sec_group_id, sec_group_name)
+        if lb_creator:
+            self._finish_shared_load_balancer(env_id, lb_creator, cluster_status == 'available',
+                                              vpc_id, sec_group_id, sec_group_name)
+        return cluster_status
+
+    def _finish_shared_load_balancer(self, env_id, lb_creator, cluster_available,
+                                     vpc_id, sec_group_id, sec_group_name):
+        lb_creator.join()
+        env_obj = env_db.Environment().get(env_id)
+        env_output_config = {}
+        try:
+            env_output_config = ast.literal_eval(env_obj.output_config)
+        except Exception:
+            pass
+        if cluster_available and lb_creator.lb_arn:
+            env_output_config['lb_arn'] = lb_creator.lb_arn
+            env_output_config['lb_dns'] = lb_creator.lb_dns
+            env_db.Environment().update(env_id, {'output_config': str(env_output_config)})
+            return
+        if lb_creator.error:
+            # Apps of the environment fall back to a load balancer per app.
+            fmlogger.error("Shared load balancer of environment %s not available. %s" % (env_id, lb_creator.error))
+        if lb_creator.lb_arn:
+            ECSHandler.awshelper.delete_shared_load_balancer(lb_creator.lb_arn)
+        if not cluster_available:
+            # The security group could not be deleted while the load balancer used it.
+            try:
+                ECSHandler.awshelper.delete_security_group_for_vpc(vpc_id, sec_group_id, sec_group_name)
+            except Exception as e:
+                fmlogger.debug(e)
+
+    def _create_cluster_instances(self, env_id, env_info, env_obj, env_output_config, env_update,
+                                  cluster_name, keypair_name, env_store_location, vpc_id,
+                                  subnet_ids, subnet_list, sec_group_id, sec_group_name):
+        cluster_status = 'unavailable'
+        env_def = env_definition.get(env_obj)
+        cluster_size = env_def.cluster_size
+        instance_type = env_def.instance_type or 't2.micro'
+
+        if (env_def.provisioner or constants.ECS_PROVISIONER) == 'native':
+            provisioner = ecs_provisioner.ECSClusterProvisioner()
+            phases = {}
+            try:
+                ami_id, profile_name = provisioner.prepare(phases)
+            except exceptions.ECSClusterProvisioningFailure as e:
+                # Nothing has been created yet, so ecs-cli can still take over.
+                fmlogger.error("Could not provision cluster %s with the AWS APIs, using ecs-cli. %s"
+                               % (cluster_name, e))
+            else:
+                return self._create_cluster_with_api(env_id, env_info, env_output_config, provisioner,
+                                                     ami_id, profile_name, phases, cluster_name,
+                                                     cluster_size, instance_type, subnet_ids)
+
         region, access_key, secret_key = ECSHandler.get_aws_details()
         create_keypair_cmd = ("RUN aws ec2 create-key-pair --key-name "
                               "{key_name} --query 'KeyMaterial' --output text > {key_file}.pem").format(key_name=keypair_name,
                                                                                                         key_file=keypair_name)
         df = self.docker_handler.get_dockerfile_snippet("aws")
 
-        env_details = ast.literal_eval(env_obj.env_definition)
-        cluster_size = 1
-        if 'cluster_size' in env_details['environment']['app_deployment']:
-            cluster_size = env_details['environment']['app_deployment']['cluster_size']
-        instance_type = 't2.micro'
-        if 'instance_type' in env_details['environment']['app_deployment']:
-            instance_type = env_details['environment']['app_deployment']['instance_type']
         entry_point_cmd = (
             "ENTRYPOINT [\"ecs-cli\", \"up\", \"--size\", \"{size}\", \"--keypair\", \"{keypair}\", \"--capability-iam\", \"--vpc\", \"{vpc_id}\", \"--subnets\", \"{subnet_list}\", "
             "\"--security-group\", \"{security_group}\", \"--instance-type\", \"{instance_type}\", \"--cluster\", \"{cluster}\"] \n").format(
@@ -584,21 +725,16 @@ class ECSHandler(coe_base.COEBase):
                    ).format(create_keypair_cmd=create_keypair_cmd, reg=region,
                             cluster=cluster_name, entry_point_cmd=entry_point_cmd)
 
-        fp = open(env_store_location + "/Dockerfile.create-cluster", "w")
-        fp.write(df)
-        fp.close()
-
         res_data = {}
         res_data['env_id'] = env_id
         res_data['cloud_resource_id'] = cluster_name
         res_data['type'] = 'ecs-cluster'
         res_data['status'] = 'provisioning'
         res_id = res_db.Resource().insert(res_data)
-        err, image_id = self.docker_handler.build_container_image(cluster_name,
-                                                                  env_store_location + "/Dockerfile.create-cluster",
-                                                                  df_context=env_store_location)
+        err, image_id = self.docker_handler.build_image_from_files(
+            cluster_name, df, self.docker_handler.get_creds_context(constants.AWS))
         if err:
-            error_output = common_functions.filter_error_output(image_id)
+            error_output = common_functions.filter_error_output(image_id, [log_classifier.DOCKER])
             error_message = 'provisioning-failed: ' + error_output
             res_data['status'] = error_message
             res_db.Resource().update(res_id, res_data)
@@ -615,7 +751,7 @@ class ECSHandler(coe_base.COEBase):
         err, cont_id = self.docker_handler.run_container(cluster_name)
 
         if err:
-            error_output = common_functions.filter_error_output(err)
+            error_output = common_functions.filter_error_output(err, [log_classifier.DOCKER])
             error_message = 'provisioning-failed: ' + error_output
             res_data['status'] = error_message
             res_db.Resource().update(res_id, res_data)
@@ -632,14 +768,16 @@ class ECSHandler(coe_base.COEBase):
         cont_id = cont_id.rstrip().lstrip()
 
         log_lines = []
-        error_found = False
-        new_lines_found = True
-        while new_lines_found:
-            logs = self.docker_handler.get_logs(cont_id)
-            new_lines_found, new_lines = common_functions.are_new_log_lines(logs, log_lines)
-            log_lines.extend(new_lines)
-            error_found, error_message = common_functions.is_error_in_log_lines(logs)
-            if error_found:
+        classifier = log_classifier.LogClassifier([log_classifier.ECS_CLI,
+                                                   log_classifier.CLOUDFORMATION,
+                                                   log_classifier.AWS_CLI])
+        for _, line in self.docker_handler.follow_logs(cont_id):
+            if not line.strip():
+                continue
+            log_lines.append(line)
+            event = classifier.classify(line)
+            if event:
+                error_message = event.line
                 env_db.Environment().update(env_id, {'output_config': error_message,
                                                      'status': 'create-failed'})
                 return error_message
@@ -705,7 +843,11 @@ class ECSHandler(coe_base.COEBase):
         env_update['output_config'] = str(env_output_config)
         env_db.Environment().update(env_id, env_update)
 
-        instance_ip_list = self._get_cluster_ips(cluster_name, env_store_location)
+        try:
+            instance_ip_list = ECSHandler.awshelper.get_cluster_instance_ips(cluster_name)
+        except Exception as e:
+            fmlogger.error("Exception encountered in getting cluster instance IPs:%s" % e)
+            instance_ip_list = []
         if not instance_ip_list:
             error_message = "Could not get Cluster instance IP. Not continuing with the request."
             fmlogger.error(error_message)
@@ -722,13 +864,11 @@ class ECSHandler(coe_base.COEBase):
             return cluster_status
 
     def deploy_application(self, app_id, app_info):
-        self._copy_creds(app_info)
-
         env_vars = common_functions.resolve_environment(app_id, app_info)
 
         app_details = {}
         app_data = {}
-        app_details['task-familyName'] = app_info['app_name']
+        app_details['task-familyName'] = self._get_family_name(app_info)
         app_data['status'] = 'registering-task-definition'
         app_data['output_config'] = str(app_details)
         app_db.App().update(app_id, app_data)
@@ -746,22 +886,29 @@ class ECSHandler(coe_base.COEBase):
         app_details['cluster_name'] = self._get_cluster_name(app_info['env_id'])
         app_details['image_name'] = [tagged_image]
         app_details['memory'] = common_functions.get_app_memory(app_info)
+        app_details['cpu'] = common_functions.get_app_cpu(app_info)
         app_details['app_folder_name'] = app_info['app_folder_name']
         app_details['env_name'] = app_info['env_name']
         app_details['container_port'] = container_port
         app_details['host_port'] = host_port
+        app_details['desired_count'] = common_functions.get_app_replicas(app_info)
+        app_details['log_group'] = self._get_log_group(app_info)
+        autoscaling = common_functions.get_app_definition(app_info).autoscaling
+        if autoscaling:
+            app_details['desired_count'] = self._clamp_to_autoscaling(app_details['desired_count'], autoscaling)
 
         app_data['status'] = 'creating-ecs-app-service'
         app_data['output_config'] = str(app_details)
         app_db.App().update(app_id, app_data)
 
-        app_url = app_ip_url = lb_arn = target_group_arn = listener_arn = ''
+        app_url = app_ip_url = lb_arn = target_group_arn = listener_arn = rule_arn = ''
 
         try:
-            app_url, app_ip_url, lb_arn, target_group_arn, listener_arn = self._create_ecs_app_service(
+            app_url, app_ip_url, lb_arn, target_group_arn, listener_arn, rule_arn = self._create_ecs_app_service(
                 app_info,
                 cont_name,
-                task_def_arn
+                task_def_arn,
+                desired_count=app_details['desired_count']
             )
         except Exception as e: #exceptions.ECSServiceCreateTimeout as e:
             fmlogger.error(e)
@@ -774,6 +921,17 @@ class ECSHandler(coe_base.COEBase):
         app_details['lb_arn'] = lb_arn
         app_details['target_group_arn'] = target_group_arn
         app_details['listener_arn'] = listener_arn
+        app_details['rule_arn'] = rule_arn
+
+        if autoscaling:
+            try:
+                autoscaling['policies'] = ECSHandler.awshelper.register_service_scaling(
+                    app_info['app_name'], app_details['cluster_name'], autoscaling,
+                    lb_arn=lb_arn, target_group_arn=target_group_arn)
+                app_details['autoscaling'] = autoscaling
+            except Exception as e:
+                fmlogger.error("Exception encountered in registering autoscaling policies %s" % e)
+                app_details['autoscaling_error'] = str(e)
         app_details['app_url'] = app_url
         app_details['app_ip_url'] = app_ip_url
 
@@ -793,10 +951,49 @@ class ECSHandler(coe_base.COEBase):
         app_data['output_config'] = str(app_details)
         app_db.App().update(app_id, app_data)
 
-    def redeploy_application(self, app_id, app_info):
-        self._copy_creds(app_info)
+    def _get_deployment_configuration(self, app_info, desired_count):
+        """Return (minimumHealthyPercent, maximumPercent) for a rolling deployment.
 
-        #if app_info['env_id']:
+        Tasks bind a fixed host port, so new tasks can only start on instances
+        that do not run the app yet. If the cluster has such instances, all old
+        tasks are kept until new ones are healthy. Otherwise one task at a time
+        is replaced. Both values can be set in the app yaml's deployment section.
+        """
+        env_obj = env_db.Environment().get(app_info['env_id'])
+        cluster_size = env_definition.get(env_obj).cluster_size
+        if cluster_size > desired_count:
+            minimum_healthy_percent, maximum_percent = 100, 200
+        else:
+            minimum_healthy_percent = ((desired_count - 1) * 100) // max(desired_count, 1)
+            maximum_percent = 100
+        deployment = common_functions.get_app_definition(app_info).deployment
+        minimum_healthy_percent = int(deployment.get('minimum_healthy_percent', minimum_healthy_percent))
+        maximum_percent = int(deployment.get('maximum_percent', maximum_percent))
+        return minimum_healthy_percent, maximum_percent
+
+    def _clamp_to_autoscaling(self, desired_count, autoscaling):
+        return min(max(desired_count, autoscaling.get('min_replicas', 1)), autoscaling['max_replicas'])
+
+    def _get_desired_count(self, app_name, app_details_obj):
+        # The desired count of an autoscaled service is whatever the policies last set.
+        desired_count = app_details_obj.get('desired_count', 1)
+        if 'autoscaling' in app_details_obj:
+            try:
+                desired_count = ECSHandler.awshelper.get_service_counts(
+                    app_name, app_details_obj['cluster_name'])['desired_count']
+            except Exception as e:
+                fmlogger.error("Exception encountered in getting desired count of %s %s" % (app_name, e))
+        return desired_count
+
+    def get_task_counts(self, app_id, app_info):
+        """Return the desired, running and pending task counts of the app's service."""
+        app_obj = app_db.App().get(app_id)
+        app_details_obj = ast.literal_eval(app_obj.output_config)
+        if 'cluster_name' not in app_details_obj:
+            return {}
+        return ECSHandler.awshelper.get_service_counts(app_obj.name, app_details_obj['cluster_name'])
+
+    def redeploy_application(self, app_id, app_info):
         env_vars = common_functions.resolve_environment(app_id, app_info)
 
         app_obj = app_db.App().get(app_id)
@@ -808,67 +1005,134 @@ class ECSHandler(coe_base.COEBase):
         app_dt['output_config'] = str(app_details_obj)
         app_db.App().update(app_id, app_dt)
 
-        if 'memory' in app_details_obj:
-            app_info['memory'] = app_details_obj['memory']
-        proxy_endpoint = app_details_obj['proxy_endpoint']
-        repo_name = app_details_obj['repo_name']
-        tag = str(int(round(time.time() * 1000)))
+        tagged_image = common_functions.get_image_uri(app_info)
+        previous_task_def_arn = app_details_obj['task_def_arn'][-1]
+        cluster_name = app_details_obj['cluster_name']
+        # The load balancer and the reserved host port belong to the service,
+        # so the new revision keeps the ports of the current one.
+        container_port = app_details_obj.get('container_port') or self._get_container_port(previous_task_def_arn)
+        host_port = app_details_obj.get('host_port', 80)
+        orig_cont_name = app_details_obj['cont_name']
+        desired_count = self._get_desired_count(app_obj.name, app_details_obj)
 
-        app_dt['status'] = 'building-app-container'
+        app_dt['status'] = 'registering-new-task-definition'
         app_db.App().update(app_id, app_dt)
-        err, output, image_name = self._build_app_container(app_info, repo_name, proxy_endpoint, tag=tag)
-        if err:
-            fmlogger.debug("Error encountered in building and tagging image. Not continuing with the request.")
+        new_task_def_arn, cont_name = self._register_task_definition(app_info, tagged_image,
+                                                                     container_port, host_port, env_vars,
+                                                                     cont_name=orig_cont_name)
+        if not new_task_def_arn:
+            app_dt['status'] = 'redeploy-failed: could not register task definition'
+            app_db.App().update(app_id, app_dt)
             return
 
-        app_dt['status'] = 'pushing-app-cont-to-ecr-repository'
+        minimum_healthy_percent, maximum_percent = self._get_deployment_configuration(app_info, desired_count)
+        fmlogger.debug("Rolling deployment of %s with minimumHealthyPercent %s and maximumPercent %s"
+                       % (new_task_def_arn, minimum_healthy_percent, maximum_percent))
+        app_dt['status'] = 'rolling-deployment-in-progress'
         app_db.App().update(app_id, app_dt)
 
-        tagged_image = image_name + ":" + tag
-        err, output = self.docker_handler.push_container(tagged_image)
+        try:
+            # Tasks are replaced even if the task definition did not change,
+            # e.g. to pull a new image pushed with the same tag.
+            ECSHandler.awshelper.start_rolling_deployment(app_obj.name, cluster_name, new_task_def_arn,
+                                                          desired_count, minimum_healthy_percent,
+                                                          maximum_percent, force_new_deployment=True)
+            deployed, reason = ECSHandler.awshelper.wait_for_deployment(
+                app_obj.name, cluster_name, new_task_def_arn,
+                target_group_arn=app_details_obj.get('target_group_arn', ''))
+        except Exception as e:
+            deployed, reason = False, str(e)
 
-        common_functions.save_image_tag(tagged_image, app_info)
-        if err:
-            fmlogger.debug("Error encountered in pushing container image to ECR. Not continuing with the request.")
+        if not deployed and new_task_def_arn == previous_task_def_arn:
+            # There is no other revision to roll back to.
+            fmlogger.error("Redeploy of %s failed: %s" % (app_obj.name, reason))
+            app_dt['status'] = 'redeploy-failed: ' + reason
+            app_db.App().update(app_id, app_dt)
+            return
 
-            app_dt['status'] = 'error-encountered-in-pushing-app-cont-image'
+        if not deployed:
+            fmlogger.error("Redeploy of %s failed: %s. Rolling back to %s"
+                           % (app_obj.name, reason, previous_task_def_arn))
+            app_dt['status'] = 'rolling-back'
             app_db.App().update(app_id, app_dt)
-            raise Exception()
-        fmlogger.debug("Completed pushing container %s to AWS ECR" % tagged_image)
+            try:
+                ECSHandler.awshelper.start_rolling_deployment(app_obj.name, cluster_name, previous_task_def_arn,
+                                                              desired_count, minimum_healthy_percent,
+                                                              maximum_percent)
+                rolled_back, rollback_reason = ECSHandler.awshelper.wait_for_deployment(
+                    app_obj.name, cluster_name, previous_task_def_arn,
+                    target_group_arn=app_details_obj.get('target_group_arn', ''))
+            except Exception as e:
+                rolled_back, rollback_reason = False, str(e)
+            if new_task_def_arn not in app_details_obj['task_def_arn']:
+                # A reused earlier revision stays registered for the app.
+                self._deregister_task_definition(new_task_def_arn)
 
-        current_task_def_arn = app_details_obj['task_def_arn'][-1]
-        container_port = self._get_container_port(current_task_def_arn)
-        host_port = 80
-        orig_cont_name = app_details_obj['cont_name']
+            if rolled_back:
+                app_dt['status'] = 'redeploy-failed-rolled-back: ' + reason
+            else:
+                app_dt['status'] = 'redeploy-failed-rollback-failed: ' + reason + " + " + rollback_reason
+            app_db.App().update(app_id, app_dt)
+            return
+
+        if new_task_def_arn != previous_task_def_arn:
+            app_details_obj['task_def_arn'].append(new_task_def_arn)
+        if tagged_image not in app_details_obj['image_name']:
+            app_details_obj['image_name'].append(tagged_image)
+        app_details_obj['log_group'] = self._get_log_group(app_info)
+        # Tasks may have moved to other instances.
+        app_ip_url = self._get_app_url(app_info, cluster_name, host_port) or app_details_obj['app_ip_url']
+        app_details_obj['app_ip_url'] = app_ip_url
+        app_url = app_details_obj['app_url']
 
-        app_dt['status'] = 'deregistering-current-task-ecs-app-service'
+        app_dt['status'] = 'waiting-for-app-to-get-ready'
+        app_dt['output_config'] = str(app_details_obj)
         app_db.App().update(app_id, app_dt)
 
-        self._update_ecs_app_service(app_info, orig_cont_name, current_task_def_arn, task_desired_count=0)
+        status = self._check_if_app_is_ready(app_id, app_ip_url, app_url)
 
-        app_dt['status'] = 'registering-new-task-ecs-app-service'
+        app_dt['status'] = status
         app_db.App().update(app_id, app_dt)
-        new_task_def_arn, cont_name = self._register_task_definition(app_info, tagged_image,
-                                                                     container_port, host_port, env_vars,
-                                                                     cont_name=orig_cont_name)
-        self._update_ecs_app_service(app_info, orig_cont_name, new_task_def_arn, task_desired_count=1)
 
-        app_details_obj['task_def_arn'].append(new_task_def_arn)
-        app_details_obj['image_name'].append(tagged_image)
+    def scale_application(self, app_id, app_info):
+        desired_count = app_info['replicas']
+        app_obj = app_db.App().get(app_id)
+        app_details_obj = ast.literal_eval(app_obj.output_config)
+        if 'autoscaling' in app_details_obj:
+            desired_count = self._clamp_to_autoscaling(desired_count, app_details_obj['autoscaling'])
 
-        app_ip_url = app_details_obj['app_ip_url']
-        app_url = app_details_obj['app_url']
+        app_dt = {}
+        if not app_details_obj.get('task_def_arn'):
+            app_dt['status'] = 'scale-failed: app has no deployed task definition'
+            app_db.App().update(app_id, app_dt)
+            return
 
-        app_dt['status'] = 'waiting-for-app-to-get-ready'
+        app_dt['status'] = 'scaling-to-' + str(desired_count)
         app_db.App().update(app_id, app_dt)
 
-        status = self._check_if_app_is_ready(app_id, app_ip_url, app_url)
+        task_def_arn = app_details_obj['task_def_arn'][-1]
+        scaled = self._update_ecs_app_service(app_info, app_details_obj['cont_name'], task_def_arn,
+                                              task_desired_count=desired_count)
+        if not scaled:
+            app_dt['status'] = ("scale-failed: service did not reach {count} running tasks").format(
+                count=desired_count)
+            app_db.App().update(app_id, app_dt)
+            return
 
-        app_dt['status'] = status
+        app_details_obj['desired_count'] = desired_count
+        app_dt['output_config'] = str(app_details_obj)
+        if desired_count == 0:
+            app_dt['status'] = 'scaled-to-0'
+        else:
+            app_dt['status'] = 'waiting-for-app-to-get-ready'
+            app_db.App().update(app_id, app_dt)
+            app_dt['status'] = self._check_if_app_is_ready(app_id, app_details_obj.get('app_ip_url', ''),
+                                                           app_details_obj.get('app_url', ''))
         app_db.App().update(app_id, app_dt)
 
     def delete_application(self, app_id, app_info):
         fmlogger.debug("Deleting Application:%s" % app_id)
+        readiness.prober.cancel(app_id)
         app_obj = app_db.App().get(app_id)
 
         try:
@@ -885,19 +1149,25 @@ class ECSHandler(coe_base.COEBase):
                 task_def_arn_list = app_details_obj['task_def_arn']
                 latest_task_def_arn = task_def_arn_list[-1]
                 cont_name = app_details_obj['cont_name']
+                if 'autoscaling' in app_details_obj:
+                    ECSHandler.awshelper.deregister_service_scaling(app_obj.name, app_details_obj['cluster_name'])
                 self._update_ecs_app_service(app_info, cont_name, latest_task_def_arn, task_desired_count=0)
-                for task_def_arn in task_def_arn_list:
-                    self._deregister_task_definition(task_def_arn)
+                ECSHandler.awshelper.deregister_task_definitions(task_def_arn_list)
                 self.ecs_client.delete_service(cluster=app_details_obj['cluster_name'],
                                                service=app_obj.name)
             except Exception as e:
                 fmlogger.error("Exception encountered in trying to delete ecs service %s" % e)
 
-            ECSHandler.awshelper.delete_listener(app_details_obj)
+            if app_details_obj.get('rule_arn'):
+                # The load balancer is shared with the environment's other apps.
+                ECSHandler.awshelper.delete_listener_rule(app_details_obj)
+                ECSHandler.awshelper.delete_target_group(app_details_obj)
+            else:
+                ECSHandler.awshelper.delete_listener(app_details_obj)
 
-            ECSHandler.awshelper.delete_target_group(app_details_obj)
+                ECSHandler.awshelper.delete_target_group(app_details_obj)
 
-            ECSHandler.awshelper.delete_load_balancer(app_details_obj)
+                ECSHandler.awshelper.delete_load_balancer(app_details_obj)
 
             try:
                 tagged_image_list = app_details_obj['image_name']
@@ -912,169 +1182,98 @@ class ECSHandler(coe_base.COEBase):
 
         app_db.App().delete(app_id)
 
-    def _retrieve_runtime_logs(self, cluster_ip, app_name, logs_path, df_dir, pem_file_name):
-        runtime_log = cluster_ip + constants.RUNTIME_LOG
-        runtime_log_path = logs_path + "/" + runtime_log
+    def _get_log_runner(self):
+        """Return the image that collects logs from the container instances.
 
-        mkdir_command = ("mkdir {logs_path}").format(logs_path=runtime_log_path)
-        fmlogger.debug(mkdir_command)
-        os.system(mkdir_command)
+        The image holds only ssh and the collect script. The key, the IPs
+        and the container name are given when it is run, so it is built once
+        and reused for all apps and instances.
+        """
+        tag = hashlib.sha256(COLLECT_LOGS_SCRIPT).hexdigest()[:12]
+        image = constants.ECS_LOG_RUNNER_IMAGE + ":" + tag
+        with _log_runner_lock:
+            if self.docker_handler.get_image_size(image) >= 0:
+                return image
 
-        app_obj = app_db.App().get_by_name(app_name)
-        output_config = ast.literal_eval(app_obj.output_config)
-        tagged_images = output_config['image_name']
-        image = tagged_images[0]
-
-        dockerlogs_sh = "dockerlogs.sh"
-        if not os.path.exists(df_dir + "/" + dockerlogs_sh):
-            fp = open(df_dir + "/" + dockerlogs_sh, "w")
-            file_content = ("#!/bin/bash \n"
-                            "sudo docker ps | grep {image} | awk '{{print $1}}' | xargs docker logs \n"
-                           ).format(image=image)
-            fp.write(file_content)
-            fp.flush()
-            fp.close()
-
-        ssh_wrapper = "ssh_wrapper.sh"
-        ssh_wrapper_path = df_dir + "/" + ssh_wrapper
-        if not os.path.exists(ssh_wrapper_path):
-            fp = open(ssh_wrapper_path, "w")
-            file_content = ("#!/bin/bash \n"
-                            "ssh -o UserKnownHostsFile=/dev/null -o StrictHostKeyChecking=no -i "
-                            "/root/.ssh/{pem_file_name} ec2-user@{cluster_ip} 'bash -s' < {dockerlogs_sh}").format(
-                             pem_file_name=pem_file_name, cluster_ip=cluster_ip, dockerlogs_sh=dockerlogs_sh)
-            fp.write(file_content)
-            fp.flush()
-            fp.close()
-            change_perm_command = ("chmod +x {ssh_wrapper_path}").format(ssh_wrapper_path=ssh_wrapper_path)
-            os.system(change_perm_command)
-
-        dockerfile_name = "Dockerfile.retrieve-logs-" + runtime_log
-        df_path = df_dir + "/" + dockerfile_name
-        if not os.path.exists(df_path):
-            df = self.docker_handler.get_dockerfile_snippet("aws")
-            df = df + ("COPY . /src \n"
-                       "WORKDIR /src \n"
-                       "RUN sudo apt-get install -y openssh-client \n"
-                       "RUN cp -r aws-creds $HOME/.aws \ \n"
-                       " && mkdir /root/.ssh \ \n"
-                       " && cp /src/{pem_file_name} /root/.ssh/. \ \n"
-                       " && chmod 400 /root/.ssh/{pem_file_name} \ \n"
-                       " && ./ssh_wrapper.sh"
-                       ).format(pem_file_name=pem_file_name)
-            fp = open(df_path, "w")
-
-            fp.write(df)
-            fp.flush()
-            fp.close()
-
-        log_cont_name = ("{app_name}-{cluster_ip}-retrieve-run-logs").format(app_name=app_name,
-                                                                             cluster_ip=cluster_ip)
-        err, output = self.docker_handler.build_container_image(log_cont_name, df_path, df_context=df_dir)
-        if not err:
-            filtered_output = self.docker_handler.filter_output(output)
-            log_output_string = '\n'.join(filtered_output)
-
-            fp2 = open(runtime_log_path + "/runtime.log", "w")
-            fp2.write(log_output_string)
-            fp2.flush()
-            fp2.close()
-
-            self.docker_handler.remove_container_image(log_cont_name)
-
-        return runtime_log_path
-
-    def _retrieve_deploy_logs(self, cluster_ip, app_name, logs_path, df_dir, pem_file_name):
-        deploy_log = cluster_ip + constants.DEPLOY_LOG
-        deploy_log_path = logs_path + "/" + deploy_log
-
-        mkdir_command = ("mkdir {logs_path}").format(logs_path=deploy_log_path)
-        fmlogger.debug(mkdir_command)
-        os.system(mkdir_command)
-
-        logs_path_cont = '/src/' + deploy_log
-        scp_cmd = ("ENTRYPOINT [\"scp\", \"-rp\", \"-o\", \"UserKnownHostsFile=/dev/null\", \"-o\", \"StrictHostKeyChecking=no\", "
-                   "\"-i\", \"/root/.ssh/{pem_file_name}\", \"ec2-user@{public_ip}:/var/log/ecs\", \"{logs_path}\" ]"
-                   ).format(pem_file_name=pem_file_name, public_ip=cluster_ip, logs_path=".")
-
-        dockerfile_name = "Dockerfile.retrieve-logs-" + deploy_log
-        df_path = df_dir + "/" + dockerfile_name
-
-        if not os.path.exists(df_path):
-            df = self.docker_handler.get_dockerfile_snippet("aws")
-            df = df + ("COPY . /src \n"
-                       "WORKDIR /src \n"
-                       "RUN sudo apt-get install -y openssh-client \n"
-                       "RUN cp -r aws-creds $HOME/.aws \ \n"
-                       " && mkdir /root/.ssh \ \n"
-                       " && cp /src/{pem_file_name} /root/.ssh/. \ \n"
-                       " && chmod 400 /root/.ssh/{pem_file_name}  \n"
-                       " {scp_command}"
-                       ).format(pem_file_name=pem_file_name, scp_command=scp_cmd)
-            fp = open(df_path, "w")
-
-            fp.write(df)
-            fp.flush()
-            fp.close()
-
-        log_cont_name = ("{app_name}-{cluster_ip}-retrieve-deploy-logs").format(app_name=app_name,
-                                                                                cluster_ip=cluster_ip)
-        err, output = self.docker_handler.build_container_image(log_cont_name, df_path, df_context=df_dir)
-
-        if not err:
-            run_err, run_output = self.docker_handler.run_container(log_cont_name)
-            if not run_err:
-                logs_cont_id = run_output.strip()
-
-                time.sleep(5) # Allow time to retrieve the logs
-                logs_cp_cmd = ("docker cp {cont_id}:{logs_path_cont} {logs_path}/").format(cont_id=logs_cont_id,
-                                                                                           logs_path_cont="/src/ecs",
-                                                                                           logs_path=deploy_log_path)
-                fmlogger.debug(logs_cp_cmd)
-                os.system(logs_cp_cmd)
-
-                self.docker_handler.stop_container(logs_cont_id)
-                self.docker_handler.remove_container(logs_cont_id)
-                self.docker_handler.remove_container_image(log_cont_name)
-        return deploy_log_path
-
-    def _retrieve_logs(self, app_info):
+            script_dir = tempfile.mkdtemp()
+            try:
+                script_path = script_dir + "/collect-logs.sh"
+                fp = open(script_path, "w")
+                fp.write(COLLECT_LOGS_SCRIPT)
+                fp.close()
+                df = self.docker_handler.get_dockerfile_snippet("aws")
+                df = df + ("COPY collect-logs.sh /usr/local/bin/collect-logs.sh \n"
+                           "RUN sudo apt-get update && sudo apt-get install -y openssh-client \\ \n"
+                           " && chmod +x /usr/local/bin/collect-logs.sh \n"
+                           "ENTRYPOINT [\"/usr/local/bin/collect-logs.sh\"] \n")
+                err, output = self.docker_handler.build_image_from_files(
+                    constants.ECS_LOG_RUNNER_IMAGE, df, {'collect-logs.sh': script_path}, tag=tag)
+            finally:
+                shutil.rmtree(script_dir, ignore_errors=True)
+
+            if self.docker_handler.get_image_size(image) < 0:
+                fmlogger.error("Error encountered in building log runner image %s" % err)
+                return ''
+        return image
+
+    def _retrieve_logs(self, app_info, output_config):
         env_obj = env_db.Environment().get(app_info['env_id'])
         env_output_config = ast.literal_eval(env_obj.output_config)
-        cluster_ips = env_output_config['cluster_ips']
         cluster_name = env_output_config['cluster_name']
         pem_file = env_output_config['key_file']
 
-        app_name = app_info['app_name']
-        app_location = app_info['app_location']
-
-        self._copy_creds(app_info, provided_df_dir=app_location)
+        # Instances may have been replaced since the cluster was created.
+        try:
+            cluster_ips = ECSHandler.awshelper.get_cluster_instance_ips(cluster_name)
+        except Exception as e:
+            fmlogger.error("Exception encountered in finding cluster instances %s" % e)
+            cluster_ips = env_output_config['cluster_ips']
 
-        df_dir = app_location
         logs_path = app_info['app_location'] + "/logs"
-        logs_path_cmd = ("mkdir {logs_path}").format(logs_path=logs_path)
-        os.system(logs_path_cmd)
+        if not os.path.exists(logs_path):
+            os.makedirs(logs_path)
 
-        pem_file_name = ("{cluster_name}.pem").format(cluster_name=cluster_name)
-        copy_pem_file = ("cp {pem_file} {df_dir}/{pem_file_name}").format(pem_file=pem_file,
-                                                                          df_dir=df_dir,
-                                                                          pem_file_name=pem_file_name)
-        fmlogger.debug(copy_pem_file)
-        os.system(copy_pem_file)
+        image = self._get_log_runner()
+        if not image or not cluster_ips:
+            return []
+
+        args = [output_config['cont_name'], app_info.get('logs_since') or '',
+                app_info.get('logs_until') or '', constants.ECS_LOG_COLLECTION_CONCURRENCY]
+        volumes = {logs_path: '/logs', os.path.abspath(pem_file): '/key/key.pem:ro'}
+        err, output = self.docker_handler.run_container_with_volumes(image, volumes, args + cluster_ips)
+        if err:
+            fmlogger.debug("Log collection output: %s" % err)
 
         logs_path_list = []
         for cluster_ip in cluster_ips:
-            deploy_logs_path = self._retrieve_deploy_logs(cluster_ip, app_name, logs_path,
-                                                          df_dir, pem_file_name)
-            runtime_logs_path = self._retrieve_runtime_logs(cluster_ip, app_name, logs_path,
-                                                            df_dir, pem_file_name)
-            logs_path_list.append(deploy_logs_path)
-            logs_path_list.append(runtime_logs_path)
+            logs_path_list.append(logs_path + "/" + cluster_ip + constants.DEPLOY_LOG)
+            logs_path_list.append(logs_path + "/" + cluster_ip + constants.RUNTIME_LOG)
         return logs_path_list
 
+    def _retrieve_cloudwatch_logs(self, app_info, output_config):
+        log_group = output_config['log_group']
+        runtime_log_path = app_info['app_location'] + "/logs/cloudwatch" + constants.RUNTIME_LOG
+        if not os.path.exists(runtime_log_path):
+            os.makedirs(runtime_log_path)
+
+        events = ECSHandler.awshelper.get_log_events(log_group, app_info['app_name'] + "/",
+                                                     start_time=app_info.get('logs_since'),
+                                                     end_time=app_info.get('logs_until'))
+        fp = open(runtime_log_path + "/runtime.log", "w")
+        for timestamp, stream, message in events:
+            event_time = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(timestamp / 1000))
+            fp.write(("{time} {stream} {message}\n").format(time=event_time, stream=stream,
+                                                            message=message.encode('utf-8')))
+        fp.close()
+        return [runtime_log_path]
+
     def get_logs(self, app_id, app_info):
         fmlogger.debug("Retrieving logs for application %s %s" % (app_id, app_info['app_name']))
-        logs_path_list = self._retrieve_logs(app_info)
+        app_obj = app_db.App().get(app_id)
+        output_config = ast.literal_eval(app_obj.output_config)
+        if output_config.get('log_group'):
+            return self._retrieve_cloudwatch_logs(app_info, output_config)
+        logs_path_list = self._retrieve_logs(app_info, output_config)
         return logs_path_list
 
     def run_command(self, env_id, env_name, resource_obj, command):
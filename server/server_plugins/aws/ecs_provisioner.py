@@ -0,0 +1,218 @@
+import json
+import os
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+from server.common import constants
+from server.common import exceptions
+from server.common import fm_logger
+
+fmlogger = fm_logger.Logging()
+
+ECS_INSTANCE_ROLE_POLICY = 'arn:aws:iam::aws:policy/service-role/AmazonEC2ContainerServiceforEC2Role'
+
+EC2_ASSUME_ROLE_POLICY = json.dumps({
+    'Version': '2012-10-17',
+    'Statement': [{'Effect': 'Allow',
+                   'Principal': {'Service': 'ec2.amazonaws.com'},
+                   'Action': 'sts:AssumeRole'}]})
+
+CLUSTER_TAG = 'cloudark-cluster'
+
+
+class ECSClusterProvisioner(object):
+    """Creates and deletes ECS clusters with the AWS APIs.
+
+    A cluster is an ECS cluster, a key pair for ssh access and container
+    instances started from the ECS optimized AMI with an ECS_CLUSTER user
+    data entry so that they register with the cluster. Instances are tagged
+    with the cluster name, which is how they are found again on delete.
+    Each phase is timed and reported in the phases dict so that slow or
+    failing phases are visible in the environment's output.
+    """
+
+    def __init__(self):
+        self.ecs_client = boto3.client('ecs')
+        self.ec2_client = boto3.client('ec2')
+        self.iam_client = boto3.client('iam')
+        self.ssm_client = boto3.client('ssm')
+
+    def _timed(self, phases, phase, func, *args):
+        start = time.time()
+        try:
+            return func(*args)
+        except exceptions.ECSClusterProvisioningFailure:
+            raise
+        except Exception as e:
+            raise exceptions.ECSClusterProvisioningFailure(phase, e)
+        finally:
+            phases[phase] = round(time.time() - start, 1)
+            fmlogger.debug("ECS provisioning phase %s took %s seconds" % (phase, phases[phase]))
+
+    def _create_cluster(self, cluster_name):
+        self.ecs_client.create_cluster(clusterName=cluster_name)
+
+    def _create_key_pair(self, key_name, pem_file):
+        response = self.ec2_client.create_key_pair(KeyName=key_name)
+        fd = os.open(pem_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o400)
+        fp = os.fdopen(fd, "w")
+        fp.write(response['KeyMaterial'])
+        fp.close()
+
+    def _get_instance_profile(self):
+        profile_name = constants.ECS_INSTANCE_PROFILE
+        try:
+            profile = self.iam_client.get_instance_profile(InstanceProfileName=profile_name)
+            if profile['InstanceProfile']['Roles']:
+                return profile_name
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'NoSuchEntity':
+                raise
+            self.iam_client.create_instance_profile(InstanceProfileName=profile_name)
+
+        fmlogger.debug("Creating ECS instance role %s" % profile_name)
+        try:
+            self.iam_client.create_role(RoleName=profile_name,
+                                        AssumeRolePolicyDocument=EC2_ASSUME_ROLE_POLICY)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'EntityAlreadyExists':
+                raise
+        self.iam_client.attach_role_policy(RoleName=profile_name, PolicyArn=ECS_INSTANCE_ROLE_POLICY)
+        self.iam_client.add_role_to_instance_profile(InstanceProfileName=profile_name,
+                                                     RoleName=profile_name)
+        return profile_name
+
+    def _get_ami(self):
+        response = self.ssm_client.get_parameter(Name=constants.ECS_AMI_PARAMETER)
+        return response['Parameter']['Value']
+
+    def _run_instances(self, cluster_name, key_name, ami_id, instance_type,
+                       cluster_size, subnet_ids, sec_group_id, profile_name):
+        user_data = ("#!/bin/bash\n"
+                     "echo ECS_CLUSTER={cluster} >> /etc/ecs/ecs.config\n").format(cluster=cluster_name)
+        tags = [{'ResourceType': 'instance',
+                 'Tags': [{'Key': 'Name', 'Value': cluster_name},
+                          {'Key': CLUSTER_TAG, 'Value': cluster_name}]}]
+
+        # Spread the instances over the subnets, i.e. availability zones.
+        counts = {}
+        for i in range(cluster_size):
+            subnet_id = subnet_ids[i % len(subnet_ids)]
+            counts[subnet_id] = counts.get(subnet_id, 0) + 1
+
+        instance_ids = []
+        for subnet_id, count in counts.items():
+            # A new instance profile takes a few seconds to become usable.
+            for attempt in range(constants.ECS_IAM_PROPAGATION_RETRIES):
+                try:
+                    response = self.ec2_client.run_instances(
+                        ImageId=ami_id, InstanceType=instance_type,
+                        MinCount=count, MaxCount=count, KeyName=key_name,
+                        SubnetId=subnet_id, SecurityGroupIds=[sec_group_id],
+                        IamInstanceProfile={'Name': profile_name},
+                        UserData=user_data, TagSpecifications=tags)
+                    break
+                except ClientError as e:
+                    if (e.response['Error']['Code'] != 'InvalidParameterValue' or
+                        attempt == constants.ECS_IAM_PROPAGATION_RETRIES - 1):
+                        raise
+                    time.sleep(5)
+            instance_ids.extend([instance['InstanceId'] for instance in response['Instances']])
+        return instance_ids
+
+    def _wait_for_instances(self, instance_ids):
+        waiter = self.ec2_client.get_waiter('instance_running')
+        waiter.wait(InstanceIds=instance_ids,
+                    WaiterConfig={'Delay': 5,
+                                  'MaxAttempts': constants.ECS_CLUSTER_TIMEOUT / 5})
+
+    def _wait_for_registration(self, cluster_name, cluster_size):
+        deadline = time.time() + constants.ECS_CLUSTER_TIMEOUT
+        while time.time() < deadline:
+            clusters = self.ecs_client.describe_clusters(clusters=[cluster_name])['clusters']
+            if clusters and clusters[0]['registeredContainerInstancesCount'] >= cluster_size:
+                return
+            time.sleep(5)
+        raise Exception("Container instances did not register within %s seconds."
+                        % constants.ECS_CLUSTER_TIMEOUT)
+
+    def get_instance_ips(self, instance_ids):
+        ip_list = []
+        paginator = self.ec2_client.get_paginator('describe_instances')
+        for page in paginator.paginate(InstanceIds=instance_ids):
+            for reservation in page['Reservations']:
+                for instance in reservation['Instances']:
+                    if instance.get('PublicIpAddress'):
+                        ip_list.append(instance['PublicIpAddress'])
+        return ip_list
+
+    def prepare(self, phases):
+        """Look up what is needed to launch instances, without creating anything.
+
+        Returns (ami_id, profile_name). Errors here leave nothing behind.
+        """
+        ami_id = self._timed(phases, 'lookup-ami', self._get_ami)
+        profile_name = self._timed(phases, 'instance-profile', self._get_instance_profile)
+        return ami_id, profile_name
+
+    def create(self, cluster_name, key_name, pem_file, ami_id, profile_name, instance_type,
+               cluster_size, subnet_ids, sec_group_id, phases):
+        """Create the cluster and return the ids of its container instances.
+
+        Raises exceptions.ECSClusterProvisioningFailure naming the phase that failed.
+        """
+        self._timed(phases, 'create-cluster', self._create_cluster, cluster_name)
+        self._timed(phases, 'create-key-pair', self._create_key_pair, key_name, pem_file)
+        instance_ids = self._timed(phases, 'run-instances', self._run_instances,
+                                   cluster_name, key_name, ami_id, instance_type,
+                                   cluster_size, subnet_ids, sec_group_id, profile_name)
+        self._timed(phases, 'instances-running', self._wait_for_instances, instance_ids)
+        self._timed(phases, 'instances-registered', self._wait_for_registration,
+                    cluster_name, cluster_size)
+        return instance_ids
+
+    def delete(self, cluster_name, key_name):
+        """Terminate the cluster's instances, then delete its key pair and the ECS cluster."""
+        instance_ids = []
+        paginator = self.ec2_client.get_paginator('describe_instances')
+        filters = [{'Name': 'tag:' + CLUSTER_TAG, 'Values': [cluster_name]},
+                   {'Name': 'instance-state-name',
+                    'Values': ['pending', 'running', 'stopping', 'stopped']}]
+        for page in paginator.paginate(Filters=filters):
+            for reservation in page['Reservations']:
+                instance_ids.extend([instance['InstanceId'] for instance in reservation['Instances']])
+
+        if instance_ids:
+            self.ec2_client.terminate_instances(InstanceIds=instance_ids)
+            # The security group can only be deleted once its instances are gone.
+            waiter = self.ec2_client.get_waiter('instance_terminated')
+            waiter.wait(InstanceIds=instance_ids,
+                        WaiterConfig={'Delay': 5,
+                                      'MaxAttempts': constants.ECS_CLUSTER_TIMEOUT / 5})
+
+        try:
+            self.ec2_client.delete_key_pair(KeyName=key_name)
+        except Exception as e:
+            fmlogger.error("Error encountered in deleting key pair. %s" % e)
+        try:
+            self._deregister_container_instances(cluster_name)
+            self.ecs_client.delete_cluster(cluster=cluster_name)
+        except Exception as e:
+            fmlogger.error("Error encountered in deleting cluster %s" % e)
+
+    def _deregister_container_instances(self, cluster_name):
+        # ECS lists terminated instances for a while, and a cluster with
+        # container instances can not be deleted.
+        container_instance_arns = []
+        paginator = self.ecs_client.get_paginator('list_container_instances')
+        for page in paginator.paginate(cluster=cluster_name):
+            container_instance_arns.extend(page['containerInstanceArns'])
+        for container_instance_arn in container_instance_arns:
+            try:
+                self.ecs_client.deregister_container_instance(cluster=cluster_name,
+                                                              containerInstance=container_instance_arn,
+                                                              force=True)
+            except Exception as e:
+                fmlogger.error("Error encountered in deregistering container instance %s" % e)
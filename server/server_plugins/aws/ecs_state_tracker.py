@@ -0,0 +1,183 @@
+import threading
+import time
+
+from server.common import constants
+from server.common import fm_logger
+
+fmlogger = fm_logger.Logging()
+
+# Maximum number of tasks and services per describe call of the ECS API.
+DESCRIBE_TASKS_BATCH = 100
+DESCRIBE_SERVICES_BATCH = 10
+
+
+def _ecs_client():
+    # boto3 is imported when the first waiter is submitted, so that the
+    # tracker can be created and tested with any client.
+    import boto3
+    return boto3.client('ecs')
+
+
+class Waiter(object):
+    """A caller waiting for ECS tasks or a service to reach a state.
+
+    check is called with the descriptions of the waiter's tasks, or of its
+    service, after every poll. It returns True once the state is reached,
+    False to keep waiting, or None if the state can no longer be reached.
+    """
+
+    def __init__(self, cluster_name, task_arns, service_name, check, timeout):
+        self.cluster_name = cluster_name
+        self.task_arns = task_arns
+        self.service_name = service_name
+        self.check = check
+        self.deadline = time.time() + timeout
+        self.descriptions = []
+        self.reached = False
+        self.done = threading.Event()
+
+    def finish(self, reached):
+        self.reached = reached
+        self.done.set()
+
+
+class ECSStateTracker(object):
+    """Tracks the state of ECS tasks and services for any number of waiters.
+
+    A single thread polls every interval seconds. The tasks and services of
+    all waiters of a cluster are described together, 100 tasks or 10
+    services per call, however many deploys are in progress. Each waiter is
+    woken as soon as its own state is reached or its timeout passes.
+    """
+
+    def __init__(self, interval=constants.ECS_STATE_POLL_INTERVAL, client_factory=_ecs_client):
+        self.interval = interval
+        self.client_factory = client_factory
+        self.cond = threading.Condition()
+        self.waiters = set()
+        self.thread = None
+        self.ecs_client = None
+
+    def submit(self, cluster_name, check, task_arns=None, service_name='',
+               timeout=constants.ECS_STATE_TIMEOUT):
+        """Start tracking and return the Waiter. Waiter.done is set when it ends."""
+        waiter = Waiter(cluster_name, list(task_arns or []), service_name, check, timeout)
+        with self.cond:
+            if not self.thread:
+                self.ecs_client = self.client_factory()
+                self.thread = threading.Thread(target=self._run, name="ecs-state-tracker")
+                self.thread.daemon = True
+                self.thread.start()
+            self.waiters.add(waiter)
+            self.cond.notify()
+        return waiter
+
+    def wait_for_tasks(self, cluster_name, task_arns, status, timeout=constants.ECS_STATE_TIMEOUT):
+        """Wait until all tasks have lastStatus status. Returns (reached, tasks).
+
+        Tasks that ECS no longer knows about count as stopped. Waiting for
+        any other status ends as soon as one of the tasks has stopped.
+        """
+        task_arns = [task_arn for task_arn in task_arns if task_arn]
+        if not task_arns:
+            return True, []
+        status = status.upper()
+
+        def check(tasks):
+            if status != 'STOPPED' and [task for task in tasks if task['lastStatus'] == 'STOPPED']:
+                return None
+            if len(tasks) < len(task_arns) and status != 'STOPPED':
+                return False
+            return all([task['lastStatus'] == status for task in tasks])
+
+        waiter = self.submit(cluster_name, check, task_arns=task_arns, timeout=timeout)
+        waiter.done.wait()
+        return waiter.reached, waiter.descriptions
+
+    def wait_for_service(self, cluster_name, service_name, check, timeout=constants.ECS_STATE_TIMEOUT):
+        """Wait until check(service description) returns True. Returns (reached, service)."""
+        waiter = self.submit(cluster_name, lambda services: bool(services) and check(services[0]),
+                             service_name=service_name, timeout=timeout)
+        waiter.done.wait()
+        service = waiter.descriptions[0] if waiter.descriptions else {}
+        return waiter.reached, service
+
+    def wait_for_service_count(self, cluster_name, service_name, desired_count,
+                               timeout=constants.ECS_STATE_TIMEOUT):
+        """Wait until the service runs desired_count tasks and has none pending."""
+        def check(service):
+            return service['pendingCount'] == 0 and service['runningCount'] == desired_count
+        reached, service = self.wait_for_service(cluster_name, service_name, check, timeout=timeout)
+        return reached
+
+    def _describe(self, cluster_name, task_arns, service_names):
+        tasks = {}
+        for i in range(0, len(task_arns), DESCRIBE_TASKS_BATCH):
+            response = self.ecs_client.describe_tasks(cluster=cluster_name,
+                                                      tasks=task_arns[i:i + DESCRIBE_TASKS_BATCH])
+            for task in response['tasks']:
+                tasks[task['taskArn']] = task
+        services = {}
+        for i in range(0, len(service_names), DESCRIBE_SERVICES_BATCH):
+            response = self.ecs_client.describe_services(cluster=cluster_name,
+                                                         services=service_names[i:i + DESCRIBE_SERVICES_BATCH])
+            for service in response['services']:
+                services[service['serviceName']] = service
+        return tasks, services
+
+    def _poll(self, waiters):
+        clusters = {}
+        for waiter in waiters:
+            clusters.setdefault(waiter.cluster_name, []).append(waiter)
+
+        for cluster_name, cluster_waiters in clusters.items():
+            task_arns = sorted(set([arn for waiter in cluster_waiters for arn in waiter.task_arns]))
+            service_names = sorted(set([waiter.service_name for waiter in cluster_waiters
+                                        if waiter.service_name]))
+            try:
+                tasks, services = self._describe(cluster_name, task_arns, service_names)
+            except Exception as e:
+                # Waiters of the cluster are tried again on the next poll.
+                fmlogger.debug("Exception encountered in describing tasks and services of %s. %s"
+                               % (cluster_name, e))
+                continue
+
+            for waiter in cluster_waiters:
+                if waiter.service_name:
+                    waiter.descriptions = [services[waiter.service_name]] if waiter.service_name in services else []
+                else:
+                    waiter.descriptions = [tasks[arn] for arn in waiter.task_arns if arn in tasks]
+                try:
+                    result = waiter.check(waiter.descriptions)
+                    if result is None:
+                        waiter.finish(False)
+                    elif result:
+                        waiter.finish(True)
+                except Exception as e:
+                    fmlogger.error("Error encountered in checking ECS state: %s" % e)
+                    waiter.finish(False)
+
+        now = time.time()
+        for waiter in waiters:
+            if not waiter.done.is_set() and now > waiter.deadline:
+                fmlogger.debug("Waiting for ECS state in cluster %s timed out." % waiter.cluster_name)
+                waiter.finish(False)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.waiters:
+                    self.cond.wait()
+                waiters = list(self.waiters)
+            try:
+                self._poll(waiters)
+            except Exception as e:
+                fmlogger.error("Error encountered in tracking ECS state: %s" % e)
+            with self.cond:
+                for waiter in waiters:
+                    if waiter.done.is_set():
+                        self.waiters.discard(waiter)
+            time.sleep(self.interval)
+
+
+tracker = ECSStateTracker()
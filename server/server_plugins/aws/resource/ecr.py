@@ -1,9 +1,7 @@
 import ast
 import base64
 import boto3
-import os
 from os.path import expanduser
-import shutil
 import time
 
 import server.server_plugins.resource_base as resource_base
@@ -11,6 +9,7 @@ from server.common import constants
 from server.common import common_functions
 from server.common import docker_lib
 from server.common import fm_logger
+from server.common import image_push
 from server.dbmodule.objects import container as cont_db
 from server.server_plugins.aws import aws_helper
 
@@ -55,16 +54,36 @@ class ECRHandler(resource_base.ResourceBase):
         return repo_name, proxy_endpoint, username, password, decoded_auth_token
 
     def _set_up_docker_client(self, username, password, proxy_endpoint):
-        err, output = self.docker_handler.docker_login(username, password, proxy_endpoint)
+        err, output = image_push.push_service.login(proxy_endpoint,
+                                                    lambda: (username, password))
         return err, output
 
+    def _image_exists(self, repo_name, tag):
+        try:
+            resp = self.ecr_client.describe_images(repositoryName=repo_name,
+                                                   imageIds=[{'imageTag': tag}])
+            return len(resp['imageDetails']) > 0
+        except Exception:
+            return False
+
+    def _push_container(self, cont_name, repo_name, tagged_image, tag):
+        def _report_progress(done, total):
+            cont_db.Container().update(cont_name, {'status': ("pushing-app-cont-to-ecr-repository "
+                                                              "{done}/{total} layers").format(done=done,
+                                                                                              total=total)})
+        return image_push.push_service.push(tagged_image,
+                                            exists_in_registry=lambda: self._image_exists(repo_name, tag),
+                                            progress_callback=_report_progress)
+
     def _build_container(self, cont_info, repo_name, proxy_endpoint, tag=''):
         df_dir = common_functions.get_df_dir(cont_info)
         cont_name = proxy_endpoint[8:] + "/" + repo_name  # Removing initial https:// from proxy_endpoint
         fmlogger.debug("Container name that will be used in building:%s" % cont_name)
 
+        cache_from = self.docker_handler.get_latest_image(cont_name)
         err, output = self.docker_handler.build_container_image(cont_name, df_dir + "/Dockerfile",
-                                                                df_context=df_dir, tag=tag)
+                                                                df_context=df_dir, tag=tag,
+                                                                cache_from=cache_from)
         return err, output, cont_name
 
     def _delete_repository(self, repo_name):
@@ -74,11 +93,6 @@ class ECRHandler(resource_base.ResourceBase):
             fmlogger.error("Exception encountered in trying to delete repository:%s" % e)
 
     def create(self, cont_name, cont_info):
-
-        df_dir = common_functions.get_df_dir(cont_info)
-        if not os.path.exists(df_dir + "/aws-creds"):
-            shutil.copytree(home_dir + "/.aws", df_dir + "/aws-creds")
-
         cont_details = {}
         cont_data = {}
 
@@ -110,7 +124,7 @@ class ECRHandler(resource_base.ResourceBase):
             cont_details['password'] = password
             cont_data['output_config'] = str(cont_details)
             err, output = self._set_up_docker_client(username, password, proxy_endpoint)
-            if err and err.strip() != 'WARNING! Using --password via the CLI is insecure. Use --password-stdin.':
+            if err:
                 fmlogger.debug("Error encountered in executing docker login command. Not continuing with the request. %s" % err)
                 return
 
@@ -131,9 +145,11 @@ class ECRHandler(resource_base.ResourceBase):
         cont_data['status'] = 'pushing-app-cont-to-ecr-repository'
         cont_data['output_config'] = str(cont_details)
         cont_db.Container().update(cont_name, cont_data)
-        err, output = self.docker_handler.push_container(tagged_image)
+        err, output = self._push_container(cont_name, repo_name, tagged_image, tag)
         if err:
             fmlogger.debug("Error encountered in pushing container image to ECR. Not continuing with the request.")
+            cont_data['status'] = 'error-in-container-push-to-ecr:' + str(err)
+            cont_db.Container().update(cont_name, cont_data)
             return
         fmlogger.debug("Completed pushing container %s to AWS ECR" % tagged_image)
 
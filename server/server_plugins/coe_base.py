@@ -2,6 +2,9 @@ import abc
 
 import six
 
+from server.common import common_functions
+from server.common import exceptions
+
 
 @six.add_metaclass(abc.ABCMeta)
 class COEBase(object):
@@ -50,6 +53,19 @@ class COEBase(object):
                          Includes: env_id, location of Dockerfile, etc.
         """
 
+    def scale_application(self, app_id, app_info):
+        """Change the number of running instances of an application.
+
+        :param app_id: DB Id of the application.
+        :param app_info: A dictionary containing information that
+                         was used during application creation
+                         Includes: env_id, replicas (the new instance count)
+
+        COEs that cannot scale an application keep this default, which
+        raises exceptions.ScalingNotSupported.
+        """
+        raise exceptions.ScalingNotSupported(common_functions.get_coe_type_for_app(app_id))
+
     @abc.abstractmethod
     def delete_application(self, app_id, app_info):
         """Delete application.
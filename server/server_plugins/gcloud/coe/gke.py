@@ -13,6 +13,7 @@ from oauth2client.client import GoogleCredentials
 from server.common import constants
 from server.common import common_functions
 from server.common import docker_lib
+from server.common import env_definition
 from server.common import exceptions
 from server.common import fm_logger
 from server.dbmodule.objects import app as app_db
@@ -204,7 +205,7 @@ class GKEHandler(coe_base.COEBase):
 
         env_obj = env_db.Environment().get(env_id)
         env_name = env_obj.name
-        env_details = ast.literal_eval(env_obj.env_definition)
+        env_def = env_definition.get(env_obj)
 
         env_output_config = ast.literal_eval(env_obj.output_config)
         env_version_stamp = env_output_config['env_version_stamp']
@@ -220,29 +221,10 @@ class GKEHandler(coe_base.COEBase):
         res_data['status'] = 'provisioning'
         res_id = res_db.Resource().insert(res_data)
 
-        cluster_size = 1
-        if 'cluster_size' in env_details['environment']['app_deployment']:
-            cluster_size = env_details['environment']['app_deployment']['cluster_size']
-
-        project = ""
-        if 'project' in env_details['environment']['app_deployment']:
-            project = env_details['environment']['app_deployment']['project']
-        else:
-            fmlogger("Project ID required. Not continuing with the request.")
-            status = 'not-continuing-with-provisioning:missing parameter project id'
-            res_data['status'] = status
-            res_db.Resource().update(res_id, res_data)
-            return status
-
-        zone = ""
-        if 'zone' in env_details['environment']['app_deployment']:
-            zone = env_details['environment']['app_deployment']['zone']
-        else:
-            fmlogger("Zone required. Not continuing with the request.")
-            status = 'not-continuing-with-provisioning:missing parameter zone'
-            res_data['status'] = status
-            res_db.Resource().update(res_id, res_data)
-            return status
+        # Project and zone are checked when the environment is created.
+        cluster_size = env_def.cluster_size
+        project = env_def.project
+        zone = env_def.zone
 
         filtered_description['cluster_name'] = cluster_name
         filtered_description['project'] = project
@@ -251,9 +233,7 @@ class GKEHandler(coe_base.COEBase):
         res_data['filtered_description'] = str(filtered_description)
         res_db.Resource().update(res_id, res_data)
 
-        instance_type = DEFAULT_MACHINE_TYPE
-        if 'instance_type' in env_details['environment']['app_deployment']:
-            instance_type = env_details['environment']['app_deployment']['instance_type']
+        instance_type = env_def.instance_type or DEFAULT_MACHINE_TYPE
 
         try:
             self._create_network(env_id, project, cluster_name)
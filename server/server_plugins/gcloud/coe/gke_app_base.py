@@ -2,6 +2,7 @@ import ast
 import os
 from os.path import expanduser
 import shutil
+import tempfile
 import time
 import yaml
 
@@ -50,15 +51,6 @@ class GKEAppBase(app_base.AppBase):
         cluster_name = resource_obj.cloud_resource_id
         return cluster_name
 
-    def _copy_creds(self, app_info):
-        app_dir = app_info['app_location']
-        app_folder_name = app_info['app_folder_name']
-
-        df_dir = app_dir + "/" + app_folder_name
-
-        if not os.path.exists(df_dir + "/google-creds"):
-            shutil.copytree(home_dir + "/.config/gcloud", df_dir + "/google-creds/gcloud")
-
     def _get_access_token(self, app_info):
         access_token = ''
         df = self.docker_handler.get_dockerfile_snippet("google_for_token")
@@ -98,20 +90,12 @@ class GKEAppBase(app_base.AppBase):
 
     def _setup_kube_config(self, app_info):
         df = self._get_kube_df_file(app_info)
-        app_dir = app_info['app_location']
-        app_folder_name = app_info['app_folder_name']
         cont_name = app_info['app_name'] + "-get-kubeconfig"
 
-        df_dir = app_dir + "/" + app_folder_name
-        df_name = df_dir + "/Dockerfile.get-kubeconfig"
-        fp = open(df_name, "w")
-        fp.write(df)
-        fp.close()
-
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             cont_name,
-            df_name,
-            df_context=df_dir
+            df,
+            self.docker_handler.get_creds_context(constants.GOOGLE)
         )
 
         if err:
@@ -132,25 +116,23 @@ class GKEAppBase(app_base.AppBase):
             shutil.move(home_dir + "/.kube/config",
                         home_dir + "/.kube/config-" + kubeconfig_orig_ts)
 
-        retrieve_creds_file = ("docker cp {docker_img}:/root/.kube/config {df_dir}/kube-config/").format(
-            docker_img=docker_image_id,
-            df_dir=df_dir
-        )
-        kube_config_path = ("{df_dir}/kube-config/").format(df_dir=df_dir)
-        if not os.path.exists(kube_config_path):
-            os.system("mkdir " + kube_config_path)
-        fmlogger.debug(retrieve_creds_file)
-        os.system(retrieve_creds_file)
-
-        copy_creds_file = ("cp {df_dir}/kube-config/config {home_dir}/.kube/config").format(
-            df_dir=df_dir,
-            home_dir=home_dir
-        )
-        home_kube_config_path = ("{home_dir}/.kube/").format(home_dir=home_dir)
-        if not os.path.exists(home_kube_config_path):
-            os.system("mkdir " + home_kube_config_path)
-        fmlogger.debug(copy_creds_file)
-        os.system(copy_creds_file)
+        # The kubeconfig is copied out of the container through a scratch directory.
+        kube_config_dir = tempfile.mkdtemp()
+        try:
+            retrieve_creds_file = ("docker cp {docker_img}:/root/.kube/config {kube_config_dir}/").format(
+                docker_img=docker_image_id,
+                kube_config_dir=kube_config_dir
+            )
+            fmlogger.debug(retrieve_creds_file)
+            os.system(retrieve_creds_file)
+
+            home_kube_config_path = ("{home_dir}/.kube/").format(home_dir=home_dir)
+            if not os.path.exists(home_kube_config_path):
+                os.system("mkdir " + home_kube_config_path)
+            if os.path.exists(kube_config_dir + "/config"):
+                shutil.copy(kube_config_dir + "/config", home_kube_config_path + "config")
+        finally:
+            shutil.rmtree(kube_config_dir, ignore_errors=True)
 
         self.docker_handler.stop_container(docker_image_id)
         self.docker_handler.remove_container(docker_image_id)
@@ -297,15 +279,13 @@ class GKEAppBase(app_base.AppBase):
 
         log_cont_name = app_info['app_name'] + "-get-runtimelogs"
 
-        df_name = df_dir + "/Dockerfile.get-runtimelogs"
-        fp = open(df_name, "w")
-        fp.write(df)
-        fp.close()
+        context_files = self.docker_handler.get_creds_context(constants.GOOGLE)
+        context_files[get_logs] = get_logs_wrapper
 
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             log_cont_name,
-            df_name,
-            df_context=df_dir
+            df,
+            context_files
         )
 
         if err:
@@ -370,15 +350,13 @@ class GKEAppBase(app_base.AppBase):
 
         log_cont_name = app_info['app_name'] + "-get-deploytimelogs"
 
-        df_name = df_dir + "/Dockerfile.get-deploytimelogs"
-        fp = open(df_name, "w")
-        fp.write(df)
-        fp.close()
+        context_files = self.docker_handler.get_creds_context(constants.GOOGLE)
+        context_files[get_logs] = get_logs_wrapper
 
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             log_cont_name,
-            df_name,
-            df_context=df_dir
+            df,
+            context_files
         )
 
         if err:
@@ -15,6 +15,8 @@ from server.common import common_functions
 from server.common import docker_lib
 from server.common import exceptions
 from server.common import fm_logger
+from server.common import log_classifier
+from server.common import readiness
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
 from server.dbmodule.objects import resource as res_db
@@ -118,19 +120,20 @@ class GKEMultiContainer(gke_app_base.GKEAppBase):
         app_dir = app_info['app_location']
         app_folder_name = app_info['app_folder_name']
         df_dir = app_dir + "/" + app_folder_name
-        df_name = df_dir + "/Dockerfile.deploy"
-        fp = open(df_name, "w")
-        fp.write(df_file)
-        fp.close()
 
-        err, output = self.docker_handler.build_container_image(
+        context_files = self.docker_handler.get_creds_context(constants.GOOGLE)
+        context_files[kubernetes_yaml] = app_info.get('rendered_app_yaml',
+                                                      df_dir + "/" + kubernetes_yaml)
+
+        err, output = self.docker_handler.build_image_from_files(
             cont_name,
-            df_name,
-            df_context=df_dir
+            df_file,
+            context_files
         )
 
         if err:
-            error_output = common_functions.filter_error_output(output)
+            error_output = common_functions.filter_error_output(output, [log_classifier.DOCKER,
+                                                                         log_classifier.KUBECTL])
             error_msg = ("Error encountered in building Dockerfile.deploy {e}").format(e=err)
             error_msg = error_msg + " " + error_output
             fmlogger.error(error_msg)
@@ -168,7 +171,6 @@ class GKEMultiContainer(gke_app_base.GKEAppBase):
 
     def deploy_application(self, app_id, app_info):
         fmlogger.debug("Deploying application %s" % app_info['app_name'])
-        self._copy_creds(app_info)
 
         app_data = {}
 
@@ -181,7 +183,7 @@ class GKEMultiContainer(gke_app_base.GKEAppBase):
             app_db.App().update(app_id, {'status': str(e)})
 
         # Resolve environment
-        common_functions.resolve_environment_multicont(app_id, app_info)
+        app_info['rendered_app_yaml'] = common_functions.resolve_environment_multicont(app_id, app_info)
 
         app_details = {}
         app_data = {}
@@ -203,6 +205,7 @@ class GKEMultiContainer(gke_app_base.GKEAppBase):
 
     def delete_application(self, app_id, app_info):
         fmlogger.debug("Deleting application %s" % app_info['app_name'])
+        readiness.prober.cancel(app_id)
 
         app_obj = app_db.App().get(app_id)
         try:
@@ -13,6 +13,7 @@ from server.common import constants
 from server.common import common_functions
 from server.common import docker_lib
 from server.common import fm_logger
+from server.common import readiness
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
 from server.dbmodule.objects import resource as res_db
@@ -135,7 +136,6 @@ class GKESingleContainer(gke_app_base.GKEAppBase):
 
     def deploy_application(self, app_id, app_info):
         fmlogger.debug("Deploying application %s" % app_info['app_name'])
-        self._copy_creds(app_info)
 
         env_vars = common_functions.resolve_environment(app_id, app_info)
 
@@ -220,6 +220,7 @@ class GKESingleContainer(gke_app_base.GKEAppBase):
 
     def delete_application(self, app_id, app_info):
         fmlogger.debug("Deleting application %s" % app_info['app_name'])
+        readiness.prober.cancel(app_id)
 
         app_obj = app_db.App().get(app_id)
         try:
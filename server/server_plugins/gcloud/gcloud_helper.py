@@ -1,7 +1,5 @@
-import ast
 import os
 from os.path import expanduser
-import shutil
 import time
 import yaml
 
@@ -13,6 +11,7 @@ from oauth2client.client import GoogleCredentials
 from server.common import constants
 from server.common import common_functions
 from server.common import docker_lib
+from server.common import env_definition
 from server.common import fm_logger
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import environment as env_db
@@ -34,14 +33,10 @@ class GCloudHelper(object):
         self.docker_handler = docker_lib.DockerLib()
     
     def get_access_token(self, df_dir, df, cont_name):
-        fp = open(df_dir + "/Dockerfile.get-access-token", "w")
-        fp.write(df)
-        fp.close()
-
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             cont_name,
-            df_dir + "/Dockerfile.get-access-token",
-            df_context=df_dir
+            df,
+            self.docker_handler.get_creds_context(constants.GOOGLE)
         )
         
         err, output = self.docker_handler.run_container(cont_name)
@@ -67,6 +62,9 @@ class GCloudHelper(object):
                 line_contents = line.split(":")
                 access_token = line_contents[1].strip().replace("\"", "").replace(",", "")
                 fmlogger.debug("Access token:%s" % access_token)
+        fp1.close()
+        # Do not leave the credentials behind in a directory used as a build context.
+        os.remove(df_dir + "/credentials")
 
         self.docker_handler.stop_container(docker_image_id)
         self.docker_handler.remove_container(docker_image_id)
@@ -76,15 +74,9 @@ class GCloudHelper(object):
 
     def get_deployment_details(self, env_id):
         env_obj = env_db.Environment().get(env_id)
-        env_details = ast.literal_eval(env_obj.env_definition)
-        project = ''
-        zone = ''
-        if 'app_deployment' in env_details['environment']:
-            project = env_details['environment']['app_deployment']['project']
-            zone = env_details['environment']['app_deployment']['zone']
-        else:
-            project = env_details['environment']['resources']['gcloud'][0]['resource']['project']
-            zone = env_details['environment']['resources']['gcloud'][0]['resource']['zone']
+        env_def = env_definition.get(env_obj)
+        project = env_def.project
+        zone = env_def.zone
 
         user_account = ''
         if not os.path.exists(home_dir + "/.config/gcloud/configurations/config_default"):
@@ -110,9 +102,6 @@ class GCloudHelper(object):
             mkdir_command = ("mkdir {df_dir}").format(df_dir=df_dir)
             os.system(mkdir_command)
 
-        if not os.path.exists(df_dir + "/google-creds"):
-            shutil.copytree(home_dir + "/.config/gcloud", df_dir + "/google-creds/gcloud")
-
         user_account, project_name, zone_name = self.get_deployment_details(env_id)
 
         df = self.docker_handler.get_dockerfile_snippet(base_image)
@@ -125,24 +114,22 @@ class GCloudHelper(object):
                             project=project_name,
                             base_command=base_command
                             )
-        df_name = df_dir + "/Dockerfile.run_command"
-        fp = open(df_name, "w")
-        fp.write(df)
-        fp.close()
-
         fp1 = open(df_dir + "/run_command.sh", "w")
         fp1.write("#!/bin/bash \n")
         fp1.write(command)
         fp1.close()
 
+        context_files = self.docker_handler.get_creds_context(constants.GOOGLE)
+        context_files['run_command.sh'] = df_dir + "/run_command.sh"
+
         time1 = int(round(time.time() * 1000))
         resource_name = resource_obj.cloud_resource_id
         cont_name = resource_name + "_run_command"
 
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             cont_name,
-            df_name,
-            df_context=df_dir
+            df,
+            context_files
         )
 
         time2 = int(round(time.time() * 1000))
@@ -6,6 +6,7 @@ from googleapiclient import discovery
 from oauth2client.client import GoogleCredentials
 
 from server.common import constants
+from server.common import env_definition
 from server.common import fm_logger
 from server.dbmodule.objects import environment as env_db
 from server.dbmodule.objects import resource as res_db
@@ -93,8 +94,7 @@ class CloudSQLResourceHandler(resource_base.ResourceBase):
         env_obj = env_db.Environment().get(env_id)
         res_type = resource_details['type']
 
-        env_details = ast.literal_eval(env_obj.env_definition)
-        project_name = env_details['environment']['app_deployment']['project']
+        project_name = env_definition.get(env_obj).project
 
         env_output_config = ast.literal_eval(env_obj.output_config)
         env_version_stamp = env_output_config['env_version_stamp']
@@ -1,6 +1,4 @@
-import os
 from os.path import expanduser
-import shutil
 import time
 
 from googleapiclient import discovery
@@ -10,6 +8,7 @@ from server.common import constants
 from server.common import common_functions
 from server.common import docker_lib
 from server.common import fm_logger
+from server.common import image_push
 from server.dbmodule.objects import container as cont_db
 from server.server_plugins.gcloud import gcloud_helper
 import server.server_plugins.resource_base as resource_base
@@ -48,17 +47,30 @@ class GCRHandler(resource_base.ResourceBase):
         fq_cont_name = GCR + "/" + project + "/" + cont_name
         fmlogger.debug("Container name that will be used in building:%s" % fq_cont_name)
 
+        cache_from = self.docker_handler.get_latest_image(fq_cont_name)
         err, output = self.docker_handler.build_container_image(fq_cont_name, df_dir + "/Dockerfile",
-                                                                df_context=df_dir, tag=tag)
+                                                                df_context=df_dir, tag=tag,
+                                                                cache_from=cache_from)
         return err, output, fq_cont_name
 
     def _push_container(self, cont_info, tagged_image):
-        access_token = self._get_access_token(cont_info)
+        # The access token is only fetched when there is no recent login to GCR.
+        err, output = image_push.push_service.login(
+            "https://" + GCR,
+            lambda: ("oauth2accesstoken", self._get_access_token(cont_info)))
+        if err:
+            raise Exception(err)
 
-        self.docker_handler.docker_login("oauth2accesstoken",
-                                         access_token, "https://" + GCR)
+        cont_name = cont_info['cont_name']
 
-        self.docker_handler.push_container(tagged_image)
+        def _report_progress(done, total):
+            cont_db.Container().update(cont_name, {'status': ("pushing-cont-to-gcr-repository "
+                                                              "{done}/{total} layers").format(done=done,
+                                                                                              total=total)})
+        err, output = image_push.push_service.push(tagged_image,
+                                                   progress_callback=_report_progress)
+        if err:
+            raise Exception(err)
 
     def _delete_container(self, tagged_image, cont_info):
         err, output = self.docker_handler.remove_container_image(tagged_image)
@@ -77,29 +89,17 @@ class GCRHandler(resource_base.ResourceBase):
                    ).format(cluster_name=cluster_name,
                             tagged_image=tagged_image)
 
-        app_dir = app_info['app_location']
-        app_folder_name = app_info['app_folder_name']
         cont_name = app_info['app_name'] + "-delete-image"
 
-        df_dir = app_dir + "/" + app_folder_name
-        df_name = df_dir + "/Dockerfile.delete-image"
-        fp = open(df_name, "w")
-        fp.write(df)
-        fp.close()
-
-        err, output = self.docker_handler.build_container_image(
+        err, output = self.docker_handler.build_image_from_files(
             cont_name,
-            df_name,
-            df_context=df_dir
+            df,
+            self.docker_handler.get_creds_context(constants.GOOGLE)
         )
 
         self.docker_handler.remove_container_image(cont_name)
 
     def create(self, cont_name, cont_info):
-        df_dir = common_functions.get_df_dir(cont_info)
-        if not os.path.exists(df_dir + "/google-creds"):
-            shutil.copytree(home_dir + "/.config/gcloud", df_dir + "/google-creds/gcloud")
-
         cont_data = {}
         cont_data['status'] = 'building-container'
 
@@ -6,6 +6,7 @@ from server.common import common_functions
 from server.common import constants
 from server.common import docker_lib
 from server.common import fm_logger
+from server.common import readiness
 from server.dbmodule.objects import app as app_db
 from server.dbmodule.objects import container as cont_db
 import server.server_plugins.coe_base as coe_base
@@ -53,9 +54,9 @@ class NativeDockerHandler(coe_base.COEBase):
         fmlogger.debug("App URL: %s" % app_url)
         return cont_id, app_url
     
-    def _check_app_status(self, app_url):
+    def _check_app_status(self, app_url, app_id=''):
         app_status = ''
-        if common_functions.is_app_ready(app_url, timeout=40):
+        if common_functions.is_app_ready(app_url, app_id=app_id, timeout=120):
             fmlogger.debug("Application is ready.")
             app_status = constants.APP_DEPLOYMENT_COMPLETE
         else:
@@ -90,7 +91,7 @@ class NativeDockerHandler(coe_base.COEBase):
 
         app_db.App().update(app_id, {'output_config': str(app_data)})
 
-        app_status = self._check_app_status(app_url)
+        app_status = self._check_app_status(app_url, app_id=app_id)
 
         app_db.App().update(app_id, {'status': app_status,'output_config': str(app_data)})
         fmlogger.debug("Done deploying application")
@@ -100,6 +101,7 @@ class NativeDockerHandler(coe_base.COEBase):
 
     def delete_application(self, app_id, app_info):
         fmlogger.debug("Deleting application %s %s" % (app_id, app_info['app_name']))
+        readiness.prober.cancel(app_id)
         try:
             app_db.App().update(app_id, {'status': constants.DELETING_APP})
             app_obj = app_db.App().get(app_id)
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+
+from testtools import TestCase
+
+from server.common import app_definition
+
+
+class TestAppDefinition(TestCase):
+
+    def setUp(self):
+        super(TestAppDefinition, self).setUp()
+        self.app_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.app_dir)
+        self.path = os.path.join(self.app_dir, "app.yaml")
+
+    def _write(self, content):
+        fp = open(self.path, "w")
+        fp.write(content)
+        fp.close()
+
+    def test_fields(self):
+        self._write("app:\n  image: nginx\n  container_port: 80\n  memory: 512\n"
+                    "  env:\n    DB: $CLOUDARK_RDS_HOST\n")
+        app_def = app_definition.load(self.path)
+        self.assertEqual('nginx', app_def.image)
+        self.assertEqual(80, app_def.container_port)
+        self.assertEqual(None, app_def.host_port)
+        self.assertEqual(512, app_def.memory)
+        self.assertEqual('', app_def.cpu)
+        self.assertEqual('', app_def.memory_reservation)
+        self.assertEqual([], app_def.placement_strategy)
+        self.assertEqual([], app_def.placement_constraints)
+        self.assertEqual('', app_def.log_driver)
+        self.assertEqual({'DB': '$CLOUDARK_RDS_HOST'}, app_def.env)
+        self.assertEqual(1, app_def.replicas)
+
+    def test_replicas(self):
+        self._write("app:\n  image: nginx\n  replicas: 3\n")
+        self.assertEqual(3, app_definition.load(self.path).replicas)
+
+    def test_deployment(self):
+        self._write("app:\n  image: nginx\n  deployment:\n    minimum_healthy_percent: 50\n")
+        app_def = app_definition.load(self.path)
+        self.assertEqual({'minimum_healthy_percent': 50}, app_def.deployment)
+
+    def test_cached_until_file_changes(self):
+        self._write("app:\n  image: nginx\n")
+        first = app_definition.load(self.path)
+        self.assertIs(first, app_definition.load(self.path))
+
+        self._write("app:\n  image: nginx:1.13\n")
+        os.utime(self.path, (0, 0))
+        self.assertEqual('nginx:1.13', app_definition.load(self.path).image)
@@ -0,0 +1,65 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+
+from testtools import TestCase
+
+from server.common import app_store
+
+
+def _add_file(tar, name, content):
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    tar.addfile(info, io.BytesIO(content))
+
+
+def _add_symlink(tar, name, link_name):
+    info = tarfile.TarInfo(name)
+    info.type = tarfile.SYMTYPE
+    info.linkname = link_name
+    tar.addfile(info)
+
+
+class TestAppStore(TestCase):
+
+    def setUp(self):
+        super(TestAppStore, self).setUp()
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.dest_dir = os.path.join(self.work_dir, "app")
+        store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, store_dir)
+        self.patch(app_store.constants, 'OBJECT_STORE_PATH', store_dir)
+
+    def _extract(self, build):
+        data = io.BytesIO()
+        tar = tarfile.open(fileobj=data, mode="w")
+        build(tar)
+        tar.close()
+        data.seek(0)
+        app_store.extract_tar(data, self.dest_dir)
+
+    def test_identical_files_share_a_blob(self):
+        def build(tar):
+            _add_file(tar, "app/a.txt", b"same")
+            _add_file(tar, "app/b.txt", b"same")
+        self._extract(build)
+        a = os.stat(os.path.join(self.dest_dir, "app/a.txt"))
+        b = os.stat(os.path.join(self.dest_dir, "app/b.txt"))
+        self.assertEqual(a.st_ino, b.st_ino)
+
+    def test_members_outside_destination_are_skipped(self):
+        def build(tar):
+            _add_file(tar, "../escaped.txt", b"x")
+            _add_file(tar, "/tmp/absolute.txt", b"x")
+            _add_symlink(tar, "app/up", "../..")
+            _add_file(tar, "app/up/through-link.txt", b"x")
+            _add_file(tar, "app/ok.txt", b"ok")
+        cwd = os.getcwd()
+        self._extract(build)
+        self.assertEqual(cwd, os.getcwd())
+        self.assertEqual(['app'], os.listdir(self.work_dir))
+        self.assertFalse(os.path.islink(os.path.join(self.dest_dir, "app/up")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest_dir, "app/ok.txt")))
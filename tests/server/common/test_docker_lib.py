@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+from testtools import TestCase
+
+from server.common import docker_lib
+
+
+class TestDockerLib(TestCase):
+
+    def setUp(self):
+        super(TestDockerLib, self).setUp()
+        self.src_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.src_dir)
+        context_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, context_path, True)
+        self.patch(docker_lib.constants, 'BUILD_CONTEXT_PATH', context_path)
+
+    def _write(self, path):
+        full_path = os.path.join(self.src_dir, path)
+        if not os.path.exists(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        fp = open(full_path, "w")
+        fp.write(path)
+        fp.close()
+        return full_path
+
+    def test_build_image_from_files_sends_only_listed_files(self):
+        self._write("app/tarball.tar")
+        self._write("app/Dockerfile.old")
+        script = self._write("app/run_command.sh")
+        self._write("gcloud/credentials")
+        self._write("gcloud/logs/2017.log")
+
+        contexts = []
+
+        def fake_build(cont_name, df_name, df_context='', tag='', cache_from=''):
+            files = []
+            for root, dirs, file_names in os.walk(df_context):
+                for file_name in file_names:
+                    files.append(os.path.relpath(os.path.join(root, file_name), df_context))
+            contexts.append((df_context, sorted(files), open(df_name).read()))
+            return '', ''
+
+        docker_handler = docker_lib.DockerLib()
+        docker_handler.build_container_image = fake_build
+        context_files = {'google-creds/gcloud': os.path.join(self.src_dir, "gcloud"),
+                         'run_command.sh': script}
+        docker_handler.build_image_from_files("test-cont", "FROM ubuntu\n", context_files)
+
+        context_dir, files, df = contexts[0]
+        self.assertEqual(['Dockerfile', 'google-creds/gcloud/credentials', 'run_command.sh'], files)
+        self.assertEqual("FROM ubuntu\n", df)
+        self.assertFalse(os.path.exists(context_dir))
+
+    def _fake_docker(self, script):
+        bin_dir = os.path.join(self.src_dir, "bin")
+        os.makedirs(bin_dir)
+        docker = os.path.join(bin_dir, "docker")
+        fp = open(docker, "w")
+        fp.write("#!/bin/sh\n" + script)
+        fp.close()
+        os.chmod(docker, 0o755)
+        self.addCleanup(os.environ.__setitem__, 'PATH', os.environ['PATH'])
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+
+    def test_push_container_reports_failure_with_large_stderr(self):
+        self._fake_docker("echo '0123456789ab: Preparing'\n"
+                          "head -c 200000 /dev/zero | tr '\\0' 'x' >&2\n"
+                          "echo >&2\n"
+                          "echo 'denied: requested access to the resource is denied' >&2\n"
+                          "exit 1\n")
+        docker_handler = docker_lib.DockerLib()
+        docker_handler._touch_image = lambda tagged_name: None
+        layers = []
+
+        err, output = docker_handler.push_container(
+            "repo/app:1", progress_callback=lambda layer_id, status: layers.append((layer_id, status)))
+
+        self.assertEqual([('0123456789ab', 'Preparing')], layers)
+        self.assertIn('denied: requested access', err)
+        self.assertNotIn('0123456789ab', err)
+
+    def test_push_container_succeeds_on_zero_exit(self):
+        self._fake_docker("echo '0123456789ab: Pushed'\necho 'warning: something' >&2\n")
+        docker_handler = docker_lib.DockerLib()
+        docker_handler._touch_image = lambda tagged_name: None
+
+        err, output = docker_handler.push_container("repo/app:1", progress_callback=lambda *args: None)
+
+        self.assertEqual('', err)
+        self.assertIn('warning: something', output)
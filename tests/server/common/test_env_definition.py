@@ -0,0 +1,29 @@
+from testtools import TestCase
+
+from server.common import env_definition
+from server.common import exceptions
+
+
+class TestEnvironmentDefinition(TestCase):
+
+    def test_parse_stored_definition(self):
+        stored = str({'environment': {'app_deployment': {'target': 'gcloud', 'type': 'gke'},
+                                      'resources': {'gcloud': [{'resource': {'type': 'cloudsql',
+                                                                             'project': 'p1',
+                                                                             'zone': 'us-central1-b'}}]}}})
+        env_def = env_definition.parse(stored)
+        self.assertEqual('gke', env_def.coe_type)
+        self.assertEqual(1, env_def.cluster_size)
+        self.assertEqual('p1', env_def.project)
+        self.assertEqual(['cloudsql'], [res['type'] for res in env_def.get_resources('gcloud')])
+
+    def test_invalid_definitions_are_rejected(self):
+        invalid = [{},
+                   {'environment': {'app_deployment': {'target': 'azure', 'type': 'aks'}}},
+                   {'environment': {'app_deployment': {'target': 'aws', 'type': 'ecs', 'cluster_size': 0}}},
+                   {'environment': {'app_deployment': {'target': 'aws', 'type': 'ecs', 'load_balancer': 'nlb'}}},
+                   {'environment': {'app_deployment': {'target': 'gcloud', 'type': 'gke'}}},
+                   {'environment': {'resources': {'aws': [{'type': 'rds'}]}}}]
+        for definition in invalid:
+            self.assertRaises(exceptions.EnvironmentDefinitionValidationFailure,
+                              env_definition.parse, definition)
@@ -0,0 +1,58 @@
+from testtools import TestCase
+
+from server.common import docker_lib
+from server.common import image_gc
+
+
+class FakeImage(object):
+
+    def __init__(self, name, tag, kind, size, created_at, last_used):
+        self.name = name
+        self.tag = tag
+        self.kind = kind
+        self.size = size
+        self.created_at = created_at
+        self.last_used = last_used
+
+
+class TestImageGC(TestCase):
+
+    def _versions(self, name, count, size=100):
+        return [FakeImage(name, str(i), docker_lib.VERSIONED_IMAGE, size, i, i)
+                for i in range(count)]
+
+    def test_keeps_last_versions_under_budget(self):
+        images = self._versions('app1', 5)
+        removed = image_gc.select_images_to_remove(images, set(), 10,
+                                                   disk_budget=1000,
+                                                   keep_versions=2)
+        self.assertEqual([], removed)
+
+    def test_evicts_least_recently_used_over_budget(self):
+        images = self._versions('app1', 5)
+        images[0].last_used = 9
+        removed = image_gc.select_images_to_remove(images, set(), 10,
+                                                   disk_budget=300,
+                                                   keep_versions=2)
+        self.assertEqual(['1', '2'], [image.tag for image in removed])
+
+    def test_never_evicts_protected_versions(self):
+        images = self._versions('app1', 3)
+        removed = image_gc.select_images_to_remove(images, set(), 10,
+                                                   disk_budget=0,
+                                                   keep_versions=3)
+        self.assertEqual([], removed)
+
+    def test_in_use_images_are_kept(self):
+        images = self._versions('app1', 3)
+        removed = image_gc.select_images_to_remove(images, set(['app1:0']), 10,
+                                                   disk_budget=0,
+                                                   keep_versions=1)
+        self.assertEqual(['1'], [image.tag for image in removed])
+
+    def test_expired_transient_images_are_removed(self):
+        old = FakeImage('helper-old', '', docker_lib.TRANSIENT_IMAGE, 10, 0, 0)
+        new = FakeImage('helper-new', '', docker_lib.TRANSIENT_IMAGE, 10, 95, 95)
+        removed = image_gc.select_images_to_remove([old, new], set(), 100,
+                                                   transient_ttl=50)
+        self.assertEqual([old], removed)
@@ -0,0 +1,57 @@
+from testtools import TestCase
+
+from server.common import image_push
+
+
+class FakeDockerLib(object):
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.pushes = 0
+        self.logins = 0
+
+    def push_container(self, cont_name, progress_callback=None):
+        self.pushes = self.pushes + 1
+        if progress_callback:
+            progress_callback('5f70bf18a086', 'Preparing')
+            progress_callback('5f70bf18a086', 'Pushed')
+        return self.results.pop(0)
+
+    def docker_login(self, username, password, proxy_endpoint):
+        self.logins = self.logins + 1
+        return 'WARNING! Using --password via the CLI is insecure. Use --password-stdin.\n', ''
+
+
+class TestImagePushService(TestCase):
+
+    def _service(self, results):
+        service = image_push.ImagePushService(max_concurrent=1, retries=2, backoff=0)
+        service.docker_handler = FakeDockerLib(results)
+        return service
+
+    def test_transient_error_is_retried(self):
+        service = self._service([('net/http: TLS handshake timeout', ''), ('', 'pushed')])
+        progress = []
+        err, output = service.push('us.gcr.io/p/app:1',
+                                   progress_callback=lambda done, total: progress.append((done, total)))
+        self.assertEqual('', err)
+        self.assertEqual(2, service.docker_handler.pushes)
+        self.assertEqual([(1, 1)], progress)
+
+    def test_permanent_error_is_not_retried(self):
+        service = self._service([('denied: requested access to the resource is denied', '')])
+        err, output = service.push('us.gcr.io/p/app:1')
+        self.assertIn('denied', err)
+        self.assertEqual(1, service.docker_handler.pushes)
+
+    def test_tag_in_registry_is_not_pushed(self):
+        service = self._service([])
+        err, output = service.push('us.gcr.io/p/app:1', exists_in_registry=lambda: True)
+        self.assertEqual('', err)
+        self.assertEqual(0, service.docker_handler.pushes)
+
+    def test_login_is_shared_per_registry(self):
+        service = self._service([])
+        service.login('https://us.gcr.io', lambda: ('user', 'token'))
+        service.login('https://us.gcr.io', lambda: ('user', 'token'))
+        self.assertEqual(1, service.docker_handler.logins)
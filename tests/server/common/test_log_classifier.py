@@ -0,0 +1,41 @@
+from testtools import TestCase
+
+from server.common import common_functions
+from server.common import log_classifier
+
+
+class TestLogClassifier(TestCase):
+
+    def test_feed_classifies_new_lines_only(self):
+        classifier = log_classifier.LogClassifier([log_classifier.ECS_CLI,
+                                                   log_classifier.CLOUDFORMATION])
+        events = classifier.feed('INFO[0000] Created cluster  cluster=c1\n'
+                                 'INFO[0010] Cloudformation stack status  stackStatus=ROLLB')
+        self.assertEqual([], events)
+
+        events = classifier.feed('ACK_IN_PROGRESS\nINFO[0011] 0 errors\n')
+        self.assertEqual(1, len(events))
+        self.assertEqual(log_classifier.CLOUDFORMATION, events[0].tool)
+        self.assertEqual('stack-rollback', events[0].rule)
+        self.assertEqual(2, events[0].line_number)
+        self.assertEqual(events, classifier.events)
+
+    def test_find_errors_ignores_benign_lines(self):
+        output = ("Step 3/5 : RUN ./configure --with-error-log\n"
+                  "ERROR: (gcloud.container.clusters.create) Quota exceeded\n")
+        events = log_classifier.find_errors(output, [log_classifier.DOCKER,
+                                                     log_classifier.GCLOUD])
+        self.assertEqual(['gcloud-error'], [event.rule for event in events])
+
+    def test_common_docker_errors_are_found(self):
+        output = ("docker: Error response from daemon: pull access denied for app.\n"
+                  "#8 ERROR: failed to solve: process \"/bin/sh -c make\" did not complete successfully\n"
+                  "COPY failed: file not found in build context: app.jar\n")
+        events = log_classifier.find_errors(output, [log_classifier.DOCKER])
+        self.assertEqual(['docker-error', 'build-step-failed', 'build-step-failed'],
+                         [event.rule for event in events])
+
+    def test_filter_error_output_falls_back_to_last_lines(self):
+        output = "Step 1/3 : FROM ubuntu\n\nunexpected failure one\nunexpected failure two\n\n"
+        error_output = common_functions.filter_error_output(output, [log_classifier.DOCKER])
+        self.assertEqual("Step 1/3 : FROM ubuntu unexpected failure one unexpected failure two", error_output)
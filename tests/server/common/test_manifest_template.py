@@ -0,0 +1,36 @@
+import os
+import shutil
+import tempfile
+import yaml
+
+from testtools import TestCase
+
+from server.common import manifest_template
+
+
+class TestManifestTemplate(TestCase):
+
+    def test_render_substitutes_values_only(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        manifest = os.path.join(work_dir, "pod.yaml")
+        fp = open(manifest, "w")
+        fp.write("kind: Pod\n"
+                 "spec:\n"
+                 "  containers:\n"
+                 "  - env:\n"
+                 "    - name: DB_URL\n"
+                 "      value: mysql://$CLOUDARK_RDS_HOST:3306/$CLOUDARK_RDS_DB_NAME\n"
+                 "---\n"
+                 "kind: Service\n")
+        fp.close()
+
+        values = {'$CLOUDARK_RDS_HOST': 'db.example.com', '$CLOUDARK_RDS_DB_NAME': 'testdb'}
+        rendered = os.path.join(work_dir, "rendered.yaml")
+        manifest_template.render(manifest, values.get, rendered)
+
+        docs = list(yaml.safe_load_all(open(rendered)))
+        self.assertEqual('mysql://db.example.com:3306/testdb',
+                         docs[0]['spec']['containers'][0]['env'][0]['value'])
+        self.assertEqual({'kind': 'Service'}, docs[1])
+        self.assertIn('$CLOUDARK_RDS_HOST', open(manifest).read())
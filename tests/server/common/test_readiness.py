@@ -0,0 +1,50 @@
+import threading
+
+from testtools import TestCase
+
+from server.common import readiness
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeSession(object):
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls = self.calls + 1
+        result = self.results.pop(0) if self.results else 200
+        if isinstance(result, Exception):
+            raise result
+        return FakeResponse(result)
+
+
+class TestReadinessProber(TestCase):
+
+    def _prober(self, results):
+        prober = readiness.ReadinessProber(workers=1)
+        session = FakeSession(results)
+        prober._session = lambda: session
+        return prober, session
+
+    def test_ready_after_threshold_with_backoff_on_failure(self):
+        prober, session = self._prober([Exception("connection refused"), 200, 503, 200, 200])
+        ready = prober.wait_until_ready("http://app", timeout=10, success_threshold=2,
+                                        interval=0.01, max_interval=0.05)
+        self.assertTrue(ready)
+        self.assertEqual(5, session.calls)
+
+    def test_cancel_stops_probe(self):
+        prober, session = self._prober([503] * 100)
+        self.patch(readiness.app_db.App, 'get', lambda app, app_id: app)
+        probe = prober.submit("http://app", app_id=1, timeout=10, interval=0.01)
+        threading.Timer(0.05, prober.cancel, args=(1,)).start()
+        probe.done.wait(5)
+        self.assertTrue(probe.done.is_set())
+        self.assertFalse(probe.ready)
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+from testtools import TestCase
+
+from server.common import storage_manager
+
+
+class TestStorageManager(TestCase):
+
+    def test_keeps_newest_and_in_use_versions(self):
+        versions = ['2017-01-0%s-00-00-00' % i for i in range(1, 6)]
+        removed = storage_manager.select_versions_to_remove(versions,
+                                                            set(['2017-01-01-00-00-00']),
+                                                            keep_versions=2)
+        self.assertEqual(['2017-01-03-00-00-00', '2017-01-02-00-00-00'], removed)
+
+    def test_dir_usage_counts_hard_links_once(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        os.makedirs(work_dir + "/v1")
+        os.makedirs(work_dir + "/v2")
+        fp = open(work_dir + "/v1/app.py", "w")
+        fp.write("x" * 100)
+        fp.close()
+        os.link(work_dir + "/v1/app.py", work_dir + "/v2/app.py")
+
+        self.assertEqual(100, storage_manager.dir_usage(work_dir))
+        seen = set()
+        self.assertEqual(100, storage_manager.dir_usage(work_dir + "/v1", seen))
+        self.assertEqual(0, storage_manager.dir_usage(work_dir + "/v2", seen))
@@ -0,0 +1,21 @@
+from random import randint
+from testtools import TestCase
+
+from server.dbmodule.objects import port
+
+
+class TestPortAllocation(TestCase):
+
+    def test_port_reserved_once_per_env(self):
+        env_id = randint(100000, 200000)
+        app_id = randint(100000, 200000)
+        self.addCleanup(port.PortAllocation().release_for_env, env_id)
+
+        self.assertTrue(port.PortAllocation().reserve(env_id, 8080, app_id))
+        self.assertTrue(port.PortAllocation().reserve(env_id, 8080, app_id))
+        self.assertFalse(port.PortAllocation().reserve(env_id, 8080, app_id + 1))
+        self.assertTrue(port.PortAllocation().reserve(env_id + 1, 8080, app_id + 1))
+        port.PortAllocation().release_for_env(env_id + 1)
+
+        port.PortAllocation().release_for_app(app_id)
+        self.assertTrue(port.PortAllocation().reserve(env_id, 8080, app_id + 1))
@@ -0,0 +1,97 @@
+import threading
+
+from testtools import TestCase
+
+from server.server_plugins.aws import ecs_state_tracker
+
+
+class FakeECSClient(object):
+    """Returns the states of tasks and services from a list per poll."""
+
+    def __init__(self, task_states=None, service_states=None, errors=0):
+        self.task_states = task_states or []
+        self.service_states = service_states or []
+        self.errors = errors
+        self.calls = []
+
+    def describe_tasks(self, cluster, tasks):
+        self.calls.append(('describe_tasks', cluster, len(tasks)))
+        if self.errors:
+            self.errors = self.errors - 1
+            raise Exception("Throttling")
+        state = self.task_states.pop(0) if len(self.task_states) > 1 else self.task_states[0]
+        return {'tasks': [{'taskArn': arn, 'lastStatus': state} for arn in tasks]}
+
+    def describe_services(self, cluster, services):
+        self.calls.append(('describe_services', cluster, len(services)))
+        running = self.service_states.pop(0) if len(self.service_states) > 1 else self.service_states[0]
+        return {'services': [{'serviceName': name, 'pendingCount': 0, 'runningCount': running}
+                             for name in services]}
+
+
+class TestECSStateTracker(TestCase):
+
+    def _tracker(self, client):
+        return ecs_state_tracker.ECSStateTracker(interval=0.01, client_factory=lambda: client)
+
+    def _in_parallel(self, funcs):
+        results = {}
+        threads = [threading.Thread(target=lambda i=i, func=func: results.update({i: func()}))
+                   for i, func in enumerate(funcs)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        return [results.get(i) for i in range(len(funcs))]
+
+    def test_waiters_of_a_cluster_share_describe_calls(self):
+        client = FakeECSClient(task_states=['PENDING', 'RUNNING'], service_states=[2])
+        tracker = self._tracker(client)
+        # Submitted before the poller starts so that all are in the first poll.
+        with tracker.cond:
+            tracker.thread = True
+            tracker.ecs_client = client
+        task_waiters = [tracker.submit('cluster', lambda tasks: all([t['lastStatus'] == 'RUNNING' for t in tasks]),
+                                       task_arns=['task-%s' % i]) for i in range(150)]
+        service_waiters = [tracker.submit('cluster', lambda services: services[0]['runningCount'] == 2,
+                                          service_name='service-%s' % i) for i in range(15)]
+        poller = threading.Thread(target=tracker._run)
+        poller.daemon = True
+        poller.start()
+        for waiter in task_waiters + service_waiters:
+            waiter.done.wait(10)
+            self.assertTrue(waiter.reached)
+        first_poll = client.calls[:4]
+        self.assertEqual([('describe_tasks', 'cluster', 100), ('describe_tasks', 'cluster', 50),
+                          ('describe_services', 'cluster', 10), ('describe_services', 'cluster', 5)],
+                         first_poll)
+
+    def test_waiters_are_woken_when_their_state_is_reached(self):
+        client = FakeECSClient(task_states=['PENDING', 'PENDING', 'RUNNING'], service_states=[0, 1, 3])
+        tracker = self._tracker(client)
+        results = self._in_parallel([
+            lambda: tracker.wait_for_tasks('cluster', ['a', 'b'], 'running', timeout=5),
+            lambda: tracker.wait_for_service_count('cluster', 'service', 3, timeout=5)])
+        reached, tasks = results[0]
+        self.assertTrue(reached)
+        self.assertEqual(['a', 'b'], [task['taskArn'] for task in tasks])
+        self.assertTrue(results[1])
+
+    def test_stopped_task_ends_wait_for_running(self):
+        client = FakeECSClient(task_states=['PENDING', 'STOPPED'])
+        tracker = self._tracker(client)
+        reached, tasks = tracker.wait_for_tasks('cluster', ['a'], 'RUNNING', timeout=60)
+        self.assertFalse(reached)
+        self.assertEqual('STOPPED', tasks[0]['lastStatus'])
+
+    def test_wait_times_out(self):
+        client = FakeECSClient(service_states=[1])
+        tracker = self._tracker(client)
+        self.assertFalse(tracker.wait_for_service_count('cluster', 'service', 2, timeout=0.05))
+
+    def test_polling_continues_after_describe_errors(self):
+        client = FakeECSClient(task_states=['RUNNING'], errors=3)
+        tracker = self._tracker(client)
+        reached, tasks = tracker.wait_for_tasks('cluster', ['a'], 'RUNNING', timeout=5)
+        self.assertTrue(reached)
+        self.assertEqual(4, len(client.calls))